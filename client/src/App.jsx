@@ -1,7 +1,10 @@
-import { useState, useEffect } from 'react';
+import { useState, useEffect, useRef } from 'react';
 import { io } from 'socket.io-client';
+import { createDecoder, withMessage } from './wire';
 
 const API_URL = import.meta.env.VITE_API_URL || 'http://localhost:5000';
+// Codificação das mensagens do servidor: compact (binário, ver wire.js) ou json
+const WIRE_ENCODING = import.meta.env.VITE_WIRE_ENCODING || 'compact';
 
 const DominoDots = ({ value }) => {
   const dotPatterns = {
@@ -49,33 +52,60 @@ function App() {
   const [showSideChoice, setShowSideChoice] = useState(false);
   const [startingInfo, setStartingInfo] = useState(null);
   const [requiredDouble, setRequiredDouble] = useState(null);
+  const [legalMoves, setLegalMoves] = useState([]);
+  // Assistindo a uma sala como espectador (sem mão nem jogadas)
+  const [spectating, setSpectating] = useState(false);
+  // Versão do último estado aplicado; deltas fora de sequência pedem o estado completo
+  const versionRef = useRef(0);
 
   useEffect(() => {
-    const newSocket = io(API_URL);
+    const newSocket = io(API_URL, { auth: { encoding: WIRE_ENCODING } });
+    const decoder = createDecoder();
     setSocket(newSocket);
+    // Mensagens de texto: clientes compactos recebem só o código
+    const onMessage = (event, handler) => newSocket.on(event, (data) => handler(withMessage(data)));
 
-    newSocket.on('connected', (data) => {
+    onMessage('connected', (data) => {
       console.log('Conectado ao servidor:', data.message);
     });
 
-    newSocket.on('room_created', (data) => {
+    onMessage('room_created', (data) => {
+      setSpectating(false);
       setRoomCode(data.room_code);
       setGameState('waiting');
       setMessage(`Sala criada! Código: ${data.room_code}`);
     });
 
-    newSocket.on('room_joined', (data) => {
+    onMessage('match_queued', (data) => {
+      setGameState('searching');
+      setMessage(data.message);
+    });
+
+    onMessage('match_cancelled', (data) => {
+      setGameState('menu');
+      setMessage(data.message);
+    });
+
+    onMessage('room_joined', (data) => {
+      setSpectating(false);
       setRoomCode(data.room_code);
       setGameState('waiting');
       setMessage(data.message);
     });
 
-    newSocket.on('player_joined', (data) => {
+    onMessage('watching', (data) => {
+      setRoomCode(data.room_code);
+      setSpectating(true);
+      setGameState('playing');
       setMessage(data.message);
     });
 
-    newSocket.on('game_started', (data) => {
-      setGameState('playing');
+    onMessage('player_joined', (data) => {
+      setMessage(data.message);
+    });
+
+    const applySnapshot = (data) => {
+      versionRef.current = data.version;
       setMyHand(data.my_hand);
       setBoard(data.board);
       setCurrentPlayer(data.current_player);
@@ -83,6 +113,47 @@ function App() {
       setPoolCount(data.pool_count);
       setStartingInfo(data.starting_info);
       setRequiredDouble(data.required_double);
+      setLegalMoves(data.legal_moves || []);
+
+      if (data.game_finished) {
+        setGameState('finished');
+        setWinner(data.winner);
+      }
+    };
+
+    const applyEvent = (event) => {
+      if (event.type === 'play') {
+        const { left, right } = event.piece;
+        if (event.player === newSocket.id) {
+          setMyHand(hand => hand.filter(p => !(
+            (p.left === left && p.right === right) || (p.left === right && p.right === left)
+          )));
+        }
+        setBoard(board => event.side === 'left' ? [event.piece, ...board] : [...board, event.piece]);
+        setStartingInfo(null);
+        setRequiredDouble(null);
+      } else if (event.type === 'draw' && event.piece) {
+        setMyHand(hand => [...hand, event.piece]);
+      }
+
+      setCurrentPlayer(event.current_player);
+      setPoolCount(event.pool_count);
+      // Quem jogou pode já ter saído da sala (player fica null no modo compacto)
+      setPlayers(players => (event.player in players ? {
+        ...players,
+        [event.player]: { ...players[event.player], hand_count: event.hand_count }
+      } : players));
+
+      if (event.game_finished) {
+        setGameState('finished');
+        setWinner(event.winner);
+      }
+    };
+
+    newSocket.on('game_started', (raw) => {
+      const data = decoder.state(raw);
+      setGameState('playing');
+      applySnapshot(data);
       
       // Mensagem personalizada baseada em quem inicia
       if (data.starting_info) {
@@ -92,28 +163,39 @@ function App() {
       }
     });
 
-    newSocket.on('game_update', (data) => {
-      setMyHand(data.my_hand);
-      setBoard(data.board);
-      setCurrentPlayer(data.current_player);
-      setPlayers(data.players);
-      setPoolCount(data.pool_count);
-      setStartingInfo(data.starting_info);
-      setRequiredDouble(data.required_double);
-      
-      if (data.game_finished) {
-        setGameState('finished');
-        setWinner(data.winner);
-      }
+    newSocket.on('game_state', (raw) => {
+      applySnapshot(decoder.state(raw));
     });
 
-    newSocket.on('game_finished', (data) => {
-      setGameState('finished');
-      setWinner(data.winner);
-      setMessage(data.message);
+    // Um game_delta pode trazer várias jogadas e, no fim, o aviso de fim de jogo
+    newSocket.on('game_delta', (raw) => {
+      const data = decoder.delta(raw);
+      let gap = false;
+      for (const event of data.events) {
+        if (event.seq <= versionRef.current) continue;
+        if (event.seq !== versionRef.current + 1) {
+          // Lacuna de versão: pede o estado completo ao servidor
+          newSocket.emit('get_game_state', { room_code: data.room_code });
+          gap = true;
+          break;
+        }
+        applyEvent(event);
+        versionRef.current = event.seq;
+      }
+      // Um lote antigo (chegou depois de um estado completo) não traz as jogadas atuais
+      if (!gap && data.version >= versionRef.current) {
+        setLegalMoves(data.legal_moves || []);
+      }
+
+      if (data.finished) {
+        const notice = withMessage(data.finished);
+        setGameState('finished');
+        setWinner(notice.winner);
+        setMessage(notice.message);
+      }
     });
 
-    newSocket.on('player_left', (data) => {
+    onMessage('player_left', (data) => {
       setMessage(data.message);
       // Só volta ao menu se o jogo não estiver em andamento
       if (gameState !== 'playing') {
@@ -121,7 +203,13 @@ function App() {
       }
     });
 
-    newSocket.on('error', (data) => {
+    onMessage('room_closed', (data) => {
+      setSpectating(false);
+      setMessage(data.message);
+      setGameState('menu');
+    });
+
+    onMessage('error', (data) => {
       setMessage(data.message);
     });
 
@@ -144,6 +232,30 @@ function App() {
     socket.emit('join_room', { room_code: roomCode.toUpperCase(), name: playerName });
   };
 
+  const watchRoom = () => {
+    if (!roomCode.trim()) {
+      setMessage('Digite o código da sala!');
+      return;
+    }
+    socket.emit('watch_room', { room_code: roomCode.toUpperCase() });
+  };
+
+  const quickMatch = () => {
+    if (!playerName.trim()) {
+      setMessage('Digite seu nome!');
+      return;
+    }
+    socket.emit('quick_match', { name: playerName });
+  };
+
+  const cancelMatch = () => {
+    socket.emit('cancel_match');
+  };
+
+  const playAgainstBot = () => {
+    socket.emit('add_bot', { room_code: roomCode });
+  };
+
   const playPiece = (piece, side) => {
     socket.emit('play_piece', {
       room_code: roomCode,
@@ -155,16 +267,15 @@ function App() {
     setShowSideChoice(false);
   };
 
+  // Lados em que a peça pode ser jogada, segundo as jogadas legais enviadas pelo servidor
+  const legalSides = (piece) => legalMoves
+    .filter(move => move.left === piece.left && move.right === piece.right)
+    .map(move => move.side);
+
   const selectPiece = (piece) => {
-    if (board.length === 0) {
-      playPiece(piece, 'right');
-      return;
-    }
-    
-    const leftEnd = board[0].left;
-    const rightEnd = board[board.length - 1].right;
-    const canLeft = piece.left === leftEnd || piece.right === leftEnd;
-    const canRight = piece.left === rightEnd || piece.right === rightEnd;
+    const sides = legalSides(piece);
+    const canLeft = sides.includes('left');
+    const canRight = sides.includes('right');
     
     if (canLeft && canRight) {
       setSelectedPiece(piece);
@@ -176,18 +287,7 @@ function App() {
     }
   };
 
-  const canPlayPiece = (piece) => {
-    // Se é a primeira jogada e há uma dupla obrigatória
-    if (board.length === 0 && requiredDouble !== null) {
-      return piece.left === piece.right && piece.left === requiredDouble;
-    }
-    
-    if (board.length === 0) return true;
-    const leftEnd = board[0].left;
-    const rightEnd = board[board.length - 1].right;
-    return piece.left === leftEnd || piece.right === leftEnd || 
-          piece.left === rightEnd || piece.right === rightEnd;
-  };
+  const canPlayPiece = (piece) => legalSides(piece).length > 0;
 
   const buyFromPool = () => {
     socket.emit('buy_piece', { room_code: roomCode });
@@ -199,9 +299,7 @@ function App() {
       // Se o tabuleiro está vazio, pode jogar qualquer peça
       if (board.length === 0) return;
       
-      const canPlay = myHand.some(piece => canPlayPiece(piece));
-      
-      if (!canPlay) {
+      if (legalMoves.length === 0) {
         if (poolCount > 0) {
           // Compra automaticamente se não pode jogar e há peças no pool
           const timer = setTimeout(() => buyFromPool(), 800);
@@ -215,7 +313,7 @@ function App() {
         }
       }
     }
-  }, [myHand, currentPlayer, poolCount, gameState, socket, roomCode, board]);
+  }, [legalMoves, currentPlayer, poolCount, gameState, socket, roomCode, board]);
 
   const isMyTurn = () => {
     return currentPlayer === socket?.id;
@@ -249,6 +347,13 @@ function App() {
             Criar Sala
           </button>
 
+          <button
+            onClick={quickMatch}
+            className="w-full bg-indigo-600 hover:bg-indigo-700 text-white font-bold py-3 rounded-lg transition mb-4"
+          >
+            Partida Rápida
+          </button>
+
           <div className="flex items-center my-4">
             <div className="flex-1 border-t border-gray-300"></div>
             <span className="px-4 text-gray-500">ou</span>
@@ -265,11 +370,18 @@ function App() {
 
           <button
             onClick={joinRoom}
-            className="w-full bg-green-600 hover:bg-green-700 text-white font-bold py-3 rounded-lg transition"
+            className="w-full bg-green-600 hover:bg-green-700 text-white font-bold py-3 rounded-lg transition mb-4"
           >
             Entrar na Sala
           </button>
 
+          <button
+            onClick={watchRoom}
+            className="w-full bg-gray-600 hover:bg-gray-700 text-white font-bold py-3 rounded-lg transition"
+          >
+            Assistir
+          </button>
+
           {message && (
             <div className="mt-4 p-3 bg-blue-100 border border-blue-300 rounded-lg text-blue-800 text-sm">
               {message}
@@ -280,6 +392,29 @@ function App() {
     );
   }
 
+  // Renderização da busca de oponente (partida rápida)
+  if (gameState === 'searching') {
+    return (
+      <div className="min-h-screen flex items-center justify-center p-4">
+        <div className="bg-white rounded-2xl shadow-2xl p-8 max-w-md w-full">
+          <h2 className="text-3xl font-bold text-center mb-4 text-gray-800">Procurando oponente...</h2>
+
+          <div className="text-center">
+            <div className="animate-spin rounded-full h-12 w-12 border-b-2 border-indigo-600 mx-auto mb-4"></div>
+            <p className="text-gray-600">A partida começa assim que outro jogador entrar na fila.</p>
+          </div>
+
+          <button
+            onClick={cancelMatch}
+            className="w-full mt-6 bg-gray-500 hover:bg-gray-600 text-white font-bold py-3 rounded-lg transition"
+          >
+            Cancelar
+          </button>
+        </div>
+      </div>
+    );
+  }
+
   // Renderização da Sala de Espera
   if (gameState === 'waiting') {
     return (
@@ -306,6 +441,13 @@ function App() {
             <p className="text-gray-600">Compartilhe o código com um amigo para começar!</p>
           </div>
 
+          <button
+            onClick={playAgainstBot}
+            className="w-full mt-6 bg-purple-600 hover:bg-purple-700 text-white font-bold py-3 rounded-lg transition"
+          >
+            Jogar contra o computador
+          </button>
+
           {message && (
             <div className="mt-4 p-3 bg-blue-100 border border-blue-300 rounded-lg text-blue-800 text-sm">
               {message}
@@ -348,7 +490,12 @@ function App() {
               <div>
                 <h2 className="text-2xl font-bold text-gray-800">Sala: {roomCode}</h2>
                 <p className="text-sm text-gray-600">
-                  {isMyTurn() ? 
+                  {spectating ?
+                    (players[currentPlayer] ?
+                      `👀 Assistindo - vez de ${players[currentPlayer].name}` :
+                      '👀 Assistindo - aguardando jogadores...'
+                    ) :
+                    isMyTurn() ? 
                     (board.length === 0 && requiredDouble !== null ? 
                       `🎯 Jogue a dupla [${requiredDouble}|${requiredDouble}] para começar!` :
                       myHand.some(piece => canPlayPiece(piece)) ? 
@@ -419,38 +566,40 @@ function App() {
             )}
           </div>
 
-          {/* Mão do Jogador */}
-          <div className="bg-white rounded-lg shadow-lg p-6">
-            <h3 className="text-gray-800 text-lg font-bold mb-4">Sua Mão ({myHand.length} peças)</h3>
+          {/* Mão do Jogador (espectadores não têm mão) */}
+          {!spectating && (
+            <div className="bg-white rounded-lg shadow-lg p-6">
+              <h3 className="text-gray-800 text-lg font-bold mb-4">Sua Mão ({myHand.length} peças)</h3>
             
-            <div className="flex flex-wrap gap-4 justify-center mb-4">
-              {myHand.map((piece, idx) => {
-                const isRequired = board.length === 0 && requiredDouble !== null && 
-                                 piece.left === piece.right && piece.left === requiredDouble;
-                const canPlay = canPlayPiece(piece);
+              <div className="flex flex-wrap gap-4 justify-center mb-4">
+                {myHand.map((piece, idx) => {
+                  const isRequired = board.length === 0 && requiredDouble !== null && 
+                                   piece.left === piece.right && piece.left === requiredDouble;
+                  const canPlay = canPlayPiece(piece);
                 
-                return (
-                  <div key={idx} className="relative">
-                    {isRequired && (
-                      <div className="absolute -top-2 -right-2 z-10">
-                        <span className="bg-yellow-500 text-white text-xs font-bold px-2 py-1 rounded-full animate-pulse">
-                          OBRIGATÓRIA!
-                        </span>
-                      </div>
-                    )}
-                    <DominoPiece
-                      piece={piece}
-                      onClick={selectPiece}
-                      disabled={!isMyTurn() || gameState === 'finished' || !canPlay}
-                      className={isRequired ? 'ring-4 ring-yellow-400 ring-opacity-75 animate-pulse' : ''}
-                    />
-                  </div>
-                );
-              })}
-            </div>
+                  return (
+                    <div key={idx} className="relative">
+                      {isRequired && (
+                        <div className="absolute -top-2 -right-2 z-10">
+                          <span className="bg-yellow-500 text-white text-xs font-bold px-2 py-1 rounded-full animate-pulse">
+                            OBRIGATÓRIA!
+                          </span>
+                        </div>
+                      )}
+                      <DominoPiece
+                        piece={piece}
+                        onClick={selectPiece}
+                        disabled={!isMyTurn() || gameState === 'finished' || !canPlay}
+                        className={isRequired ? 'ring-4 ring-yellow-400 ring-opacity-75 animate-pulse' : ''}
+                      />
+                    </div>
+                  );
+                })}
+              </div>
 
 
-          </div>
+            </div>
+          )}
 
           {/* Modal de escolha de lado */}
           {showSideChoice && selectedPiece && (
@@ -0,0 +1,209 @@
+// Decodificação das mensagens compactas do servidor (formato descrito em server/wire.py).
+// Os decodificadores devolvem os mesmos objetos das mensagens em JSON; se a mensagem
+// já chegar em JSON (ex.: de um worker que não conhece a codificação), passa direto.
+
+const TILES = [];
+for (let a = 0; a <= 6; a++) {
+  for (let b = a; b <= 6; b++) TILES.push([a, b]);
+}
+
+const NONE = 255;
+const EVENT_TYPES = ['play', 'draw', 'pass'];
+const FINISH_CODES = [null, 'won', 'won_blocked'];
+const STARTED = 1;
+const FINISHED = 2;
+const HAS_STARTING_INFO = 4;
+
+const textDecoder = new TextDecoder();
+
+const isBinary = (data) => data instanceof ArrayBuffer || ArrayBuffer.isView(data);
+
+const oriented = (byte) => {
+  const [left, right] = TILES[byte >> 1];
+  return byte & 1 ? { left: right, right: left } : { left, right };
+};
+
+const legalMoves = (bytes) => Array.from(bytes, (byte) => ({
+  left: TILES[byte >> 1][0],
+  right: TILES[byte >> 1][1],
+  side: byte & 1 ? 'right' : 'left'
+}));
+
+class Reader {
+  constructor(data) {
+    this.bytes = data instanceof ArrayBuffer
+      ? new Uint8Array(data)
+      : new Uint8Array(data.buffer, data.byteOffset, data.byteLength);
+    this.view = new DataView(this.bytes.buffer, this.bytes.byteOffset, this.bytes.byteLength);
+    this.offset = 0;
+  }
+
+  byte() {
+    return this.bytes[this.offset++];
+  }
+
+  uint32() {
+    const value = this.view.getUint32(this.offset, true);
+    this.offset += 4;
+    return value;
+  }
+
+  raw(size) {
+    const bytes = this.bytes.subarray(this.offset, this.offset + size);
+    this.offset += size;
+    return bytes;
+  }
+
+  block() {
+    return this.raw(this.byte());
+  }
+
+  text(size) {
+    return textDecoder.decode(size === undefined ? this.block() : this.raw(size));
+  }
+}
+
+// Textos das mensagens pelo código; os clientes compactos não recebem o texto pronto
+const MESSAGES = {
+  connected: () => 'Conectado ao servidor',
+  room_created: (d) => `Sala ${d.room_code} criada com sucesso`,
+  joined: (d) => `Você entrou na sala ${d.room_code}`,
+  rejoined: (d) => `Reconectado à sala ${d.room_code}`,
+  matched: (d) => `Oponente encontrado! Sala ${d.room_code}`,
+  watching: (d) => `Assistindo à sala ${d.room_code}`,
+  match_queued: () => 'Procurando oponente...',
+  match_cancelled: () => 'Busca cancelada',
+  player_joined: (d) => `${d.player_name} entrou na sala`,
+  player_left: (d) => `${d.player_name} saiu da sala`,
+  room_closed: (d) => (d.reason === 'empty' ? 'Sala encerrada: os jogadores saíram' : 'Sala encerrada por inatividade'),
+  won: (d) => `${d.winner} venceu o jogo!`,
+  won_blocked: (d) => `${d.winner} venceu! (Jogo bloqueado - menor pontuação)`,
+  room_busy: () => 'Sala ocupada, tente novamente',
+  room_not_found: () => 'Sala não encontrada',
+  room_full: () => 'Sala cheia (máximo 2 jogadores)',
+  not_in_room: () => 'Você não está nesta sala',
+  not_in_progress: () => 'Jogo não está em andamento',
+  not_your_turn: () => 'Não é seu turno',
+  not_in_hand: () => 'Peça não encontrada na sua mão',
+  must_play_double: (d) => `Você deve jogar a dupla [${d.double}|${d.double}] como primeira peça`,
+  does_not_fit: () => 'Essa peça não pode ser jogada',
+  wrong_side: () => 'Peça não encaixa neste lado',
+  pool_empty: () => 'Pool vazio'
+};
+
+export const withMessage = (data) => {
+  if (data && data.message === undefined && MESSAGES[data.code]) {
+    return { ...data, message: MESSAGES[data.code](data) };
+  }
+  return data;
+};
+
+// Os deltas trazem os jogadores pelo lugar na mesa; lugares e nomes vêm do último estado
+export const createDecoder = () => {
+  let seats = [];
+  let names = {};
+
+  const remember = (players) => {
+    seats = Object.keys(players);
+    names = Object.fromEntries(seats.map((sid) => [sid, players[sid].name]));
+  };
+
+  const state = (data) => {
+    if (!isBinary(data)) {
+      remember(data.players || {});
+      return data;
+    }
+    const reader = new Reader(data);
+    reader.byte();
+    const roomCode = reader.text(6);
+    const version = reader.uint32();
+    const flags = reader.byte();
+    const current = reader.byte();
+    const winner = reader.byte();
+    const poolCount = reader.byte();
+    const requiredDouble = reader.byte();
+    const startingDouble = reader.byte();
+
+    const players = {};
+    const count = reader.byte();
+    for (let i = 0; i < count; i++) {
+      const handCount = reader.byte();
+      const name = reader.text();
+      players[reader.text()] = { name, hand_count: handCount };
+    }
+    remember(players);
+    const board = Array.from(reader.block(), oriented);
+    const hand = Array.from(reader.block(), (tile) => ({ left: TILES[tile][0], right: TILES[tile][1] }));
+    const moves = legalMoves(reader.block());
+
+    let startingInfo = null;
+    if (flags & HAS_STARTING_INFO) {
+      const name = players[seats[current]].name;
+      startingInfo = startingDouble !== NONE
+        ? {
+          player_name: name,
+          highest_double: startingDouble,
+          message: `${name} inicia com a dupla [${startingDouble}|${startingDouble}]`
+        }
+        : { player_name: name, message: `${name} inicia o jogo` };
+    }
+
+    return {
+      room_code: roomCode,
+      players,
+      board,
+      current_player: current !== NONE ? seats[current] : null,
+      game_started: Boolean(flags & STARTED),
+      game_finished: Boolean(flags & FINISHED),
+      winner: winner !== NONE ? players[seats[winner]].name : null,
+      pool_count: poolCount,
+      starting_info: startingInfo,
+      version,
+      my_hand: hand,
+      required_double: requiredDouble !== NONE ? requiredDouble : null,
+      legal_moves: moves
+    };
+  };
+
+  const delta = (data) => {
+    if (!isBinary(data)) return data;
+    const reader = new Reader(data);
+    reader.byte();
+    const roomCode = reader.text(6);
+    const version = reader.uint32();
+    const count = reader.byte();
+    const events = [];
+    for (let i = 0; i < count; i++) {
+      const seq = reader.uint32();
+      const type = EVENT_TYPES[reader.byte()];
+      const seat = reader.byte();
+      const tile = reader.byte();
+      const side = reader.byte();
+      const current = reader.byte();
+      const poolCount = reader.byte();
+      const handCount = reader.byte();
+      const finished = reader.byte();
+      const winner = reader.byte();
+
+      const event = { type, player: seat !== NONE ? seats[seat] : null };
+      if (tile !== NONE) event.piece = oriented(tile);
+      if (type === 'play') event.side = side ? 'right' : 'left';
+      Object.assign(event, {
+        seq,
+        current_player: current !== NONE ? seats[current] : null,
+        pool_count: poolCount,
+        hand_count: handCount,
+        game_finished: Boolean(finished),
+        winner: winner !== NONE ? names[seats[winner]] : null
+      });
+      events.push(event);
+    }
+    const result = { room_code: roomCode, version, events, legal_moves: legalMoves(reader.block()) };
+    // Aviso de fim de jogo no mesmo frame (o texto sai de withMessage)
+    const finish = FINISH_CODES[reader.byte()];
+    if (finish) result.finished = { code: finish, winner: events[events.length - 1].winner };
+    return result;
+  };
+
+  return { state, delta };
+};
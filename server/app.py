@@ -1,16 +1,57 @@
+import atexit
+import functools
+import json
 import os
-import random
-import string
-from flask import Flask, request
-from flask_socketio import SocketIO, emit, join_room, leave_room
-from flask_cors import CORS
+import time
 from dotenv import load_dotenv
-from game import DominoGame
 
 load_dotenv()
 
+def resolve_async_mode(mode):
+    """Modo assíncrono pedido; vazio escolhe como o Flask-SocketIO (eventlet, gevent, threading)"""
+    if mode:
+        return mode
+    import importlib.util
+    for candidate in ('eventlet', 'gevent'):
+        if importlib.util.find_spec(candidate) is not None:
+            return candidate
+    return 'threading'
+
+# Modo assíncrono do servidor: threading, gevent ou eventlet (vazio = detecção automática).
+# O modo é resolvido aqui, e não dentro do Flask-SocketIO, para que gevent/eventlet
+# sempre tenham o monkey patch antes de qualquer outro import: sem ele, toda
+# chamada bloqueante (Redis, bot, journal, SQLite) para o servidor inteiro.
+ASYNC_MODE = resolve_async_mode(os.getenv('SOCKETIO_ASYNC_MODE'))
+if ASYNC_MODE == 'gevent':
+    from gevent import monkey
+    monkey.patch_all()
+elif ASYNC_MODE == 'eventlet':
+    import eventlet
+    eventlet.monkey_patch()
+
+import threading
+from flask import Flask, Response, request
+from flask_socketio import SocketIO, emit
+from flask_cors import CORS
+from bot import BOT_NAME, BotPool, bot_id, is_bot, play_turn, view as bot_view
+from game import DominoGame
+from history import HistoryStore
+from journal import MoveJournal
+from lifecycle import RoomReaper
+from matchmaking import MatchQueue, RoomCodeAllocator
+from metrics import (
+    ACTIVE_SOCKETS, CONTENT_TYPE, DELTA_BATCH_EVENTS, EMIT_BYTES, EMITS, GAME_METHOD_SECONDS,
+    GAMES_FINISHED, HANDLER_SECONDS, MATCH_WAIT_SECONDS, REGISTRY, REJECTED_MOVES, Gauge
+)
+from outbox import RoomOutbox
+from profiling import SlowLog, from_env as profiler_from_env, instrument_methods
+from sessions import SessionRegistry
+from store import ConcurrentUpdateError, create_store
+from wire import COMPACT, ENCODINGS, JSON, compact_message, encode_batch, encode_state, negotiate
+
 app = Flask(__name__)
-app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'dev-secret-key')
+DEV_SECRET_KEY = 'dev-secret-key'
+app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', DEV_SECRET_KEY)
 
 CORS(app, resources={
     r"/*": {
@@ -18,62 +59,576 @@ CORS(app, resources={
     }
 })
 
-socketio = SocketIO(app, cors_allowed_origins=os.getenv('CORS_ORIGINS', 'http://localhost:5173').split(','))
-
-# Armazena as salas de jogo ativas
-games = {}
+# Com vários workers, os emits para salas passam pela fila de mensagens (ex.: redis://...)
+MESSAGE_QUEUE = os.getenv('SOCKETIO_MESSAGE_QUEUE') or None
+socketio = SocketIO(
+    app,
+    cors_allowed_origins=os.getenv('CORS_ORIGINS', 'http://localhost:5173').split(','),
+    message_queue=MESSAGE_QUEUE,
+    async_mode=ASYNC_MODE
+)
+
+# Journal das jogadas (vazio = desativado); um diretório por processo. Cada sala
+# precisa de um único gravador, então não combina com as salas compartilhadas.
+journal_dir = os.getenv('MOVE_JOURNAL_DIR')
+if journal_dir and os.getenv('ROOM_STORE_URL'):
+    raise RuntimeError('MOVE_JOURNAL_DIR não pode ser usado com ROOM_STORE_URL: '
+                       'as jogadas de uma sala ficariam espalhadas pelos journals dos workers')
+journal = MoveJournal(
+    journal_dir,
+    flush_interval=float(os.getenv('MOVE_JOURNAL_FLUSH_MS', 10)) / 1000
+) if journal_dir else None
+if journal is not None:
+    atexit.register(journal.close)
+# Armazena as salas de jogo ativas (em memória ou compartilhadas via ROOM_STORE_URL)
+store = create_store(os.getenv('ROOM_STORE_URL'), journal=journal)
+# Sala de cada sessão conectada (e sessões de cada sala)
+sessions = SessionRegistry()
+
+# Uma a cada METRICS_PAYLOAD_SAMPLE mensagens de cada evento tem o tamanho medido (0 desativa)
+PAYLOAD_SAMPLE = int(os.getenv('METRICS_PAYLOAD_SAMPLE', 10))
+_emit_metrics = {}
+
+def emit_event(event, payload, to=None, room=None):
+    """Emite para a sessão do handler atual, para a sessão to ou para a sala room
+
+    Registra a mensagem nas métricas. Clientes compactos recebem os dicionários sem
+    o texto em "message" (ver wire.py); payloads em bytes já vêm codificados.
+    """
+    bound = _emit_metrics.get(event)
+    if bound is None:
+        bound = _emit_metrics[event] = (EMITS.labels(event), EMIT_BYTES.labels(event))
+    count, size = bound
+    count.inc()
+    if PAYLOAD_SAMPLE and (count.value - 1) % PAYLOAD_SAMPLE == 0:
+        size.observe(len(payload) if isinstance(payload, bytes) else len(json.dumps(payload)))
+
+    has_message = isinstance(payload, dict) and 'message' in payload
+    if room is not None:
+        # Jogadas ainda na janela do outbox saem antes, para a sala ver tudo em ordem
+        outbox.flush(room)
+        if has_message:
+            socketio.emit(event, payload, to=room_channel(room, JSON))
+            socketio.emit(event, compact_message(payload), to=room_channel(room, COMPACT))
+        else:
+            socketio.emit(event, payload, to=room)
+        return
+    if has_message and sessions.encoding_of(request.sid if to is None else to) == COMPACT:
+        payload = compact_message(payload)
+    if to is None:
+        emit(event, payload)
+    else:
+        socketio.emit(event, payload, to=to)
+
+def emit_state(event, game, player_id, to=None):
+    """Envia o estado do jogo visto pelo jogador, na codificação da sessão dele"""
+    if player_id not in game.players:
+        payload = {}
+    elif sessions.encoding_of(player_id) == COMPACT:
+        payload = encode_state(game, player_id)
+    else:
+        payload = game.get_game_state(player_id)
+    emit_event(event, payload, to=to)
+
+def room_channel(room_code, encoding):
+    """Sala do Socket.IO com as sessões da sala que usam a codificação"""
+    return f'{room_code}:{encoding}'
+
+def watch_channel(room_code, encoding):
+    """Sala do Socket.IO com os espectadores da sala que usam a codificação"""
+    return f'{room_code}:watch:{encoding}'
+
+def session_channels(room_code, sid, watching=False):
+    """Salas do Socket.IO de uma sessão na sala: a sala, o canal da codificação e, para espectadores, o deles"""
+    encoding = sessions.encoding_of(sid)
+    channels = [room_code, room_channel(room_code, encoding)]
+    if watching:
+        channels.append(watch_channel(room_code, encoding))
+    return channels
+
+def enter_room(room_code, sid=None, watching=False):
+    """Coloca a sessão (a do handler atual, se sid não for informado) na sala e no canal da sua codificação"""
+    sid = sid or request.sid
+    for room in session_channels(room_code, sid, watching):
+        socketio.server.enter_room(sid, room, namespace='/')
+
+def exit_room(room_code, sid=None, watching=False):
+    """Tira a sessão (a do handler atual, se sid não for informado) da sala e do canal da sua codificação"""
+    sid = sid or request.sid
+    for room in session_channels(room_code, sid, watching):
+        socketio.server.leave_room(sid, room, namespace='/')
+
+def close_room_channels(room_code):
+    """Esvazia a sala do Socket.IO e os canais dos jogadores e espectadores"""
+    socketio.close_room(room_code)
+    for encoding in ENCODINGS:
+        socketio.close_room(room_channel(room_code, encoding))
+        socketio.close_room(watch_channel(room_code, encoding))
+
+def has_watchers(room_code):
+    """Se pode haver espectadores da sala (com a fila de mensagens, eles podem estar em outro worker)"""
+    return MESSAGE_QUEUE is not None or sessions.watchers(room_code) > 0
+
+def emit_to_watchers(event, room_code, payload, compact=None):
+    """Envia uma vez para todos os espectadores da sala; compact é a versão para os clientes compactos
+
+    Cada canal recebe uma única mensagem, serializada uma vez pelo Socket.IO e
+    repetida para cada espectador: o custo não cresce com o número de espectadores.
+    """
+    if not has_watchers(room_code):
+        return
+    emit_event(event, payload, to=watch_channel(room_code, JSON))
+    emit_event(event, payload if compact is None else compact, to=watch_channel(room_code, COMPACT))
+
+def rooms_by_state():
+    """Salas esperando jogador, em jogo e encerradas (calculado na coleta das métricas)"""
+    counts = {('waiting',): 0, ('started',): 0, ('finished',): 0}
+    for room_code in store.room_codes():
+        game = store.get(room_code)
+        if game is None:
+            continue
+        state = 'finished' if game.game_finished else 'started' if game.game_started else 'waiting'
+        counts[(state,)] += 1
+    return counts
+
+REGISTRY.register(Gauge('domino_rooms', 'Salas por estado', ['state'], collect=rooms_by_state))
+REGISTRY.register(Gauge(
+    'domino_spectators', 'Espectadores conectados a este processo',
+    collect=lambda: {(): sessions.watcher_count()}
+))
+
+def handle_room_evicted(room_code, reason):
+    """Avisa quem ainda está na sala removida pela limpeza e libera as sessões"""
+    emit_event('room_closed', {
+        'code': 'room_closed',
+        'room_code': room_code,
+        'reason': reason,
+        'message': 'Sala encerrada por inatividade'
+    }, room=room_code)
+    close_room_channels(room_code)
+    sessions.drop_room(room_code)
+    print(f'Sala {room_code} removida ({reason})')
+
+# Limpeza de salas: TTLs em segundos (0 desativa) e limite de salas (0 = sem limite)
+reaper = RoomReaper(
+    store,
+    idle_ttl=float(os.getenv('ROOM_IDLE_TTL', 1800)),
+    finished_ttl=float(os.getenv('ROOM_FINISHED_TTL', 300)),
+    waiting_ttl=float(os.getenv('ROOM_WAITING_TTL', 3600)),
+    max_rooms=int(os.getenv('MAX_ROOMS', 0)),
+    on_evict=handle_room_evicted
+)
+
+# Códigos de sala a partir de números reservados no armazenamento, sem sorteio:
+# não se repetem (nem entre workers, no Redis) e não seguem uma ordem visível.
+# A permutação sai do SECRET_KEY: com a chave padrão, qualquer um calcula os códigos
+if app.config['SECRET_KEY'] == DEV_SECRET_KEY and os.getenv('FLASK_ENV') != 'development':
+    raise RuntimeError('Defina SECRET_KEY: a chave padrão só é aceita com FLASK_ENV=development')
+room_codes = RoomCodeAllocator(store.reserve_codes, secret=app.config['SECRET_KEY'])
 
 def generate_room_code():
     """Gera um código único de 6 caracteres para a sala"""
-    while True:
-        code = ''.join(random.choices(string.ascii_uppercase + string.digits, k=6))
-        if code not in games:
-            return code
+    return room_codes.allocate()[0]
+
+def update_room(room_code, mutate):
+    """Aplica mutate ao jogo da sala; emite o erro e retorna (None, None) se não for possível"""
+    try:
+        game, result = store.update(room_code, mutate)
+    except ConcurrentUpdateError:
+        emit_event('error', {'code': 'room_busy', 'message': 'Sala ocupada, tente novamente'})
+        return None, None
+    if game is None:
+        emit_event('error', {'code': 'room_not_found', 'message': 'Sala não encontrada'})
+    return game, result
+
+# Perfil opcional (PROFILE_MODE=cprofile|sample; ver profiling.py) e log de handlers
+# mais lentos que SLOW_HANDLER_MS (0 desativa)
+profiler = profiler_from_env()
+if profiler:
+    instrument_methods(DominoGame, [
+        'start_game', 'play_piece', 'buy_piece', 'pass_turn', 'legal_moves', 'get_game_state',
+        'get_public_state', 'to_bytes', 'from_bytes'
+    ], GAME_METHOD_SECONDS)
+slow_log = SlowLog(float(os.getenv('SLOW_HANDLER_MS', 0)) / 1000, os.getenv('SLOW_LOG_PATH') or None)
+
+def timed(event):
+    """Mede o tempo do handler (incluindo a espera pelo lock da sala) no histograma do evento"""
+    histogram = HANDLER_SECONDS.labels(event)
+
+    def decorator(handler):
+        inner = profiler.wrap(handler) if profiler else handler
+
+        @functools.wraps(handler)
+        def wrapper(*args):
+            started = time.perf_counter()
+            try:
+                return inner(*args)
+            finally:
+                elapsed = time.perf_counter() - started
+                histogram.observe(elapsed)
+                slow_log.record(event, request.sid, args[0] if args else None, elapsed)
+        return wrapper
+    return decorator
+
+def reject(event, result):
+    """Recusa a jogada: conta o motivo e avisa o jogador"""
+    reason = result.get('reason', 'unknown')
+    REJECTED_MOVES.labels(event, reason).inc()
+    # Parâmetros da mensagem (ex.: a dupla obrigatória) seguem junto do código
+    params = {key: value for key, value in result.items() if key not in ('success', 'message', 'reason')}
+    emit_event('error', {'code': reason, 'message': result['message'], **params})
+
+def serialized_by_room(handler):
+    """Executa o handler com o lock da sala do evento
+
+    Jogadas na mesma sala ficam em série (e os emits saem na ordem das versões);
+    salas diferentes andam em paralelo.
+    """
+    @functools.wraps(handler)
+    def wrapper(data):
+        with store.lock((data.get('room_code') or '').upper()):
+            return handler(data)
+    return wrapper
+
+def finish_notice(result):
+    """Aviso de fim de jogo da jogada (None se o jogo continua)"""
+    if result.get('game_finished'):
+        code, message = 'won', f'{result["winner"]} venceu o jogo!'
+        GAMES_FINISHED.labels('domino').inc()
+    elif result.get('game_blocked'):
+        code, message = 'won_blocked', f'{result["winner"]} venceu! (Jogo bloqueado - menor pontuação)'
+        GAMES_FINISHED.labels('blocked').inc()
+    else:
+        return None
+    return {'code': code, 'winner': result['winner'], 'message': message}
+
+def send_batch(batch):
+    """Envia a cada jogador o lote de eventos da sala, na codificação da sessão dele
+
+    Os espectadores recebem a visão pública do lote (sem peças compradas nem
+    jogadas possíveis), montada uma vez por codificação.
+    """
+    DELTA_BATCH_EVENTS.observe(len(batch.events))
+    for player_id in batch.moves:
+        if sessions.encoding_of(player_id) == COMPACT:
+            emit_event('game_delta', encode_batch(batch, player_id), to=player_id)
+        else:
+            emit_event('game_delta', batch.view(player_id), to=player_id)
+    if has_watchers(batch.room_code):
+        emit_to_watchers('game_delta', batch.room_code, batch.view(None), compact=encode_batch(batch, None))
+
+# Jogadas da mesma sala dentro de BROADCAST_COALESCE_MS saem em um só game_delta por
+# jogador, já com o aviso de fim de jogo. Desligado por padrão (0 envia cada jogada na
+# hora): a janela atrasa toda jogada e cada uma abre uma tarefa em segundo plano
+outbox = RoomOutbox(
+    send_batch,
+    window=float(os.getenv('BROADCAST_COALESCE_MS', 0)) / 1000,
+    spawn=socketio.start_background_task,
+    sleep=socketio.sleep,
+    lock=store.lock,
+    recipients=lambda game: [player_id for player_id in game.players if not is_bot(player_id)]
+)
+
+def broadcast_delta(game, result):
+    """Envia para cada jogador o evento da última jogada (com o número de versão e o fim do jogo)"""
+    notice = finish_notice(result)
+    if notice is not None and history is not None:
+        history.record(game, blocked=notice['code'] == 'won_blocked')
+    outbox.push(game, notice)
+
+# Histórico das partidas encerradas em SQLite (vazio = desativado); a gravação é em lote,
+# numa thread própria, a cada HISTORY_FLUSH_MS. Vários workers podem usar o mesmo arquivo
+history_path = os.getenv('HISTORY_DB')
+history = HistoryStore(
+    history_path,
+    flush_interval=float(os.getenv('HISTORY_FLUSH_MS', 500)) / 1000,
+    is_bot=is_bot,
+    wait=socketio.sleep
+) if history_path else None
+if history is not None:
+    atexit.register(history.close)
+    REGISTRY.register(Gauge(
+        'domino_history_pending', 'Partidas encerradas esperando gravação no histórico',
+        collect=lambda: {(): history.pending()}
+    ))
+
+# Bot: a busca roda em processos separados (BOT_WORKERS; 0 = no próprio processo),
+# com orçamento de tempo por jogada em milissegundos
+bots = BotPool(
+    workers=int(os.getenv('BOT_WORKERS', os.cpu_count() or 1)),
+    budget=float(os.getenv('BOT_MOVE_BUDGET_MS', 80)) / 1000,
+    sleep=socketio.sleep
+)
+# Salas com turno do bot em andamento neste processo
+bot_turns = set()
+bot_turns_lock = threading.Lock()
+
+def schedule_bot_turn(game):
+    """Se for a vez do bot, joga em segundo plano para não segurar o handler"""
+    player_id = game.get_current_player_id()
+    if game.game_finished or player_id is None or not is_bot(player_id):
+        return
+    with bot_turns_lock:
+        if game.room_code in bot_turns:
+            return
+        bot_turns.add(game.room_code)
+    socketio.start_background_task(run_bot_turns, game.room_code, player_id)
+
+def run_bot_turns(room_code, player_id):
+    """Joga enquanto for a vez do bot (comprar não passa a vez)"""
+    try:
+        while True:
+            with store.lock(room_code):
+                game = store.get(room_code)
+                if game is None or game.game_finished or game.get_current_player_id() != player_id:
+                    break
+                version = game.version
+                view = bot_view(game, player_id)
+            # A busca roda sem o lock da sala
+            move = bots.choose(view)
+
+            def act(game):
+                # O jogo mudou durante a busca (ex.: o outro jogador saiu): busca de novo
+                if game.version != version:
+                    return None
+                return play_turn(game, player_id, move)
+
+            with store.lock(room_code):
+                try:
+                    game, result = store.update(room_code, act)
+                except ConcurrentUpdateError:
+                    continue
+                if game is None:
+                    break
+                if result is None:
+                    continue
+                if not result['success']:
+                    print(f'Jogada inválida do bot na sala {room_code}: {result["message"]}')
+                    break
+                broadcast_delta(game, result)
+    finally:
+        with bot_turns_lock:
+            bot_turns.discard(room_code)
+    # Uma jogada do oponente pode ter chegado enquanto a sala ainda estava marcada
+    with store.lock(room_code):
+        game = store.get(room_code)
+        if game is not None:
+            schedule_bot_turn(game)
+
+# Partida rápida: a fila é pareada em lote a cada MATCH_TICK_MS. MATCH_RATING_BUCKET > 0
+# só pareia ratings da mesma faixa até MATCH_MAX_WAIT segundos de espera
+match_queue = MatchQueue(
+    rating_bucket=int(os.getenv('MATCH_RATING_BUCKET', 0)),
+    max_wait=float(os.getenv('MATCH_MAX_WAIT', 10))
+)
+MATCH_TICK = float(os.getenv('MATCH_TICK_MS', 200)) / 1000
+_matchmaking_started = False
+
+REGISTRY.register(Gauge(
+    'domino_match_queue', 'Jogadores esperando partida rápida neste processo',
+    collect=lambda: {(): len(match_queue)}
+))
+
+def start_matchmaking():
+    """Inicia o pareamento periódico em segundo plano (uma vez por processo)"""
+    global _matchmaking_started
+    if _matchmaking_started:
+        return
+    _matchmaking_started = True
+
+    def loop():
+        while True:
+            socketio.sleep(MATCH_TICK)
+            try:
+                pairs = match_queue.pair()
+                if pairs:
+                    create_matches(pairs)
+            except Exception as exc:
+                print(f'Erro no pareamento: {exc}')
+
+    socketio.start_background_task(loop)
+
+def create_matches(pairs):
+    """Cria as salas dos pares em lote, já com o jogo iniciado, e avisa os jogadores"""
+    # Quem desconectou enquanto esperava fica de fora; o parceiro volta para a fila
+    ready = []
+    for pair in pairs:
+        connected = [ticket for ticket in pair if sessions.is_connected(ticket.sid)]
+        if len(connected) == 2:
+            ready.append(pair)
+        else:
+            match_queue.requeue(connected)
+    if not ready:
+        return
+
+    reaper.make_room_for(len(ready))
+    games = []
+    for room_code, (first, second) in zip(room_codes.allocate(len(ready)), ready):
+        game = store.new_game(room_code)
+        game.add_player(first.sid, first.name)
+        game.add_player(second.sid, second.name)
+        game.start_game()
+        games.append(game)
+
+    now = time.monotonic()
+    for game, added, pair in zip(games, store.add_many(games), ready):
+        if not added:
+            # Código já em uso (só depois de dar a volta nos códigos): tenta no próximo lote
+            match_queue.requeue(list(pair))
+            continue
+        room_code = game.room_code
+        with store.lock(room_code):
+            for ticket in pair:
+                MATCH_WAIT_SECONDS.observe(now - ticket.enqueued_at)
+                sessions.bind(ticket.sid, room_code)
+                enter_room(room_code, ticket.sid)
+                emit_event('room_joined', {
+                    'code': 'matched',
+                    'room_code': room_code,
+                    'player_name': ticket.name,
+                    'message': f'Oponente encontrado! Sala {room_code}'
+                }, to=ticket.sid)
+            for ticket in pair:
+                emit_state('game_started', game, ticket.sid, to=ticket.sid)
+        # Desconectou entre a checagem e a entrada na sala: sai como em um disconnect
+        for ticket in pair:
+            if not sessions.is_connected(ticket.sid):
+                leave_current_room(ticket.sid)
 
 @app.route('/')
 def index():
-    return {"status": "Dominó Server Running", "active_rooms": len(games)}
+    return {
+        "status": "Dominó Server Running",
+        "active_rooms": len(store),
+        "evicted_rooms": reaper.evicted
+    }
+
+def history_range():
+    """Período dos parâmetros since e until (segundos desde a época; ausentes = sem limite)"""
+    return request.args.get('since', type=float), request.args.get('until', type=float)
+
+@app.route('/leaderboard')
+def leaderboard():
+    """Ranking por vitórias no período (?since=&until=&limit=)"""
+    if history is None:
+        return {"error": "Histórico desativado"}, 404
+    since, until = history_range()
+    limit = min(max(request.args.get('limit', 20, type=int), 1), 100)
+    return {
+        "since": since,
+        "until": until,
+        "players": history.leaderboard(limit, since, until)
+    }
+
+@app.route('/players/<name>/games')
+def player_games(name):
+    """Últimas partidas do jogador no período (?since=&until=&limit=)"""
+    if history is None:
+        return {"error": "Histórico desativado"}, 404
+    since, until = history_range()
+    limit = min(max(request.args.get('limit', 20, type=int), 1), 100)
+    return {"name": name, "games": history.player_games(name, limit, since, until)}
+
+@app.route('/metrics')
+def metrics():
+    return Response(REGISTRY.render(), content_type=CONTENT_TYPE)
 
 @socketio.on('connect')
-def handle_connect():
-    print(f'Cliente conectado: {request.sid}')
-    emit('connected', {'message': 'Conectado ao servidor'})
+def handle_connect(auth=None):
+    # Codificação das mensagens pedida pelo cliente (auth={'encoding': 'compact'})
+    encoding = negotiate(auth)
+    sessions.set_encoding(request.sid, encoding)
+    print(f'Cliente conectado: {request.sid} ({encoding})')
+    ACTIVE_SOCKETS.inc()
+    reaper.start(socketio, interval=float(os.getenv('ROOM_SWEEP_INTERVAL', 30)))
+    start_matchmaking()
+    if profiler:
+        profiler.start()
+    emit_event('connected', {'code': 'connected', 'encoding': encoding, 'message': 'Conectado ao servidor'})
+
+def leave_current_room(sid=None):
+    """Remove o jogador (o do handler atual, se sid não for informado) da sala em que está, se houver"""
+    sid = sid or request.sid
+    # Quem entra em outra sala ou desconecta sai também da fila da partida rápida
+    match_queue.cancel(sid)
+    watched = sessions.unwatch(sid)
+    if watched is not None:
+        exit_room(watched, sid, watching=True)
+    room_code = sessions.unbind(sid)
+    if room_code is None:
+        return
+
+    def remove(game):
+        if sid not in game.players:
+            return None
+        player_name = game.players[sid]['name']
+        game.remove_player(sid)
+        return player_name
+
+    # Lock da sala antiga; nunca é pego com o lock de outra sala na mão
+    with store.lock(room_code):
+        try:
+            game, player_name = store.update(room_code, remove)
+        except ConcurrentUpdateError:
+            return
+        if game is None or player_name is None:
+            return
+
+        exit_room(room_code, sid)
+
+        # Só notifica se ainda há outros jogadores na sala
+        if len(game.players) > 0:
+            emit_event('player_left', {
+                'code': 'player_left',
+                'player_name': player_name,
+                'message': f'{player_name} saiu da sala'
+            }, room=room_code)
+
+        # Remove sala se estiver vazia (ou só com o bot); avisa quem estava assistindo
+        if all(is_bot(player_id) for player_id in game.players):
+            store.delete(room_code)
+            if has_watchers(room_code):
+                emit_event('room_closed', {
+                    'code': 'room_closed',
+                    'room_code': room_code,
+                    'reason': 'empty',
+                    'message': 'Sala encerrada: os jogadores saíram'
+                }, room=room_code)
+                close_room_channels(room_code)
+            sessions.drop_room(room_code)
+            print(f'Sala {room_code} removida (vazia)')
 
 @socketio.on('disconnect')
 def handle_disconnect():
     print(f'Cliente desconectado: {request.sid}')
-
-    # Remove jogador de qualquer sala
-    for room_code, game in list(games.items()):
-        if request.sid in game.players:
-            player_name = game.players[request.sid]['name']
-            game.remove_player(request.sid)
-            leave_room(room_code)
-
-            # Só notifica se ainda há outros jogadores na sala
-            if len(game.players) > 0:
-                emit('player_left', {
-                    'message': f'{player_name} saiu da sala'
-                }, room=room_code)
-            
-            # Remove sala se estiver vazia
-            if len(game.players) == 0:
-                del games[room_code]
-                print(f'Sala {room_code} removida (vazia)')
+    ACTIVE_SOCKETS.dec()
+    # Antes de sair da sala: o pareamento confere se a sessão ainda está conectada
+    sessions.forget(request.sid)
+    leave_current_room()
 
 @socketio.on('create_room')
+@timed('create_room')
 def handle_create_room(data):
     """Cria uma nova sala de jogo"""
     player_name = data.get('name', 'Jogador')
-    room_code = generate_room_code()
 
-    game = DominoGame(room_code)
-    game.add_player(request.sid, player_name)
-    games[room_code] = game
+    # Uma sessão fica em uma sala por vez
+    leave_current_room()
+    reaper.make_room_for(1)
 
-    join_room(room_code)
+    # Outro worker pode ter usado o mesmo código nesse meio tempo
+    while True:
+        room_code = generate_room_code()
+        game = store.new_game(room_code)
+        game.add_player(request.sid, player_name)
+        if store.add(game):
+            break
+    sessions.bind(request.sid, room_code)
 
-    emit('room_created', {
+    enter_room(room_code)
+
+    emit_event('room_created', {
+        'code': 'room_created',
         'room_code': room_code,
         'player_name': player_name,
         'message': f'Sala {room_code} criada com sucesso'
@@ -82,162 +637,259 @@ def handle_create_room(data):
     print(f'Sala criada: {room_code} por {player_name}')
 
 @socketio.on('join_room')
+@timed('join_room')
 def handle_join_room(data):
     """Entra em uma sala existente"""
     room_code = data.get('room_code', '').upper()
     player_name = data.get('name', 'Jogador')
 
-    if room_code not in games:
-        emit('error', {'message': 'Sala não encontrada'})
-        return
-
-    game = games[room_code]
+    # Leitura e escrita da sala com o lock dela; sair da sala antiga fica fora do lock
+    with store.lock(room_code):
+        game = store.get(room_code)
+        if game is None:
+            emit_event('error', {'code': 'room_not_found', 'message': 'Sala não encontrada'})
+            return
 
-    # Verifica se o jogador já está na sala (reconexão)
-    if request.sid in game.players:
-        join_room(room_code)
-        emit('room_joined', {
+        # Verifica se o jogador já está na sala (reconexão)
+        if request.sid in game.players:
+            enter_room(room_code)
+            emit_event('room_joined', {
+                'code': 'rejoined',
+                'room_code': room_code,
+                'player_name': player_name,
+                'message': f'Reconectado à sala {room_code}'
+            })
+
+            # Se o jogo já começou, envia o estado atual
+            if game.game_started:
+                emit_state('game_started', game, request.sid)
+
+            print(f'{player_name} se reconectou à sala {room_code}')
+            return
+
+        if len(game.players) >= 2:
+            emit_event('error', {'code': 'room_full', 'message': 'Sala cheia (máximo 2 jogadores)'})
+            return
+
+    # Uma sessão fica em uma sala por vez
+    leave_current_room()
+
+    sid = request.sid
+
+    def seat(game):
+        if len(game.players) >= 2:
+            return False
+        game.add_player(sid, player_name)
+        # Se temos 2 jogadores, inicia o jogo
+        if len(game.players) == 2:
+            game.start_game()
+        return True
+
+    with store.lock(room_code):
+        game, seated = update_room(room_code, seat)
+        if game is None:
+            return
+        if not seated:
+            emit_event('error', {'code': 'room_full', 'message': 'Sala cheia (máximo 2 jogadores)'})
+            return
+
+        sessions.bind(sid, room_code)
+        enter_room(room_code)
+
+        # Notifica o jogador que entrou
+        emit_event('room_joined', {
+            'code': 'joined',
             'room_code': room_code,
             'player_name': player_name,
-            'message': f'Reconectado à sala {room_code}'
+            'message': f'Você entrou na sala {room_code}'
         })
-        
-        # Se o jogo já começou, envia o estado atual
+
+        # Notifica todos os jogadores da sala
+        emit_event('player_joined', {
+            'code': 'player_joined',
+            'player_name': player_name,
+            'players_count': len(game.players),
+            'message': f'{player_name} entrou na sala'
+        }, room=room_code)
+
+        # Se o jogo começou, envia estado do jogo para cada jogador (e a visão pública aos espectadores)
         if game.game_started:
-            game_state = game.get_game_state(request.sid)
-            emit('game_started', game_state)
-        
-        print(f'{player_name} se reconectou à sala {room_code}')
-        return
+            for player_id in game.players:
+                emit_state('game_started', game, player_id, to=player_id)
+            emit_to_watchers('game_started', room_code, game.get_spectator_state())
 
-    if not game.add_player(request.sid, player_name):
-        emit('error', {'message': 'Sala cheia (máximo 2 jogadores)'})
+    print(f'{player_name} entrou na sala {room_code} (Total: {len(game.players)} jogadores)')
+
+@socketio.on('add_bot')
+@timed('add_bot')
+@serialized_by_room
+def handle_add_bot(data):
+    """Coloca o bot como segundo jogador na sala de quem está esperando"""
+    room_code = data.get('room_code', '').upper()
+    sid = request.sid
+    if sessions.room_of(sid) != room_code:
+        emit_event('error', {'code': 'not_in_room', 'message': 'Você não está nesta sala'})
         return
 
-    join_room(room_code)
+    def seat(game):
+        if len(game.players) != 1 or sid not in game.players:
+            return False
+        game.add_player(bot_id(room_code), BOT_NAME)
+        game.start_game()
+        return True
 
-    # Notifica o jogador que entrou
-    emit('room_joined', {
-        'room_code': room_code,
-        'player_name': player_name,
-        'message': f'Você entrou na sala {room_code}'
-    })
+    game, seated = update_room(room_code, seat)
+    if game is None:
+        return
+    if not seated:
+        emit_event('error', {'code': 'room_full', 'message': 'Sala cheia (máximo 2 jogadores)'})
+        return
 
-    # Notifica todos os jogadores da sala
-    emit('player_joined', {
-        'player_name': player_name,
+    emit_event('player_joined', {
+        'code': 'player_joined',
+        'player_name': BOT_NAME,
         'players_count': len(game.players),
-        'message': f'{player_name} entrou na sala'
+        'message': f'{BOT_NAME} entrou na sala'
     }, room=room_code)
+    emit_state('game_started', game, sid)
+    emit_to_watchers('game_started', room_code, game.get_spectator_state())
+    schedule_bot_turn(game)
 
-    # Se temos 2 jogadores, inicia o jogo
-    if len(game.players) == 2:
-        game.start_game()
-
-        # Envia estado do jogo para cada jogador
-        for player_id in game.players:
-            game_state = game.get_game_state(player_id)
-            emit('game_started', game_state, room=player_id)
-
-    print(f'{player_name} entrou na sala {room_code} (Total: {len(game.players)} jogadores)')
+    print(f'Bot entrou na sala {room_code}')
 
 @socketio.on('play_piece')
+@timed('play_piece')
+@serialized_by_room
 def handle_play_piece(data):
     room_code = data.get('room_code')
     piece_left = data.get('left')
     piece_right = data.get('right')
     side = data.get('side', 'right')  # 'left' ou 'right'
+    sid = request.sid
     
-    if room_code not in games:
-        emit('error', {'message': 'Sala não encontrada'})
+    game, result = update_room(room_code, lambda game: game.play_piece(sid, piece_left, piece_right, side))
+    if game is None:
         return
     
-    game = games[room_code]
-    result = game.play_piece(request.sid, piece_left, piece_right, side)
-    
     if not result['success']:
-        emit('error', {'message': result['message']})
+        reject('play_piece', result)
         return
     
-    for player_id in game.players:
-        game_state = game.get_game_state(player_id)
-        emit('game_update', game_state, room=player_id)
-    
-    if result.get('game_finished'):
-        emit('game_finished', {
-            'winner': result['winner'],
-            'message': f'{result["winner"]} venceu o jogo!'
-        }, room=room_code)
+    broadcast_delta(game, result)
+    schedule_bot_turn(game)
 
 @socketio.on('buy_piece')
+@timed('buy_piece')
+@serialized_by_room
 def handle_buy_piece(data):
     """Jogador compra uma peça do pool"""
     room_code = data.get('room_code')
+    sid = request.sid
 
-    if room_code not in games:
-        emit('error', {'message': 'Sala não encontrada'})
+    game, result = update_room(room_code, lambda game: game.buy_piece(sid))
+    if game is None:
         return
 
-    game = games[room_code]
-    result = game.buy_piece(request.sid)
-
     if not result['success']:
-        emit('error', {'message': result['message']})
-        return
-
-    # Atualiza estado para todos os jogadores
-    for player_id in game.players:
-        game_state = game.get_game_state(player_id)
-        emit('game_update', game_state, room=player_id)
-        
-    # Verifica se o jogo está bloqueado após a compra
-    if result.get('game_blocked'):
-        emit('game_finished', {
-            'winner': result['winner'],
-            'message': f'{result["winner"]} venceu! (Jogo bloqueado - menor pontuação)'
-        }, room=room_code)
+        reject('buy_piece', result)
+        return
+
+    # Envia só o evento da jogada; o estado completo vai apenas na entrada ou em caso de lacuna
+    broadcast_delta(game, result)
 
 @socketio.on('pass_turn')
+@timed('pass_turn')
+@serialized_by_room
 def handle_pass_turn(data):
     """Jogador passa a vez"""
     room_code = data.get('room_code')
+    sid = request.sid
 
-    if room_code not in games:
-        emit('error', {'message': 'Sala não encontrada'})
+    game, result = update_room(room_code, lambda game: game.pass_turn(sid))
+    if game is None:
         return
 
-    game = games[room_code]
-    result = game.pass_turn(request.sid)
-
     if not result['success']:
-        emit('error', {'message': result['message']})
-        return
-
-    # Atualiza estado para todos os jogadores
-    for player_id in game.players:
-        game_state = game.get_game_state(player_id)
-        emit('game_update', game_state, room=player_id)
-        
-    # Verifica se o jogo está bloqueado
-    if result.get('game_blocked'):
-        emit('game_finished', {
-            'winner': result['winner'],
-            'message': f'{result["winner"]} venceu! (Jogo bloqueado - menor pontuação)'
-        }, room=room_code)
+        reject('pass_turn', result)
+        return
+
+    # Envia só o evento da jogada; o estado completo vai apenas na entrada ou em caso de lacuna
+    broadcast_delta(game, result)
+    schedule_bot_turn(game)
+
+@socketio.on('quick_match')
+@timed('quick_match')
+def handle_quick_match(data):
+    """Entra na fila da partida rápida; a sala é criada quando aparecer um oponente"""
+    player_name = data.get('name', 'Jogador')
+    rating = data.get('rating')
+    if not isinstance(rating, int) or isinstance(rating, bool):
+        rating = None
+
+    # Uma sessão fica em uma sala (ou na fila) por vez
+    leave_current_room()
+    # A resposta sai antes de entrar na fila, para não se misturar com os emits do pareamento
+    emit_event('match_queued', {
+        'code': 'match_queued',
+        'waiting': len(match_queue) + 1,
+        'message': 'Procurando oponente...'
+    })
+    match_queue.enqueue(request.sid, player_name, rating)
+
+@socketio.on('cancel_match')
+@timed('cancel_match')
+def handle_cancel_match(data=None):
+    """Sai da fila da partida rápida"""
+    if match_queue.cancel(request.sid):
+        emit_event('match_cancelled', {'code': 'match_cancelled', 'message': 'Busca cancelada'})
+
+@socketio.on('watch_room')
+@timed('watch_room')
+def handle_watch_room(data):
+    """Assiste a uma sala como espectador: visão pública do jogo, sem as mãos"""
+    room_code = data.get('room_code', '').upper()
+    if store.get(room_code) is None:
+        emit_event('error', {'code': 'room_not_found', 'message': 'Sala não encontrada'})
+        return
+
+    # Uma sessão fica em uma sala (jogando ou assistindo) por vez
+    leave_current_room()
+
+    with store.lock(room_code):
+        game = store.get(room_code)
+        if game is None:
+            emit_event('error', {'code': 'room_not_found', 'message': 'Sala não encontrada'})
+            return
+
+        sessions.watch(request.sid, room_code)
+        enter_room(room_code, watching=True)
+        emit_event('watching', {
+            'code': 'watching',
+            'room_code': room_code,
+            'message': f'Assistindo à sala {room_code}'
+        })
+        # Daqui em diante chegam só os deltas públicos, pelo canal dos espectadores
+        emit_event('game_state', game.get_spectator_state())
 
 @socketio.on('get_game_state')
+@timed('get_game_state')
+@serialized_by_room
 def handle_get_game_state(data):
-    """Retorna o estado atual do jogo"""
+    """Retorna o estado atual do jogo (usado pelo cliente ao detectar lacuna de versão)"""
     room_code = data.get('room_code')
 
-    if room_code not in games:
-        emit('error', {'message': 'Sala não encontrada'})
+    game = store.get(room_code)
+    if game is None:
+        emit_event('error', {'code': 'room_not_found', 'message': 'Sala não encontrada'})
         return
 
-    game = games[room_code]
-    game_state = game.get_game_state(request.sid)
-    emit('game_state', game_state)
+    if request.sid not in game.players and sessions.watched_by(request.sid) == game.room_code:
+        emit_event('game_state', game.get_spectator_state())
+        return
+    emit_state('game_state', game, request.sid)
 
 if __name__ == '__main__':
     port = int(os.getenv('PORT', 5000))
-    socketio.run(app, host='0.0.0.0', port=port, debug=False)
+    # O modo threading usa o servidor do Werkzeug; só roda se escolhido explicitamente
+    socketio.run(app, host='0.0.0.0', port=port, debug=False,
+                 allow_unsafe_werkzeug=ASYNC_MODE == 'threading')
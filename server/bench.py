@@ -0,0 +1,369 @@
+"""Benchmarks do motor do jogo e do caminho dos eventos no servidor.
+
+Uso: python bench.py [--only engine socket ...]
+     python bench.py --save bench-baseline.json
+     python bench.py --compare bench-baseline.json [--tolerance 0.25]
+
+Cada benchmark reporta o melhor tempo por operação entre as repetições. --save
+grava os resultados como linha de base; --compare mede de novo e sai com código 1
+se algum benchmark ficou mais lento que a base além da tolerância. Compare só
+resultados da mesma máquina e da mesma versão do Python.
+
+bench-baseline.json (versionado) é a base de referência do repositório, gravada
+com --save; a máquina e a versão do Python estão no próprio arquivo. Para
+atualizá-la depois de uma otimização aceita (ou ao trocar a máquina de
+referência), rode os conjuntos completos na máquina de referência e faça commit
+do arquivo: python bench.py --save bench-baseline.json
+"""
+import argparse
+import contextlib
+import gc
+import io
+import json
+import os
+import pickle
+import platform
+import random
+import sys
+import time
+import timeit
+from typing import Callable, Dict, List, Optional, Tuple
+
+from game import TILES, Board, DominoGame, DominoPiece
+
+def _build_chain() -> List[tuple]:
+    """Monta uma cadeia válida, alternando os lados, com as peças já orientadas"""
+    remaining = [(a, b) for a in range(7) for b in range(a, 7) if (a, b) != (0, 0)]
+    moves = [('right', DominoPiece(0, 0).oriented(False))]
+    ends = {'left': 0, 'right': 0}
+    while True:
+        preferred = 'left' if len(moves) % 2 else 'right'
+        for side in (preferred, 'right' if preferred == 'left' else 'left'):
+            end = ends[side]
+            match = next((t for t in remaining if end in t), None)
+            if match:
+                break
+        else:
+            return moves
+        remaining.remove(match)
+        other = match[1] if match[0] == end else match[0]
+        piece = DominoPiece(*match)
+        if side == 'left':
+            placement = piece.oriented(piece.right != end)
+        else:
+            placement = piece.oriented(piece.left != end)
+        moves.append((side, placement))
+        ends[side] = other
+
+CHAIN = _build_chain()
+
+def play_chain_list():
+    """Tabuleiro antigo: lista com insert(0) e leitura de board[0]/board[-1]"""
+    board = []
+    for side, piece in CHAIN:
+        if board:
+            _ = board[0].left, board[-1].right
+        if side == 'left':
+            board.insert(0, piece)
+        else:
+            board.append(piece)
+
+def play_chain_board():
+    """Tabuleiro novo: deque com pontas em cache"""
+    board = Board()
+    for side, piece in CHAIN:
+        if len(board):
+            _ = board.left_end, board.right_end
+        if side == 'left':
+            board.place_left(piece)
+        else:
+            board.place_right(piece)
+
+def _full_boards():
+    as_list, as_board = [], Board()
+    for side, piece in CHAIN:
+        if side == 'left':
+            as_list.insert(0, piece)
+            as_board.place_left(piece)
+        else:
+            as_list.append(piece)
+            as_board.place_right(piece)
+    return as_list, as_board
+
+FULL_LIST, FULL_BOARD = _full_boards()
+
+def ends_list():
+    return FULL_LIST[0].left, FULL_LIST[-1].right
+
+def ends_board():
+    return FULL_BOARD.left_end, FULL_BOARD.right_end
+
+def random_game(seed: int, max_moves: int = 200) -> DominoGame:
+    """Joga uma partida com jogadas legais aleatórias, parando após max_moves"""
+    rng = random.Random(seed)
+    game = DominoGame(f"B{seed:05d}", rng=random.Random(seed))
+    game.add_player(f"sid-a-{seed}", "Ana")
+    game.add_player(f"sid-b-{seed}", "Bruno")
+    game.start_game()
+    for _ in range(max_moves):
+        if game.game_finished:
+            break
+        pid = game.get_current_player_id()
+        tiles = [TILES[i] for i in range(len(TILES)) if game.players[pid]["hand"] >> i & 1]
+        rng.shuffle(tiles)
+        if not any(game.play_piece(pid, a, b, side)["success"]
+                   for a, b in tiles for side in ('right', 'left')):
+            if not game.buy_piece(pid)["success"]:
+                game.pass_turn(pid)
+    return game
+
+# Resultados da execução atual: nome -> segundos por operação
+RESULTS: Dict[str, float] = {}
+
+def _report(name: str, best: float) -> float:
+    RESULTS[name] = best
+    print(f'{name:<32} {best * 1e9:10.1f} ns/op')
+    return best
+
+def run(name: str, fn: Callable, per_call: int = 1, number: int = 20000, repeat: int = 5) -> float:
+    return _report(name, min(timeit.repeat(fn, number=number, repeat=repeat)) / (number * per_call))
+
+def run_batch(name: str, prepare: Callable[[], Tuple[Callable[[], int], object]], repeat: int = 5,
+              cleanup: Optional[Callable[[object], None]] = None, quiet: bool = False) -> float:
+    """Para operações que consomem o estado: prepare monta (fn, estado) fora da medição
+
+    fn() roda uma vez sobre o estado preparado e retorna quantas operações fez;
+    cleanup(estado) roda depois, também fora da medição. quiet esconde os prints
+    do código medido (os logs do servidor, por exemplo).
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        with contextlib.redirect_stdout(io.StringIO()) if quiet else contextlib.nullcontext():
+            fn, state = prepare()
+            # Como no timeit: sem coleta de lixo durante a medição
+            gc.disable()
+            try:
+                started = time.perf_counter()
+                operations = fn()
+                best = min(best, (time.perf_counter() - started) / operations)
+            finally:
+                gc.enable()
+            if cleanup:
+                cleanup(state)
+    return _report(name, best)
+
+def board_suite():
+    moves = len(CHAIN)
+    run('board/list (antes) por jogada', play_chain_list, per_call=moves)
+    run('board/deque (depois) por jogada', play_chain_board, per_call=moves)
+    run('pontas/list (antes)', ends_list, number=200000)
+    run('pontas/cache (depois)', ends_board, number=200000)
+
+def snapshot_suite():
+    # Partida no meio; a ida e volta dos bytes é conferida em tests/test_snapshot.py
+    mid = random_game(15, max_moves=15)
+    for name, encode, decode in (
+        ('snapshot/bytes', DominoGame.to_bytes, DominoGame.from_bytes),
+        ('snapshot/json', lambda g: json.dumps(g.to_snapshot(), separators=(',', ':')).encode(),
+         lambda raw: DominoGame.from_snapshot(json.loads(raw))),
+        ('snapshot/pickle', pickle.dumps, pickle.loads),
+    ):
+        raw = encode(mid)
+        print(f'{name:<32} {len(raw):10d} bytes')
+        run(f'{name} encode', lambda: encode(mid), number=20000)
+        run(f'{name} decode', lambda: decode(raw), number=20000)
+
+def _new_game(seed: int) -> DominoGame:
+    game = DominoGame(f"E{seed:05d}", rng=random.Random(seed))
+    game.add_player("a", "Ana")
+    game.add_player("b", "Bruno")
+    return game
+
+def record_game(seed: int) -> List[Tuple[str, str, tuple]]:
+    """Joga uma partida com jogadas legais aleatórias e retorna as ações, para repetir depois"""
+    rng = random.Random(seed)
+    game = _new_game(seed)
+    game.start_game()
+    actions = []
+    while not game.game_finished:
+        pid = game.get_current_player_id()
+        moves = game.legal_moves(pid)
+        if moves:
+            piece, side = rng.choice(moves)
+            action = ("play_piece", pid, (piece.left, piece.right, side))
+        elif game.dominoes_pool:
+            action = ("buy_piece", pid, ())
+        else:
+            action = ("pass_turn", pid, ())
+        name, pid, args = action
+        assert getattr(game, name)(pid, *args)["success"]
+        actions.append(action)
+    return actions
+
+ENGINE_GAMES = 200
+
+def engine_suite():
+    game = _new_game(0)
+    run('engine/generate_dominoes', game.generate_dominoes, number=100000)
+
+    def prepare_start():
+        games = [_new_game(seed) for seed in range(ENGINE_GAMES)]
+        return lambda: sum(game.start_game() for game in games), games
+    run_batch('engine/start_game', prepare_start)
+
+    recorded = [record_game(seed) for seed in range(ENGINE_GAMES)]
+
+    def prepare_full_games():
+        games = [_new_game(seed) for seed in range(ENGINE_GAMES)]
+        for game in games:
+            game.start_game()
+
+        def play():
+            for game, actions in zip(games, recorded):
+                for name, pid, args in actions:
+                    getattr(game, name)(pid, *args)
+            return sum(len(actions) for actions in recorded)
+        return play, games
+    run_batch('engine/play_piece (partidas)', prepare_full_games)
+
+    # Posições do meio e do fim das partidas gravadas
+    positions = []
+    for seed, actions in enumerate(recorded[:50]):
+        for stop in (len(actions) // 2, len(actions) - 1):
+            position = _new_game(seed)
+            position.start_game()
+            for name, pid, args in actions[:stop]:
+                getattr(position, name)(pid, *args)
+            positions.append(position)
+    run('engine/check_game_blocked', lambda: [p.check_game_blocked() for p in positions],
+        per_call=len(positions), number=200)
+    # Versão nova a cada chamada, como depois de uma jogada (sem o cache da parte pública)
+    def game_state():
+        for position in positions:
+            position._public_state_version = -1
+            position.get_game_state("a")
+    run('engine/get_game_state', game_state, per_call=len(positions), number=100)
+
+SOCKET_GAMES = 20
+
+def socket_suite():
+    """Partidas inteiras pelo Socket.IO test client, jogada a jogada pelos handlers"""
+    # Sem processos do bot nem journal: só o caminho handler -> store -> emits, com
+    # cada jogada enviada na hora (a janela do outbox só somaria espera)
+    os.environ.setdefault('BOT_WORKERS', '0')
+    os.environ.setdefault('BROADCAST_COALESCE_MS', '0')
+    os.environ['MOVE_JOURNAL_DIR'] = ''
+    from app import app, socketio, store
+
+    def new_room(seed: int, encoding: str):
+        auth = {'encoding': encoding}
+        first, second = socketio.test_client(app, auth=auth), socketio.test_client(app, auth=auth)
+        first.emit('create_room', {'name': 'Ana'})
+        room_code = next(m['args'][0]['room_code'] for m in first.get_received() if m['name'] == 'room_created')
+        second.emit('join_room', {'room_code': room_code, 'name': 'Bruno'})
+        first.get_received()
+        second.get_received()
+        game = store.get(room_code)
+        clients = {}
+        for client in (first, second):
+            sid = socketio.server.manager.sid_from_eio_sid(client.eio_sid, '/')
+            clients[sid] = client
+        assert set(clients) == set(game.players)
+        return room_code, clients, random.Random(seed)
+
+    def prepare(encoding: str):
+        rooms = [new_room(seed, encoding) for seed in range(SOCKET_GAMES)]
+
+        def play():
+            events = 0
+            for room_code, clients, rng in rooms:
+                while True:
+                    game = store.get(room_code)
+                    if game.game_finished:
+                        break
+                    pid = game.get_current_player_id()
+                    moves = game.legal_moves(pid)
+                    client = clients[pid]
+                    if moves:
+                        piece, side = rng.choice(moves)
+                        client.emit('play_piece', {
+                            'room_code': room_code, 'left': piece.left, 'right': piece.right, 'side': side
+                        })
+                    elif game.dominoes_pool:
+                        client.emit('buy_piece', {'room_code': room_code})
+                    else:
+                        client.emit('pass_turn', {'room_code': room_code})
+                    for other in clients.values():
+                        other.get_received()
+                    events += 1
+            return events
+        return play, rooms
+
+    def disconnect(rooms):
+        for _, clients, _ in rooms:
+            for client in clients.values():
+                client.disconnect()
+    run_batch('socket/jogada (handler->emits)', lambda: prepare('json'), repeat=3, cleanup=disconnect, quiet=True)
+    run_batch('socket/jogada compacta', lambda: prepare('compact'), repeat=3, cleanup=disconnect, quiet=True)
+
+SUITES = {
+    'board': board_suite,
+    'snapshot': snapshot_suite,
+    'engine': engine_suite,
+    'socket': socket_suite,
+}
+
+def compare(baseline: Dict, tolerance: float) -> List[str]:
+    """Benchmarks mais lentos que a base além da tolerância"""
+    regressions = []
+    print(f'\n{"benchmark":<32} {"base":>10} {"atual":>10} {"variação":>9}')
+    for name, current in RESULTS.items():
+        base = baseline['results'].get(name)
+        if base is None:
+            print(f'{name:<32} {"-":>10} {current * 1e9:10.1f} {"nova":>9}')
+            continue
+        change = current / base - 1
+        flag = ''
+        if change > tolerance:
+            regressions.append(name)
+            flag = '  REGRESSÃO'
+        print(f'{name:<32} {base * 1e9:10.1f} {current * 1e9:10.1f} {change:+9.1%}{flag}')
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--only', nargs='+', choices=list(SUITES), help='conjuntos a rodar (padrão: todos)')
+    parser.add_argument('--save', metavar='ARQUIVO', help='grava os resultados como linha de base')
+    parser.add_argument('--compare', metavar='ARQUIVO', help='compara com uma linha de base gravada')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='piora máxima aceita em relação à base (0.25 = 25%%)')
+    args = parser.parse_args()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if baseline.get('python') != platform.python_version():
+            print(f'Aviso: base gravada com Python {baseline.get("python")}, rodando {platform.python_version()}')
+
+    for name in args.only or SUITES:
+        SUITES[name]()
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump({
+                'python': platform.python_version(),
+                'machine': platform.machine(),
+                'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'results': RESULTS
+            }, f, indent=2)
+        print(f'Linha de base gravada em {args.save}')
+    if baseline is not None:
+        regressions = compare(baseline, args.tolerance)
+        if regressions:
+            print(f'{len(regressions)} regressão(ões) acima de {args.tolerance:.0%}: {", ".join(regressions)}')
+            sys.exit(1)
+        print('Sem regressões')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,299 @@
+"""Jogador controlado pelo servidor (bot).
+
+A busca usa só o que o bot pode ver: a própria mão, a mesa e quantas peças o
+oponente tem. Com o pool vazio a mão do oponente fica conhecida e o fim de jogo
+é resolvido de forma exata (negamax com tabela de transposição); antes disso a
+jogada é escolhida por Monte Carlo determinizado, dentro do tempo por jogada.
+"""
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from game import ALL_TILES_MASK, PIECES, PIP_MASKS, TILE_POINTS, TILES, DominoGame, iter_tiles
+
+BOT_PREFIX = "bot:"
+BOT_NAME = "Computador"
+
+Move = Tuple[int, str]
+
+def bot_id(room_code: str) -> str:
+    """ID do bot sentado na sala"""
+    return f"{BOT_PREFIX}{room_code}"
+
+def is_bot(player_id: str) -> bool:
+    return player_id.startswith(BOT_PREFIX)
+
+class BotView(NamedTuple):
+    """O que o bot sabe do jogo; só inteiros, para ir barato aos processos de busca"""
+    seat: int
+    hand: int
+    unseen: int
+    opponent_count: int
+    pool_count: int
+    left_end: Optional[int]
+    right_end: Optional[int]
+    passes: int
+    moves: Tuple[Move, ...]
+
+def view(game: DominoGame, player_id: str) -> BotView:
+    """Monta a visão do jogador (sem olhar a mão do oponente nem a ordem do pool)"""
+    player_ids = list(game.players)
+    seat = player_ids.index(player_id)
+    hand = game.players[player_id]["hand"]
+    board = 0
+    for placement in game.board:
+        board |= 1 << placement.piece.index
+    return BotView(
+        seat=seat,
+        hand=hand,
+        unseen=ALL_TILES_MASK & ~hand & ~board,
+        opponent_count=game.players[player_ids[seat ^ 1]]["hand"].bit_count(),
+        pool_count=len(game.dominoes_pool),
+        left_end=game.board.left_end if len(game.board) else None,
+        right_end=game.board.right_end if len(game.board) else None,
+        passes=game.consecutive_passes,
+        moves=tuple((piece.index, side) for piece, side in game.legal_moves(player_id))
+    )
+
+def play_turn(game: DominoGame, player_id: str, move: Optional[Move]) -> Dict:
+    """Executa a jogada escolhida; sem jogada possível, compra ou passa"""
+    if move is None:
+        if game.dominoes_pool:
+            return game.buy_piece(player_id)
+        return game.pass_turn(player_id)
+    piece = PIECES[move[0]]
+    return game.play_piece(player_id, piece.left, piece.right, move[1])
+
+def _place(tile: int, side: str, left: Optional[int], right: Optional[int]) -> Tuple[int, int]:
+    """Pontas da mesa depois de colocar a peça no lado pedido"""
+    a, b = TILES[tile]
+    if left is None:
+        return a, b
+    if side == 'left':
+        return (b if a == left else a), right
+    return left, (b if a == right else a)
+
+def _points(hand: int) -> int:
+    return sum(TILE_POINTS[tile] for tile in iter_tiles(hand))
+
+def _blocked_winner(hands: List[int]) -> int:
+    """Vencedor do jogo bloqueado: menos pontos; no empate, o primeiro jogador (como no DominoGame)"""
+    return 0 if _points(hands[0]) <= _points(hands[1]) else 1
+
+def _heaviest(moves) -> Move:
+    return max(moves, key=lambda move: TILE_POINTS[move[0]])
+
+# Probabilidade de a simulação jogar a peça mais pesada em vez de uma aleatória
+_GREEDY_ROLLOUT = 0.7
+
+def _rollout(hands: List[int], pool: List[int], left: int, right: int, turn: int,
+             passes: int, rng: random.Random) -> int:
+    """Joga até o fim com uma política rápida e retorna o lugar do vencedor"""
+    while True:
+        hand = hands[turn]
+        playable = hand & (PIP_MASKS[left] | PIP_MASKS[right])
+        if playable:
+            tiles = list(iter_tiles(playable))
+            if rng.random() < _GREEDY_ROLLOUT:
+                tile = max(tiles, key=TILE_POINTS.__getitem__)
+            else:
+                tile = rng.choice(tiles)
+            a, b = TILES[tile]
+            fits_left = a == left or b == left
+            fits_right = a == right or b == right
+            if fits_left and (not fits_right or rng.random() < 0.5):
+                left = b if a == left else a
+            else:
+                right = b if a == right else a
+            hand &= ~(1 << tile)
+            if not hand:
+                return turn
+            hands[turn] = hand
+            passes = 0
+            turn ^= 1
+        elif pool:
+            hands[turn] = hand | 1 << pool.pop()
+            if not pool and not (hands[0] | hands[1]) & (PIP_MASKS[left] | PIP_MASKS[right]):
+                return _blocked_winner(hands)
+        else:
+            passes += 1
+            turn ^= 1
+            if passes >= 2:
+                return _blocked_winner(hands)
+
+def _monte_carlo(view: BotView, deadline: float, rng: random.Random, max_iterations: int) -> Move:
+    """Sorteia mãos do oponente e ordens do pool compatíveis com a visão e simula cada jogada
+
+    Todas as jogadas são avaliadas na mesma amostra, o que reduz a variância da comparação.
+    """
+    moves = view.moves
+    unseen = list(iter_tiles(view.unseen))
+    wins = [0] * len(moves)
+    opponent = view.seat ^ 1
+    iterations = 0
+    while iterations < max_iterations and time.monotonic() < deadline:
+        rng.shuffle(unseen)
+        opponent_hand = 0
+        for tile in unseen[:view.opponent_count]:
+            opponent_hand |= 1 << tile
+        pool = unseen[view.opponent_count:]
+        for i, (tile, side) in enumerate(moves):
+            left, right = _place(tile, side, view.left_end, view.right_end)
+            hands = [0, 0]
+            hands[view.seat] = view.hand & ~(1 << tile)
+            hands[opponent] = opponent_hand
+            winner = _rollout(hands, pool[:], left, right, opponent, 0, rng)
+            wins[i] += winner == view.seat
+        iterations += 1
+    best = max(range(len(moves)), key=lambda i: (wins[i], TILE_POINTS[moves[i][0]]))
+    return moves[best]
+
+class _SearchTimeout(Exception):
+    pass
+
+# Tabela de transposição do fim de jogo (por processo): chave compacta -> +1/-1 para quem joga.
+# O valor exato de uma posição não depende da partida, então a tabela serve a todas as salas.
+_TRANSPOSITIONS: Dict[int, int] = {}
+_MAX_TRANSPOSITIONS = 1 << 20
+
+def _position_key(hand: int, other: int, left: int, right: int, seat: int, passes: int) -> int:
+    """Mãos em 28 bits cada, pontas em 3 bits, passe e lugar de quem joga em 1 bit"""
+    return hand | other << 28 | left << 56 | right << 59 | passes << 62 | seat << 63
+
+class _EndgameSolver:
+    """Negamax exato com o pool vazio (as duas mãos são conhecidas)"""
+    def __init__(self, deadline: float):
+        self.deadline = deadline
+        self.nodes = 0
+
+    def solve(self, hand: int, other: int, left: int, right: int, seat: int, passes: int) -> int:
+        """+1 se quem joga (no lugar seat) vence com jogo perfeito, -1 se perde"""
+        key = _position_key(hand, other, left, right, seat, passes)
+        value = _TRANSPOSITIONS.get(key)
+        if value is not None:
+            return value
+        self.nodes += 1
+        if not self.nodes & 255 and time.monotonic() > self.deadline:
+            raise _SearchTimeout()
+
+        playable = hand & (PIP_MASKS[left] | PIP_MASKS[right])
+        if not playable:
+            if passes:
+                # O oponente acabou de passar e ninguém pode jogar: jogo bloqueado
+                hands = [0, 0]
+                hands[seat], hands[seat ^ 1] = hand, other
+                value = 1 if _blocked_winner(hands) == seat else -1
+            else:
+                value = -self.solve(other, hand, left, right, seat ^ 1, 1)
+        else:
+            value = -1
+            for tile in iter_tiles(playable):
+                rest = hand & ~(1 << tile)
+                if not rest:
+                    value = 1
+                    break
+                for ends in self._placements(tile, left, right):
+                    if self.solve(other, rest, ends[0], ends[1], seat ^ 1, 0) == -1:
+                        value = 1
+                        break
+                if value == 1:
+                    break
+
+        if len(_TRANSPOSITIONS) >= _MAX_TRANSPOSITIONS:
+            _TRANSPOSITIONS.clear()
+        _TRANSPOSITIONS[key] = value
+        return value
+
+    @staticmethod
+    def _placements(tile: int, left: int, right: int) -> List[Tuple[int, int]]:
+        a, b = TILES[tile]
+        ends = []
+        if a == left or b == left:
+            ends.append(((b if a == left else a), right))
+        if a == right or b == right:
+            placed = (left, (b if a == right else a))
+            if placed not in ends:
+                ends.append(placed)
+        return ends
+
+def _solve_endgame(view: BotView, deadline: float) -> Move:
+    """Escolhe uma jogada vencedora, se houver; senão a que descarta mais pontos"""
+    solver = _EndgameSolver(deadline)
+    other = view.unseen
+    losing = []
+    for tile, side in view.moves:
+        left, right = _place(tile, side, view.left_end, view.right_end)
+        rest = view.hand & ~(1 << tile)
+        if solver.solve(other, rest, left, right, view.seat ^ 1, 0) == -1:
+            return tile, side
+        losing.append((tile, side))
+    return _heaviest(losing)
+
+def choose_move(view: BotView, deadline: float, seed: Optional[int] = None,
+                max_iterations: int = 100000) -> Optional[Move]:
+    """Escolhe a jogada do bot até o prazo (time.monotonic()); None se só puder comprar ou passar"""
+    moves = view.moves
+    if not moves:
+        return None
+    if len(moves) == 1:
+        return moves[0]
+    for tile, side in moves:
+        if view.hand == 1 << tile:
+            return tile, side
+
+    if not view.pool_count and view.left_end is not None:
+        # Metade do tempo para a busca exata; se não terminar, o resto vai para o Monte Carlo
+        try:
+            return _solve_endgame(view, time.monotonic() + (deadline - time.monotonic()) / 2)
+        except _SearchTimeout:
+            pass
+    if time.monotonic() >= deadline:
+        return _heaviest(moves)
+    return _monte_carlo(view, deadline, random.Random(seed), max_iterations)
+
+class BotPool:
+    """Roda as buscas do bot em processos separados, para não travar o loop do Socket.IO
+
+    workers = 0 faz a busca no próprio processo. O prazo começa a contar na
+    chamada, então o tempo de fila no pool também entra no orçamento da jogada.
+    A espera pelo resultado usa sleep (o socketio.sleep do modo assíncrono), em
+    pequenos intervalos: o loop continua atendendo as outras salas durante a busca.
+    """
+    POLL_INTERVAL = 0.002
+
+    def __init__(self, workers: int = 0, budget: float = 0.08, sleep: Callable[[float], None] = time.sleep):
+        self.workers = workers
+        self.budget = budget
+        self._sleep = sleep
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def _pool(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self._executor
+
+    def choose(self, view: BotView) -> Optional[Move]:
+        """Escolhe a jogada dentro do orçamento; se o pool falhar, joga a peça mais pesada"""
+        deadline = time.monotonic() + self.budget
+        if not self.workers:
+            return choose_move(view, deadline)
+        try:
+            future = self._pool().submit(choose_move, view, deadline)
+            give_up = deadline + 1.0
+            while not future.done():
+                if time.monotonic() >= give_up:
+                    future.cancel()
+                    break
+                self._sleep(self.POLL_INTERVAL)
+            else:
+                return future.result()
+        except BrokenProcessPool:
+            self._executor = None
+        return _heaviest(view.moves) if view.moves else None
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
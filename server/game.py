@@ -1,45 +1,226 @@
 import random
-from typing import List, Dict, Tuple, Optional
+import struct
+import time
+from collections import deque
+from typing import Deque, Iterable, Iterator, List, Dict, Tuple, Optional
+
+# Índices fixos das 28 peças (0-0, 0-1, ..., 6-6) usados nas máscaras de mão
+TILES: List[Tuple[int, int]] = [(i, j) for i in range(7) for j in range(i, 7)]
+TILE_INDEX: Dict[Tuple[int, int], int] = {}
+for _idx, (_a, _b) in enumerate(TILES):
+    TILE_INDEX[(_a, _b)] = TILE_INDEX[(_b, _a)] = _idx
+
+ALL_TILES_MASK = (1 << len(TILES)) - 1
+# PIP_MASKS[n]: peças que têm o número n em alguma das pontas
+PIP_MASKS: List[int] = [
+    sum(1 << idx for idx, tile in enumerate(TILES) if n in tile) for n in range(7)
+]
+DOUBLES_MASK = sum(1 << TILE_INDEX[(n, n)] for n in range(7))
+TILE_POINTS: List[int] = [a + b for a, b in TILES]
 
 class DominoPiece:
-    def __init__(self, left: int, right: int):
-        self.left = left
-        self.right = right
+    """Peça imutável; existe uma única instância por peça (ver PIECES)"""
+    __slots__ = ("left", "right", "index")
+
+    def __new__(cls, left: int, right: int):
+        return PIECES[TILE_INDEX[(left, right)]]
+
+    @classmethod
+    def _intern(cls, index: int) -> "DominoPiece":
+        piece = object.__new__(cls)
+        left, right = TILES[index]
+        object.__setattr__(piece, "left", left)
+        object.__setattr__(piece, "right", right)
+        object.__setattr__(piece, "index", index)
+        return piece
+
+    def __setattr__(self, name, value):
+        raise AttributeError("DominoPiece é imutável")
+
+    def __reduce__(self):
+        return (DominoPiece, (self.left, self.right))
 
     def to_dict(self):
         return {"left": self.left, "right": self.right}
 
-    def flip(self):
-        self.left, self.right = self.right, self.left
+    def oriented(self, flipped: bool) -> "Placement":
+        """Retorna a peça posicionada na mesa, invertida ou não"""
+        return PLACEMENTS[self.index][flipped]
 
     def __repr__(self):
         return f"[{self.left}|{self.right}]"
 
+class Placement:
+    """Peça posicionada na mesa; a orientação fica aqui e não na peça"""
+    __slots__ = ("piece", "flipped", "left", "right")
+
+    def __init__(self, piece: DominoPiece, flipped: bool):
+        object.__setattr__(self, "piece", piece)
+        object.__setattr__(self, "flipped", flipped)
+        object.__setattr__(self, "left", piece.right if flipped else piece.left)
+        object.__setattr__(self, "right", piece.left if flipped else piece.right)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Placement é imutável")
+
+    def __reduce__(self):
+        return (DominoPiece.oriented, (self.piece, self.flipped))
+
+    def to_dict(self):
+        return {"left": self.left, "right": self.right}
+
+    def __repr__(self):
+        return f"[{self.left}|{self.right}]"
+
+PIECES: Tuple[DominoPiece, ...] = tuple(DominoPiece._intern(idx) for idx in range(len(TILES)))
+PLACEMENTS: Tuple[Tuple[Placement, Placement], ...] = tuple(
+    (Placement(piece, False), Placement(piece, True)) for piece in PIECES
+)
+
+def _pack_bits(values: List[int], width: int) -> bytes:
+    """Empacota inteiros pequenos com width bits cada"""
+    packed = 0
+    for i, value in enumerate(values):
+        packed |= value << (i * width)
+    return packed.to_bytes((len(values) * width + 7) // 8, "little")
+
+def _unpack_bits(data: bytes, count: int, width: int) -> List[int]:
+    packed = int.from_bytes(data, "little")
+    mask = (1 << width) - 1
+    return [(packed >> (i * width)) & mask for i in range(count)]
+
+def iter_tiles(mask: int) -> Iterator[int]:
+    """Percorre os índices das peças presentes na máscara"""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+def highest_double(mask: int) -> Optional[int]:
+    """Retorna o número da maior dupla da máscara, se houver"""
+    doubles = mask & DOUBLES_MASK
+    if not doubles:
+        return None
+    return TILES[doubles.bit_length() - 1][0]
+
+# Jogadas possíveis para cada par de pontas (left_end * 7 + right_end):
+# (índice da peça, lado), em ordem de peça; basta filtrar pela máscara da mão
+MOVE_TABLE: List[Tuple[Tuple[int, str], ...]] = [
+    tuple(
+        (idx, side)
+        for idx, tile in enumerate(TILES)
+        for side, end in (('left', left_end), ('right', right_end))
+        if end in tile
+    )
+    for left_end in range(7)
+    for right_end in range(7)
+]
+
+# Registro do journal de jogadas (32 bytes): sala, tipo, lugar do jogador (ordem em players),
+# versão do jogo depois do evento, peça, lado (0 = esquerda, 1 = direita) e dados extras
+# (nome do jogador na entrada; ordem embaralhada das 28 peças, 5 bits cada, no início)
+JOURNAL_RECORD = struct.Struct("<6sBBIBB18s")
+JOURNAL_JOIN, JOURNAL_LEAVE, JOURNAL_START, JOURNAL_PLAY, JOURNAL_DRAW, JOURNAL_PASS = range(1, 7)
+_NO_TILE = 0xFF
+_JOURNAL_KINDS = {"play": JOURNAL_PLAY, "draw": JOURNAL_DRAW, "pass": JOURNAL_PASS}
+
+class Board:
+    """Cadeia de peças na mesa, com as pontas guardadas em cache"""
+    def __init__(self):
+        self._placements: Deque[Placement] = deque()
+        self.left_end: Optional[int] = None
+        self.right_end: Optional[int] = None
+
+    def __len__(self):
+        return len(self._placements)
+
+    def __iter__(self) -> Iterator[Placement]:
+        return iter(self._placements)
+
+    def fit(self, piece: DominoPiece, side: str) -> Optional[Placement]:
+        """Retorna a peça orientada para encaixar no lado pedido, ou None"""
+        if not self._placements:
+            return piece.oriented(False)
+        if side == 'left':
+            if piece.right == self.left_end:
+                return piece.oriented(False)
+            if piece.left == self.left_end:
+                return piece.oriented(True)
+        else:
+            if piece.left == self.right_end:
+                return piece.oriented(False)
+            if piece.right == self.right_end:
+                return piece.oriented(True)
+        return None
+
+    def place_left(self, placement: Placement):
+        """Coloca na ponta esquerda uma peça já orientada (placement.right == left_end)"""
+        if not self._placements:
+            self.right_end = placement.right
+        self._placements.appendleft(placement)
+        self.left_end = placement.left
+
+    def place_right(self, placement: Placement):
+        """Coloca na ponta direita uma peça já orientada (placement.left == right_end)"""
+        if not self._placements:
+            self.left_end = placement.left
+        self._placements.append(placement)
+        self.right_end = placement.right
+
+    def to_list(self) -> List[Dict]:
+        return [p.to_dict() for p in self._placements]
+
+def event_view(event: Dict, player_id: str) -> Dict:
+    """O evento visto por um jogador: só quem comprou vê a peça comprada"""
+    if event["type"] == "draw" and event["player"] != player_id:
+        return {k: v for k, v in event.items() if k != "piece"}
+    return event
+
+def moves_to_dicts(moves: List[Tuple[DominoPiece, str]]) -> List[Dict]:
+    """Jogadas possíveis no formato das mensagens"""
+    return [{"left": piece.left, "right": piece.right, "side": side} for piece, side in moves]
+
 class DominoGame:
-    def __init__(self, room_code: str):
+    def __init__(self, room_code: str, rng: Optional[random.Random] = None, journaled: bool = False):
         self.room_code = room_code
+        # Gerador usado no embaralhamento; None usa o módulo random global
+        self.rng = rng
         self.players: Dict[str, Dict] = {}
-        self.board: List[DominoPiece] = []
+        self.board = Board()
         self.current_player_index = 0
         self.game_started = False
         self.game_finished = False
         self.winner = None
         self.dominoes_pool: List[DominoPiece] = []
         self.consecutive_passes = 0
+        # Versão do estado: aumenta a cada mudança; cada jogada gera um evento (delta)
+        self.version = 0
+        # Momento da última mudança de estado (usado para expirar salas ociosas)
+        self.updated_at = time.time()
+        # Início da partida e jogadas feitas (jogar, comprar ou passar), para o histórico
+        self.started_at: Optional[float] = None
+        self.move_count = 0
+        self.last_event: Optional[Dict] = None
+        # Parte pública do estado, reaproveitada entre jogadores enquanto a versão não muda
+        self._public_state: Optional[Dict] = None
+        self._public_state_version = -1
+        # Registros do journal ainda não gravados (o armazenamento grava e limpa a cada atualização);
+        # só são montados com journaled, ligado pelo armazenamento que tem um journal
+        self.journaled = journaled
+        self.pending_records: List[bytes] = []
 
     def generate_dominoes(self) -> List[DominoPiece]:
         """Gera todas as 28 peças do dominó (0-0 até 6-6)"""
-        dominoes = []
-        for i in range(7):
-            for j in range(i, 7):
-                dominoes.append(DominoPiece(i, j))
-        return dominoes
+        return list(PIECES)
 
     def add_player(self, player_id: str, name: str) -> bool:
         """Adiciona um jogador à sala"""
         # Se o jogador já existe, apenas atualiza o nome (reconexão)
         if player_id in self.players:
             self.players[player_id]["name"] = name
+            self._bump_version()
+            if self.journaled:
+                self._journal(JOURNAL_JOIN, list(self.players).index(player_id), payload=name.encode())
             return True
             
         if len(self.players) >= 2:
@@ -47,15 +228,22 @@ class DominoGame:
 
         self.players[player_id] = {
             "name": name,
-            "hand": [],
+            "hand": 0,
             "order": len(self.players)
         }
+        self._bump_version()
+        if self.journaled:
+            self._journal(JOURNAL_JOIN, len(self.players) - 1, payload=name.encode())
         return True
 
     def remove_player(self, player_id: str):
         """Remove um jogador da sala"""
         if player_id in self.players:
+            seat = list(self.players).index(player_id)
             del self.players[player_id]
+            self._bump_version()
+            if self.journaled:
+                self._journal(JOURNAL_LEAVE, seat)
 
     def start_game(self):
         """Inicia o jogo distribuindo as peças"""
@@ -63,13 +251,23 @@ class DominoGame:
             return False
 
         all_dominoes = self.generate_dominoes()
-        random.shuffle(all_dominoes)
+        (self.rng or random).shuffle(all_dominoes)
+        self._deal(all_dominoes)
+        self.started_at = self.updated_at
+        if self.journaled:
+            self._journal(JOURNAL_START, payload=_pack_bits([piece.index for piece in all_dominoes], 5))
+        return True
 
+    def _deal(self, all_dominoes: List[DominoPiece]):
+        """Distribui as peças na ordem dada e define quem começa"""
         player_ids = list(self.players.keys())
 
         # Distribui 7 peças para cada jogador
         for i, player_id in enumerate(player_ids):
-            self.players[player_id]["hand"] = all_dominoes[i*7:(i+1)*7]
+            hand = 0
+            for piece in all_dominoes[i*7:(i+1)*7]:
+                hand |= 1 << piece.index
+            self.players[player_id]["hand"] = hand
 
         # Peças restantes ficam no pool
         self.dominoes_pool = all_dominoes[14:]
@@ -79,22 +277,19 @@ class DominoGame:
         self.current_player_index = starting_player_index
 
         self.game_started = True
-
-        return True
+        self._bump_version()
 
     def determine_starting_player(self) -> int:
         """Determina qual jogador deve começar baseado na maior peça dupla"""
         player_ids = list(self.players.keys())
-        highest_double = -1
+        highest = -1
         starting_player_index = 0
         
         for i, player_id in enumerate(player_ids):
-            for piece in self.players[player_id]["hand"]:
-                # Verifica se é uma peça dupla (left == right)
-                if piece.left == piece.right:
-                    if piece.left > highest_double:
-                        highest_double = piece.left
-                        starting_player_index = i
+            double = highest_double(self.players[player_id]["hand"])
+            if double is not None and double > highest:
+                highest = double
+                starting_player_index = i
         
         # Se ninguém tem dupla, o primeiro jogador começa (fallback)
         return starting_player_index
@@ -104,6 +299,9 @@ class DominoGame:
         if not self.game_started:
             return None
         player_ids = list(self.players.keys())
+        # O jogador da vez pode ter saído da sala
+        if self.current_player_index >= len(player_ids):
+            return None
         return player_ids[self.current_player_index]
 
     def can_play_piece(self, piece: DominoPiece) -> Tuple[bool, Optional[str]]:
@@ -111,8 +309,8 @@ class DominoGame:
         if len(self.board) == 0:
             return True, "start"
 
-        left_end = self.board[0].left
-        right_end = self.board[-1].right
+        left_end = self.board.left_end
+        right_end = self.board.right_end
 
         if piece.left == right_end or piece.right == right_end:
             return True, "right"
@@ -121,65 +319,71 @@ class DominoGame:
 
         return False, None
 
+    def playable_mask(self) -> int:
+        """Máscara das peças que encaixam em alguma ponta da mesa"""
+        if len(self.board) == 0:
+            return ALL_TILES_MASK
+        return PIP_MASKS[self.board.left_end] | PIP_MASKS[self.board.right_end]
+
+    def legal_moves(self, player_id: str) -> List[Tuple[DominoPiece, str]]:
+        """Retorna as jogadas válidas (peça, lado) do jogador; vazio se não for a vez dele"""
+        if not self.game_started or self.game_finished or self.get_current_player_id() != player_id:
+            return []
+        hand = self.players[player_id]["hand"]
+        if len(self.board) == 0:
+            required_double = self.get_required_starting_double(player_id)
+            if required_double is not None:
+                return [(DominoPiece(required_double, required_double), 'right')]
+            return [(PIECES[tile], 'right') for tile in iter_tiles(hand)]
+        moves = MOVE_TABLE[self.board.left_end * 7 + self.board.right_end]
+        return [(PIECES[tile], side) for tile, side in moves if hand >> tile & 1]
+
+    def _legal_moves_list(self, player_id: str) -> List[Dict]:
+        return moves_to_dicts(self.legal_moves(player_id))
+
     def play_piece(self, player_id: str, piece_left: int, piece_right: int, side: str = 'right') -> Dict:
         """Executa a jogada de uma peça no lado especificado"""
         if not self.game_started or self.game_finished:
-            return {"success": False, "message": "Jogo não está em andamento"}
+            return {"success": False, "message": "Jogo não está em andamento", "reason": "not_in_progress"}
         
         if self.get_current_player_id() != player_id:
-            return {"success": False, "message": "Não é seu turno"}
+            return {"success": False, "message": "Não é seu turno", "reason": "not_your_turn"}
         
-        piece = None
-        for p in self.players[player_id]["hand"]:
-            if (p.left == piece_left and p.right == piece_right) or \
-            (p.left == piece_right and p.right == piece_left):
-                piece = p
-                break
-        
-        if not piece:
-            return {"success": False, "message": "Peça não encontrada na sua mão"}
+        tile = TILE_INDEX.get((piece_left, piece_right))
+        if tile is None or not self.players[player_id]["hand"] >> tile & 1:
+            return {"success": False, "message": "Peça não encontrada na sua mão", "reason": "not_in_hand"}
+        piece = PIECES[tile]
         
         # Se é a primeira jogada, deve ser a maior dupla
         if len(self.board) == 0:
             required_double = self.get_required_starting_double(player_id)
             if required_double is not None:
                 if not (piece.left == piece.right and piece.left == required_double):
-                    return {"success": False, "message": f"Você deve jogar a dupla [{required_double}|{required_double}] como primeira peça"}
-        
-        can_play, _ = self.can_play_piece(piece)
+                    return {"success": False, "message": f"Você deve jogar a dupla [{required_double}|{required_double}] como primeira peça", "reason": "must_play_double", "double": required_double}
         
-        if not can_play:
-            return {"success": False, "message": "Essa peça não pode ser jogada"}
+        if not self.playable_mask() >> tile & 1:
+            return {"success": False, "message": "Essa peça não pode ser jogada", "reason": "does_not_fit"}
         
-        self.players[player_id]["hand"].remove(piece)
-        
-        if len(self.board) == 0:
-            self.board.append(piece)
-        elif side == 'left':
-            left_end = self.board[0].left
-            if piece.right == left_end:
-                self.board.insert(0, piece)
-            elif piece.left == left_end:
-                piece.flip()
-                self.board.insert(0, piece)
-            else:
-                return {"success": False, "message": "Peça não encaixa neste lado"}
-        else:  # right
-            right_end = self.board[-1].right
-            if piece.left == right_end:
-                self.board.append(piece)
-            elif piece.right == right_end:
-                piece.flip()
-                self.board.append(piece)
-            else:
-                return {"success": False, "message": "Peça não encaixa neste lado"}
+        # Valida o lado antes de tirar a peça da mão
+        placement = self.board.fit(piece, side)
+        if placement is None:
+            return {"success": False, "message": "Peça não encaixa neste lado", "reason": "wrong_side"}
+
+        self.players[player_id]["hand"] &= ~(1 << tile)
+        if side == 'left':
+            self.board.place_left(placement)
+        else:
+            self.board.place_right(placement)
         
         # Reset contador de passes consecutivos quando uma peça é jogada
         self.consecutive_passes = 0
         
-        if len(self.players[player_id]["hand"]) == 0:
+        event = {"type": "play", "player": player_id, "piece": placement.to_dict(), "side": side}
+
+        if not self.players[player_id]["hand"]:
             self.game_finished = True
             self.winner = player_id
+            self._record_event(event)
             return {
                 "success": True,
                 "message": "Jogada realizada com sucesso",
@@ -188,25 +392,27 @@ class DominoGame:
             }
         
         self.current_player_index = (self.current_player_index + 1) % 2
+        self._record_event(event)
         
         return {"success": True, "message": "Jogada realizada com sucesso"}
 
     def buy_piece(self, player_id: str) -> Dict:
         """Jogador compra uma peça do pool"""
         if not self.game_started or self.game_finished:
-            return {"success": False, "message": "Jogo não está em andamento"}
+            return {"success": False, "message": "Jogo não está em andamento", "reason": "not_in_progress"}
 
         if self.get_current_player_id() != player_id:
-            return {"success": False, "message": "Não é seu turno"}
+            return {"success": False, "message": "Não é seu turno", "reason": "not_your_turn"}
 
         if len(self.dominoes_pool) == 0:
-            return {"success": False, "message": "Pool vazio"}
+            return {"success": False, "message": "Pool vazio", "reason": "pool_empty"}
 
         piece = self.dominoes_pool.pop()
-        self.players[player_id]["hand"].append(piece)
+        self.players[player_id]["hand"] |= 1 << piece.index
+        event = {"type": "draw", "player": player_id, "piece": piece.to_dict()}
 
         # Verifica se agora pode jogar
-        can_play = any(self.can_play_piece(p)[0] for p in self.players[player_id]["hand"])
+        can_play = bool(self.players[player_id]["hand"] & self.playable_mask())
         
         if not can_play and len(self.dominoes_pool) == 0:
             # Verifica se o jogo está bloqueado
@@ -214,6 +420,7 @@ class DominoGame:
             if blocked_result["blocked"]:
                 self.game_finished = True
                 self.winner = blocked_result["winner_id"]
+                self._record_event(event)
                 return {
                     "success": True, 
                     "message": "Peça comprada", 
@@ -222,21 +429,23 @@ class DominoGame:
                     "winner": blocked_result["winner_name"]
                 }
 
+        self._record_event(event)
         return {"success": True, "message": "Peça comprada", "piece": piece.to_dict()}
 
     def pass_turn(self, player_id: str) -> Dict:
         """Jogador passa a vez"""
         if not self.game_started or self.game_finished:
-            return {"success": False, "message": "Jogo não está em andamento"}
+            return {"success": False, "message": "Jogo não está em andamento", "reason": "not_in_progress"}
 
         if self.get_current_player_id() != player_id:
-            return {"success": False, "message": "Não é seu turno"}
+            return {"success": False, "message": "Não é seu turno", "reason": "not_your_turn"}
 
         # Incrementa contador de passes consecutivos
         self.consecutive_passes += 1
         
         # Passa a vez
         self.current_player_index = (self.current_player_index + 1) % 2
+        event = {"type": "pass", "player": player_id}
         
         # Se ambos jogadores passaram consecutivamente, verifica se jogo está bloqueado
         if self.consecutive_passes >= 2:
@@ -244,6 +453,7 @@ class DominoGame:
             if blocked_result["blocked"]:
                 self.game_finished = True
                 self.winner = blocked_result["winner_id"]
+                self._record_event(event)
                 return {
                     "success": True, 
                     "message": "Vez passada",
@@ -251,14 +461,91 @@ class DominoGame:
                     "winner": blocked_result["winner_name"]
                 }
 
+        self._record_event(event)
         return {"success": True, "message": "Vez passada"}
 
+    def _bump_version(self):
+        """Marca uma mudança de estado"""
+        self.version += 1
+        self.updated_at = time.time()
+
+    def _record_event(self, event: Dict):
+        """Registra o evento da jogada com o novo número de versão e o estado resumido"""
+        self._bump_version()
+        self.move_count += 1
+        event["seq"] = self.version
+        event["current_player"] = self.get_current_player_id()
+        event["pool_count"] = len(self.dominoes_pool)
+        event["hand_count"] = self.players[event["player"]]["hand"].bit_count()
+        event["game_finished"] = self.game_finished
+        event["winner"] = self.players[self.winner]["name"] if self.winner in self.players else None
+        self.last_event = event
+
+        if self.journaled:
+            piece = event.get("piece")
+            self._journal(
+                _JOURNAL_KINDS[event["type"]],
+                list(self.players).index(event["player"]),
+                TILE_INDEX[(piece["left"], piece["right"])] if piece else _NO_TILE,
+                event.get("side") == "right"
+            )
+
+    def _journal(self, kind: int, seat: int = 0, tile: int = _NO_TILE, side: int = 0, payload: bytes = b""):
+        """Guarda o registro do journal da mudança de estado que acabou de acontecer (só com journaled)"""
+        self.pending_records.append(JOURNAL_RECORD.pack(
+            self.room_code.encode()[:6], kind, seat, self.version, tile, side, payload
+        ))
+
+    @classmethod
+    def replay(cls, log: Iterable[bytes], player_ids: Optional[List[str]] = None) -> "DominoGame":
+        """Reconstrói o jogo aplicando, em ordem, os registros do journal de uma sala
+
+        Os IDs de sessão não vão para o journal: cada jogador recebe player_ids[n]
+        (n = ordem de entrada na sala) ou "p<n>". Uma entrada com versão 1 indica
+        que o código da sala foi reaproveitado, e o jogo recomeça a partir dela.
+        """
+        game = None
+        joined = 0
+        for raw in log:
+            room_code, kind, seat, version, tile, side, payload = JOURNAL_RECORD.unpack(raw)
+            if game is None or (kind == JOURNAL_JOIN and version == 1):
+                game = cls(room_code.rstrip(b"\0").decode())
+                joined = 0
+            player_ids_now = list(game.players)
+            if kind == JOURNAL_JOIN:
+                if seat < len(player_ids_now):
+                    player_id = player_ids_now[seat]
+                else:
+                    player_id = player_ids[joined] if player_ids and joined < len(player_ids) else f"p{joined}"
+                    joined += 1
+                game.add_player(player_id, payload.rstrip(b"\0").decode(errors="ignore"))
+            elif kind == JOURNAL_LEAVE:
+                game.remove_player(player_ids_now[seat])
+            elif kind == JOURNAL_START:
+                game._deal([PIECES[idx] for idx in _unpack_bits(payload, len(TILES), 5)])
+            elif kind == JOURNAL_PLAY:
+                piece = PIECES[tile]
+                game.play_piece(player_ids_now[seat], piece.left, piece.right, 'right' if side else 'left')
+            elif kind == JOURNAL_DRAW:
+                drawn = game.buy_piece(player_ids_now[seat]).get("piece")
+                if drawn is None or TILE_INDEX[(drawn["left"], drawn["right"])] != tile:
+                    raise ValueError(f"Peça comprada diferente do journal na sala {game.room_code}")
+            elif kind == JOURNAL_PASS:
+                game.pass_turn(player_ids_now[seat])
+            else:
+                raise ValueError(f"Tipo de registro desconhecido: {kind}")
+            if game.version != version:
+                raise ValueError(
+                    f"Journal fora de sequência na sala {game.room_code}: "
+                    f"registro da versão {version}, jogo na versão {game.version}"
+                )
+        if game is None:
+            raise ValueError("Journal vazio")
+        return game
+
     def calculate_hand_points(self, player_id: str) -> int:
         """Calcula os pontos na mão de um jogador"""
-        total = 0
-        for piece in self.players[player_id]["hand"]:
-            total += piece.left + piece.right
-        return total
+        return sum(TILE_POINTS[tile] for tile in iter_tiles(self.players[player_id]["hand"]))
 
     def check_game_blocked(self) -> Dict:
         """Verifica se o jogo está bloqueado (ninguém pode jogar)"""
@@ -266,10 +553,11 @@ class DominoGame:
             return {"blocked": False}
             
         # Verifica se algum jogador pode jogar
-        for player_id in self.players:
-            for piece in self.players[player_id]["hand"]:
-                if self.can_play_piece(piece)[0]:
-                    return {"blocked": False}
+        all_hands = 0
+        for pdata in self.players.values():
+            all_hands |= pdata["hand"]
+        if all_hands & self.playable_mask():
+            return {"blocked": False}
         
         # Jogo bloqueado - encontra vencedor pela menor pontuação
         min_points = float('inf')
@@ -290,38 +578,59 @@ class DominoGame:
             "points": min_points
         }
 
-    def get_game_state(self, player_id: str) -> Dict:
-        """Retorna o estado do jogo para um jogador específico"""
-        if player_id not in self.players:
-            return {}
+    def get_public_state(self) -> Dict:
+        """Retorna a parte do estado que é igual para todos (em cache até a próxima versão)"""
+        if self._public_state_version == self.version:
+            return self._public_state
 
         # Encontra a maior dupla para mostrar no início do jogo
         starting_info = None
-        required_double = None
         if self.game_started and len(self.board) == 0:
             starting_info = self.get_starting_player_info()
-            if player_id == self.get_current_player_id():
-                required_double = self.get_required_starting_double(player_id)
 
-        return {
+        self._public_state = {
             "room_code": self.room_code,
             "players": {
                 pid: {
                     "name": pdata["name"],
-                    "hand_count": len(pdata["hand"])
+                    "hand_count": pdata["hand"].bit_count()
                 }
                 for pid, pdata in self.players.items()
             },
-            "my_hand": [p.to_dict() for p in self.players[player_id]["hand"]],
-            "board": [p.to_dict() for p in self.board],
+            "board": self.board.to_list(),
             "current_player": self.get_current_player_id(),
             "game_started": self.game_started,
             "game_finished": self.game_finished,
-            "winner": self.players[self.winner]["name"] if self.winner else None,
+            "winner": self.players[self.winner]["name"] if self.winner in self.players else None,
             "pool_count": len(self.dominoes_pool),
             "starting_info": starting_info,
-            "required_double": required_double
+            "version": self.version
         }
+        self._public_state_version = self.version
+        return self._public_state
+
+    def get_game_state(self, player_id: str) -> Dict:
+        """Retorna o estado do jogo para um jogador específico"""
+        if player_id not in self.players:
+            return {}
+
+        required_double = None
+        if self.game_started and len(self.board) == 0 and player_id == self.get_current_player_id():
+            required_double = self.get_required_starting_double(player_id)
+
+        state = dict(self.get_public_state())
+        state["my_hand"] = [PIECES[tile].to_dict() for tile in iter_tiles(self.players[player_id]["hand"])]
+        state["required_double"] = required_double
+        state["legal_moves"] = self._legal_moves_list(player_id)
+        return state
+
+    def get_spectator_state(self) -> Dict:
+        """Retorna o estado visto por um espectador: a parte pública, sem mão nem jogadas"""
+        state = dict(self.get_public_state())
+        state["my_hand"] = []
+        state["required_double"] = None
+        state["legal_moves"] = []
+        return state
 
     def get_starting_player_info(self) -> Optional[Dict]:
         """Retorna informações sobre o jogador inicial e sua maior dupla"""
@@ -331,16 +640,12 @@ class DominoGame:
         if not current_player_id:
             return None
             
-        highest_double = -1
-        for piece in self.players[current_player_id]["hand"]:
-            if piece.left == piece.right and piece.left > highest_double:
-                highest_double = piece.left
-        
-        if highest_double >= 0:
+        double = highest_double(self.players[current_player_id]["hand"])
+        if double is not None:
             return {
                 "player_name": self.players[current_player_id]["name"],
-                "highest_double": highest_double,
-                "message": f"{self.players[current_player_id]['name']} inicia com a dupla [{highest_double}|{highest_double}]"
+                "highest_double": double,
+                "message": f"{self.players[current_player_id]['name']} inicia com a dupla [{double}|{double}]"
             }
         
         return {
@@ -353,9 +658,123 @@ class DominoGame:
         if len(self.board) > 0:  # Não é a primeira jogada
             return None
             
-        highest_double = -1
-        for piece in self.players[player_id]["hand"]:
-            if piece.left == piece.right and piece.left > highest_double:
-                highest_double = piece.left
-        
-        return highest_double if highest_double >= 0 else None
+        return highest_double(self.players[player_id]["hand"])
+
+    def to_snapshot(self) -> Dict:
+        """Serializa o jogo em um dicionário compacto (peças como índices, mãos como máscaras)"""
+        return {
+            "room_code": self.room_code,
+            "players": [
+                [pid, pdata["name"], pdata["hand"], pdata["order"]]
+                for pid, pdata in self.players.items()
+            ],
+            "board": [p.piece.index << 1 | p.flipped for p in self.board],
+            "pool": [piece.index for piece in self.dominoes_pool],
+            "current": self.current_player_index,
+            "started": self.game_started,
+            "finished": self.game_finished,
+            "winner": self.winner,
+            "passes": self.consecutive_passes,
+            "version": self.version,
+            "updated_at": self.updated_at,
+            "started_at": self.started_at,
+            "moves": self.move_count,
+            "last_event": self.last_event
+        }
+
+    @classmethod
+    def from_snapshot(cls, snapshot: Dict) -> "DominoGame":
+        """Reconstrói um jogo a partir de to_snapshot()"""
+        game = cls(snapshot["room_code"])
+        for pid, name, hand, order in snapshot["players"]:
+            game.players[pid] = {"name": name, "hand": hand, "order": order}
+        for code in snapshot["board"]:
+            game.board.place_right(PLACEMENTS[code >> 1][code & 1])
+        game.dominoes_pool = [PIECES[idx] for idx in snapshot["pool"]]
+        game.current_player_index = snapshot["current"]
+        game.game_started = snapshot["started"]
+        game.game_finished = snapshot["finished"]
+        game.winner = snapshot["winner"]
+        game.consecutive_passes = snapshot["passes"]
+        game.version = snapshot["version"]
+        game.updated_at = snapshot["updated_at"]
+        # Snapshots anteriores ao histórico não têm o início nem a contagem de jogadas
+        game.started_at = snapshot.get("started_at")
+        game.move_count = snapshot.get("moves", 0)
+        game.last_event = snapshot["last_event"]
+        return game
+
+    # Formato binário: cabeçalho fixo, textos com prefixo de tamanho,
+    # mãos como máscaras de 28 bits, mesa com 6 bits por peça (índice + orientação)
+    # e pool com 5 bits por peça, na ordem de compra. A versão 3 acrescentou o
+    # início da partida (0 = não iniciada) e o número de jogadas ao cabeçalho
+    _BYTES_VERSION = 1
+    _HEADER = struct.Struct("<BBBBBBIddH")
+    _PLAYER = struct.Struct("<IB")
+
+    def to_bytes(self) -> bytes:
+        """Serializa o jogo no formato binário compacto (sem o último evento nem o vencedor que saiu da sala)"""
+        player_ids = list(self.players)
+        winner = player_ids.index(self.winner) if self.winner in self.players else 0xFF
+        flags = self.game_started | self.game_finished << 1
+        parts = [self._HEADER.pack(
+            self._BYTES_VERSION, flags, self.current_player_index,
+            self.consecutive_passes, winner, len(player_ids), self.version, self.updated_at,
+            self.started_at or 0.0, self.move_count
+        )]
+        room_code = self.room_code.encode()
+        parts.append(bytes((len(room_code),)) + room_code)
+        for pid in player_ids:
+            pdata = self.players[pid]
+            sid, name = pid.encode(), pdata["name"].encode()
+            parts.append(bytes((len(sid),)) + sid)
+            parts.append(struct.pack("<H", len(name)) + name)
+            parts.append(self._PLAYER.pack(pdata["hand"], pdata["order"]))
+        board = [p.piece.index << 1 | p.flipped for p in self.board]
+        parts.append(bytes((len(board),)) + _pack_bits(board, 6))
+        pool = [piece.index for piece in self.dominoes_pool]
+        parts.append(bytes((len(pool),)) + _pack_bits(pool, 5))
+        return b"".join(parts)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "DominoGame":
+        """Reconstrói um jogo a partir de to_bytes()"""
+        (fmt, flags, current, passes, winner, player_count, version, updated_at,
+         started_at, move_count) = cls._HEADER.unpack_from(data, 0)
+        if fmt != cls._BYTES_VERSION:
+            raise ValueError(f"Versão de formato desconhecida: {fmt}")
+        offset = cls._HEADER.size
+
+        size = data[offset]
+        game = cls(data[offset + 1:offset + 1 + size].decode())
+        offset += 1 + size
+        for _ in range(player_count):
+            size = data[offset]
+            pid = data[offset + 1:offset + 1 + size].decode()
+            offset += 1 + size
+            (size,) = struct.unpack_from("<H", data, offset)
+            name = data[offset + 2:offset + 2 + size].decode()
+            offset += 2 + size
+            hand, order = cls._PLAYER.unpack_from(data, offset)
+            offset += cls._PLAYER.size
+            game.players[pid] = {"name": name, "hand": hand, "order": order}
+
+        count = data[offset]
+        size = (count * 6 + 7) // 8
+        for code in _unpack_bits(data[offset + 1:offset + 1 + size], count, 6):
+            game.board.place_right(PLACEMENTS[code >> 1][code & 1])
+        offset += 1 + size
+        count = data[offset]
+        size = (count * 5 + 7) // 8
+        game.dominoes_pool = [PIECES[idx] for idx in _unpack_bits(data[offset + 1:offset + 1 + size], count, 5)]
+
+        game.current_player_index = current
+        game.consecutive_passes = passes
+        game.game_started = bool(flags & 1)
+        game.game_finished = bool(flags & 2)
+        game.winner = list(game.players)[winner] if winner != 0xFF else None
+        game.version = version
+        game.updated_at = updated_at
+        game.started_at = started_at or None
+        game.move_count = move_count
+        return game
@@ -0,0 +1,243 @@
+"""Histórico das partidas encerradas em SQLite (modo WAL).
+
+record() só monta a linha da partida e a põe numa fila em memória; uma thread do
+sistema (de verdade, mesmo com o gevent) grava a fila em lote, numa transação, a
+cada flush_interval. Os handlers nunca esperam pelo disco; uma queda perde no
+máximo esse intervalo. As consultas também rodam numa thread do sistema, e quem
+pede espera com wait (o socketio.sleep do servidor), sem parar o loop. Vários workers podem gravar no mesmo arquivo: o WAL deixa
+as leituras andarem junto com a escrita e o busy_timeout põe as escritas em fila.
+
+Os jogadores são identificados pelo nome, já que a sessão do Socket.IO muda a
+cada conexão. Os pontos são os que sobraram na mão (calculate_hand_points).
+"""
+import sqlite3
+import time
+from collections import deque
+from contextlib import closing
+from typing import Callable, Deque, Dict, List, NamedTuple, Optional, Tuple
+
+from game import DominoGame
+from realthreads import real_thread_tools
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS games (
+    id INTEGER PRIMARY KEY,
+    room_code TEXT NOT NULL,
+    started_at REAL,
+    finished_at REAL NOT NULL,
+    duration REAL,
+    moves INTEGER NOT NULL,
+    blocked INTEGER NOT NULL,
+    winner TEXT
+);
+CREATE TABLE IF NOT EXISTS game_players (
+    game_id INTEGER NOT NULL REFERENCES games(id),
+    seat INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    points INTEGER NOT NULL,
+    won INTEGER NOT NULL,
+    bot INTEGER NOT NULL,
+    -- Repetido da partida para as consultas por jogador e por período usarem só o índice
+    finished_at REAL NOT NULL,
+    PRIMARY KEY (game_id, seat)
+);
+CREATE INDEX IF NOT EXISTS games_by_time ON games (finished_at);
+CREATE INDEX IF NOT EXISTS players_by_name ON game_players (name, finished_at);
+CREATE INDEX IF NOT EXISTS players_by_time ON game_players (finished_at, name);
+"""
+
+class GameRecord(NamedTuple):
+    room_code: str
+    started_at: Optional[float]
+    finished_at: float
+    moves: int
+    blocked: bool
+    winner: Optional[str]
+    # (nome, pontos na mão, venceu, é o bot), na ordem da mesa
+    players: List[Tuple[str, int, bool, bool]]
+
+def game_record(game: DominoGame, blocked: bool,
+                is_bot: Callable[[str], bool] = lambda player_id: False) -> GameRecord:
+    """Linha do histórico de uma partida encerrada"""
+    return GameRecord(
+        game.room_code,
+        game.started_at,
+        game.updated_at,
+        game.move_count,
+        blocked,
+        game.players[game.winner]["name"] if game.winner in game.players else None,
+        [
+            (pdata["name"], game.calculate_hand_points(player_id), player_id == game.winner, is_bot(player_id))
+            for player_id, pdata in game.players.items()
+        ]
+    )
+
+class HistoryStore:
+    """Grava as partidas encerradas em lote numa thread própria e responde às consultas"""
+    POLL_INTERVAL = 0.002
+
+    def __init__(self, path: str, flush_interval: float = 0.5, max_pending: int = 10000,
+                 is_bot: Callable[[str], bool] = lambda player_id: False,
+                 wait: Callable[[float], None] = time.sleep):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.is_bot = is_bot
+        self._wait = wait
+        self.written = 0
+        self.dropped = 0
+        self._start_thread, self._sleep, allocate_lock, _ = real_thread_tools()
+        # Locks do sistema: a fila e a conexão são usadas pela thread de gravação
+        self._lock = allocate_lock()
+        self._io_lock = allocate_lock()
+        self._pending: Deque[GameRecord] = deque()
+        self._closed = False
+
+        self._db = self._connect(check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        # Com WAL, NORMAL só faz fsync nos checkpoints: uma queda do sistema pode perder o último lote
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+        self._start_thread(self._run, ())
+
+    def _connect(self, **kwargs) -> sqlite3.Connection:
+        db = sqlite3.connect(self.path, timeout=5.0, **kwargs)
+        db.row_factory = sqlite3.Row
+        return db
+
+    def record(self, game: DominoGame, blocked: bool = False):
+        """Põe a partida encerrada na fila de gravação (não toca no disco)"""
+        entry = game_record(game, blocked, self.is_bot)
+        with self._lock:
+            # Disco parado por muito tempo: descarta as mais antigas em vez de crescer sem limite
+            if len(self._pending) >= self.max_pending:
+                self._pending.popleft()
+                self.dropped += 1
+            self._pending.append(entry)
+
+    def flush(self) -> int:
+        """Grava a fila numa transação; retorna quantas partidas foram gravadas"""
+        with self._io_lock:
+            with self._lock:
+                if not self._pending:
+                    return 0
+                batch, self._pending = list(self._pending), deque()
+            try:
+                with self._db:
+                    players = []
+                    for entry in batch:
+                        duration = entry.finished_at - entry.started_at if entry.started_at else None
+                        cursor = self._db.execute(
+                            "INSERT INTO games (room_code, started_at, finished_at, duration, moves, blocked, winner)"
+                            " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                            (entry.room_code, entry.started_at, entry.finished_at, duration,
+                             entry.moves, entry.blocked, entry.winner)
+                        )
+                        players.extend(
+                            (cursor.lastrowid, seat, name, points, won, bot, entry.finished_at)
+                            for seat, (name, points, won, bot) in enumerate(entry.players)
+                        )
+                    self._db.executemany(
+                        "INSERT INTO game_players (game_id, seat, name, points, won, bot, finished_at)"
+                        " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        players
+                    )
+            except sqlite3.Error:
+                # Volta para a fila e tenta de novo na próxima descarga
+                with self._lock:
+                    self._pending.extendleft(reversed(batch))
+                raise
+            self.written += len(batch)
+            return len(batch)
+
+    def _run(self):
+        while True:
+            self._sleep(self.flush_interval)
+            if self._closed:
+                return
+            try:
+                self.flush()
+            except sqlite3.Error as exc:
+                print(f'Falha ao gravar o histórico: {exc}')
+
+    def close(self):
+        """Grava o que falta e fecha a conexão de escrita"""
+        self._closed = True
+        self.flush()
+        with self._io_lock:
+            self._db.close()
+
+    def pending(self) -> int:
+        """Partidas esperando gravação"""
+        return len(self._pending)
+
+    def _off_loop(self, query: Callable, *args):
+        """Roda a consulta numa thread do sistema e espera o resultado com wait"""
+        outcome: List[Tuple[bool, object]] = []
+
+        def run():
+            try:
+                outcome.append((True, query(*args)))
+            except Exception as exc:
+                outcome.append((False, exc))
+
+        self._start_thread(run, ())
+        while not outcome:
+            self._wait(self.POLL_INTERVAL)
+        ok, value = outcome[0]
+        if not ok:
+            raise value
+        return value
+
+    def _range(self, since: Optional[float], until: Optional[float]) -> Tuple[float, float]:
+        return (since or 0.0, until or float("inf"))
+
+    def leaderboard(self, limit: int = 20, since: Optional[float] = None, until: Optional[float] = None,
+                    include_bots: bool = False) -> List[Dict]:
+        """Jogadores com mais vitórias no período (partidas, vitórias e pontos que sobraram na mão)"""
+        return self._off_loop(self._leaderboard, limit, since, until, include_bots)
+
+    def _leaderboard(self, limit: int, since: Optional[float], until: Optional[float],
+                     include_bots: bool) -> List[Dict]:
+        query = (
+            "SELECT name, COUNT(*) AS games, SUM(won) AS wins, SUM(points) AS points"
+            " FROM game_players WHERE finished_at >= ? AND finished_at < ?"
+            + ("" if include_bots else " AND bot = 0")
+            + " GROUP BY name ORDER BY wins DESC, games ASC, name LIMIT ?"
+        )
+        with closing(self._connect()) as db:
+            rows = db.execute(query, (*self._range(since, until), limit)).fetchall()
+        return [dict(row) for row in rows]
+
+    def player_games(self, name: str, limit: int = 20, since: Optional[float] = None,
+                     until: Optional[float] = None) -> List[Dict]:
+        """Últimas partidas do jogador no período, da mais recente para a mais antiga"""
+        return self._off_loop(self._player_games, name, limit, since, until)
+
+    def _player_games(self, name: str, limit: int, since: Optional[float],
+                      until: Optional[float]) -> List[Dict]:
+        with closing(self._connect()) as db:
+            games = db.execute(
+                "SELECT g.id, g.room_code, g.started_at, g.finished_at, g.duration, g.moves, g.blocked, g.winner"
+                " FROM game_players p JOIN games g ON g.id = p.game_id"
+                " WHERE p.name = ? AND p.finished_at >= ? AND p.finished_at < ?"
+                " ORDER BY p.finished_at DESC LIMIT ?",
+                (name, *self._range(since, until), limit)
+            ).fetchall()
+            players: Dict[int, List[Dict]] = {}
+            if games:
+                ids = [game["id"] for game in games]
+                for row in db.execute(
+                    f"SELECT game_id, name, points, won, bot FROM game_players"
+                    f" WHERE game_id IN ({','.join('?' * len(ids))}) ORDER BY game_id, seat",
+                    ids
+                ):
+                    players.setdefault(row["game_id"], []).append({
+                        "name": row["name"], "points": row["points"],
+                        "won": bool(row["won"]), "bot": bool(row["bot"])
+                    })
+        return [
+            {**{key: game[key] for key in game.keys() if key != "id"},
+             "blocked": bool(game["blocked"]), "players": players.get(game["id"], [])}
+            for game in games
+        ]
@@ -0,0 +1,218 @@
+"""Journal append-only das jogadas, para auditoria e recuperação após queda.
+
+Cada mudança de estado de um DominoGame vira um registro de tamanho fixo
+(game.JOURNAL_RECORD). Os registros ficam em segmentos journal-NNNNNN.log,
+cada um com um cabeçalho curto seguido dos registros, e podem ser lidos via
+mmap. As gravações vão para um buffer em memória e uma thread do sistema (de
+verdade, mesmo com o gevent) grava e faz o fsync em grupo a cada flush_interval;
+uma queda perde no máximo esse intervalo.
+
+Cada sala precisa de um único gravador: recover() só reconstrói a sala se todos
+os registros dela estiverem no mesmo diretório. Por isso o diretório fica
+travado (flock) pelo processo que o abriu, e o journal não pode ser usado com
+as salas compartilhadas entre workers (ROOM_STORE_URL), em que as jogadas de uma
+sala se espalhariam pelos journals de vários processos.
+"""
+import fcntl
+import mmap
+import os
+import re
+import struct
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from game import (
+    JOURNAL_DRAW, JOURNAL_JOIN, JOURNAL_LEAVE, JOURNAL_PASS, JOURNAL_PLAY, JOURNAL_RECORD,
+    JOURNAL_START, DominoGame
+)
+from realthreads import real_thread_tools
+
+_SEGMENT_NAME = re.compile(r"^journal-(\d{6})\.log$")
+
+class MoveJournal:
+    """Grava os registros em segmentos, com fsync agrupado em segundo plano"""
+    MAGIC = b"DMJ1"
+    # Cabeçalho do segmento: marca, versão do formato, tamanho do registro, número do segmento
+    HEADER = struct.Struct("<4sHHI")
+    FORMAT_VERSION = 1
+
+    def __init__(self, directory: str, segment_size: int = 64 << 20, flush_interval: float = 0.01,
+                 max_buffer: int = 1 << 20, fsync: bool = True):
+        self.directory = directory
+        self.segment_size = segment_size
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+        self.fsync = fsync
+        self.records_written = 0
+        self.flushes = 0
+        self._buffer = bytearray()
+        start_thread, _, allocate_lock, _ = real_thread_tools()
+        # Locks do sistema: o buffer e o segmento são usados pela thread de gravação
+        self._lock = allocate_lock()
+        self._io_lock = allocate_lock()
+        # Solto para acordar a thread antes do intervalo; _done é solto quando ela termina
+        self._wakeup = allocate_lock()
+        self._wakeup.acquire()
+        self._done = allocate_lock()
+        self._done.acquire()
+        self._closed = False
+
+        os.makedirs(directory, exist_ok=True)
+        self._lock_fd = os.open(os.path.join(directory, "journal.lock"), os.O_WRONLY | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(self._lock_fd)
+            raise RuntimeError(f"O journal em {directory} já está em uso por outro processo") from None
+        segments = list_segments(directory)
+        if segments:
+            self._open_existing(segments[-1])
+        else:
+            self._open_segment(1)
+
+        start_thread(self._run, ())
+
+    def _segment_path(self, number: int) -> str:
+        return os.path.join(self.directory, f"journal-{number:06d}.log")
+
+    def _open_segment(self, number: int):
+        self._segment = number
+        self._fd = os.open(self._segment_path(number), os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        header = self.HEADER.pack(self.MAGIC, self.FORMAT_VERSION, JOURNAL_RECORD.size, number)
+        os.write(self._fd, header)
+        self._size = len(header)
+
+    def _open_existing(self, path: str):
+        """Continua o último segmento, descartando um registro incompleto deixado por uma queda"""
+        number = int(_SEGMENT_NAME.match(os.path.basename(path)).group(1))
+        size = os.path.getsize(path)
+        if size < self.HEADER.size:
+            os.remove(path)
+            self._open_segment(number)
+            return
+        valid = size - (size - self.HEADER.size) % JOURNAL_RECORD.size
+        if valid != size:
+            os.truncate(path, valid)
+        self._segment = number
+        self._fd = os.open(path, os.O_WRONLY | os.O_APPEND)
+        self._size = valid
+
+    def append(self, records: Iterable[bytes]):
+        """Acrescenta registros ao buffer; a gravação em disco acontece na próxima descarga"""
+        with self._lock:
+            for record in records:
+                self._buffer += record
+            full = len(self._buffer) >= self.max_buffer
+        if full:
+            self._wake()
+
+    def _wake(self):
+        try:
+            self._wakeup.release()
+        except RuntimeError:
+            pass  # já acordada
+
+    def flush(self):
+        """Grava o buffer no segmento atual (trocando de segmento se encher) e faz o fsync"""
+        with self._io_lock:
+            with self._lock:
+                if not self._buffer:
+                    return
+                data, self._buffer = bytes(self._buffer), bytearray()
+            view = memoryview(data)
+            while view:
+                room = self.segment_size - self._size
+                room -= room % JOURNAL_RECORD.size
+                if room <= 0:
+                    self._sync()
+                    os.close(self._fd)
+                    self._open_segment(self._segment + 1)
+                    continue
+                chunk = view[:room]
+                os.write(self._fd, chunk)
+                self._size += len(chunk)
+                view = view[len(chunk):]
+            self._sync()
+            self.records_written += len(data) // JOURNAL_RECORD.size
+            self.flushes += 1
+
+    def _sync(self):
+        if self.fsync:
+            os.fsync(self._fd)
+
+    def _run(self):
+        try:
+            while not self._closed:
+                self._wakeup.acquire(True, self.flush_interval)
+                try:
+                    self.flush()
+                except OSError as exc:
+                    print(f'Falha ao gravar o journal: {exc}')
+        finally:
+            self._done.release()
+
+    def close(self):
+        """Grava o que falta, fecha o segmento atual e libera o diretório"""
+        self._closed = True
+        self._wake()
+        self._done.acquire()
+        self.flush()
+        os.close(self._fd)
+        os.close(self._lock_fd)
+
+def list_segments(directory: str) -> List[str]:
+    """Segmentos do diretório, em ordem de gravação"""
+    names = sorted(name for name in os.listdir(directory) if _SEGMENT_NAME.match(name))
+    return [os.path.join(directory, name) for name in names]
+
+def read_records(directory: str, room_code: Optional[str] = None) -> Iterator[bytes]:
+    """Percorre os registros gravados (de uma sala, se informada) via mmap, em ordem"""
+    prefix = room_code.encode()[:6].ljust(6, b"\0") if room_code else None
+    size = JOURNAL_RECORD.size
+    for path in list_segments(directory):
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size <= MoveJournal.HEADER.size:
+                continue
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                magic, _, record_size, _ = MoveJournal.HEADER.unpack_from(data, 0)
+                if magic != MoveJournal.MAGIC or record_size != size:
+                    raise ValueError(f"Segmento de journal inválido: {path}")
+                for offset in range(MoveJournal.HEADER.size, len(data) - size + 1, size):
+                    if prefix is None or data[offset:offset + 6] == prefix:
+                        yield data[offset:offset + size]
+
+def recover(directory: str) -> Dict[str, DominoGame]:
+    """Reconstrói o último jogo de cada sala registrada no journal (de um único gravador)"""
+    by_room: Dict[str, List[bytes]] = {}
+    for record in read_records(directory):
+        by_room.setdefault(record[:6].rstrip(b"\0").decode(), []).append(record)
+    return {room_code: DominoGame.replay(records) for room_code, records in by_room.items()}
+
+_KIND_NAMES = {
+    JOURNAL_JOIN: "join", JOURNAL_LEAVE: "leave", JOURNAL_START: "start",
+    JOURNAL_PLAY: "play", JOURNAL_DRAW: "draw", JOURNAL_PASS: "pass"
+}
+
+def main():
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Mostra os registros do journal de uma sala e o estado reconstruído")
+    parser.add_argument('directory')
+    parser.add_argument('room_code')
+    args = parser.parse_args()
+
+    records = list(read_records(args.directory, args.room_code.upper()))
+    for record in records:
+        _, kind, seat, version, tile, side, _ = JOURNAL_RECORD.unpack(record)
+        line = f"v{version:<5} {_KIND_NAMES.get(kind, kind):<6} lugar {seat}"
+        if kind in (JOURNAL_PLAY, JOURNAL_DRAW):
+            line += f" peça {tile}"
+        if kind == JOURNAL_PLAY:
+            line += f" {'direita' if side else 'esquerda'}"
+        print(line)
+    if records:
+        game = DominoGame.replay(records)
+        print(json.dumps(game.to_snapshot(), ensure_ascii=False))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from game import DominoGame
+from store import GameStore
+
+class RoomReaper:
+    """Remove salas ociosas, encerradas ou esperando há muito tempo, e limita o total de salas
+
+    TTLs em segundos (0 desativa); max_rooms = 0 desativa o limite.
+    on_evict(room_code, reason) é chamada depois que a sala sai do armazenamento.
+    """
+    REASONS = ("idle", "finished", "waiting", "capacity")
+
+    def __init__(self, store: GameStore, idle_ttl: float = 1800, finished_ttl: float = 300,
+                 waiting_ttl: float = 3600, max_rooms: int = 0,
+                 on_evict: Optional[Callable[[str, str], None]] = None):
+        self.store = store
+        self.idle_ttl = idle_ttl
+        self.finished_ttl = finished_ttl
+        self.waiting_ttl = waiting_ttl
+        self.max_rooms = max_rooms
+        self.on_evict = on_evict
+        self.evicted: Dict[str, int] = {reason: 0 for reason in self.REASONS}
+        self._started = False
+
+    def _expired_reason(self, game, now: float) -> Optional[str]:
+        age = now - game.updated_at
+        if game.game_finished:
+            ttl, reason = self.finished_ttl, "finished"
+        elif game.game_started:
+            ttl, reason = self.idle_ttl, "idle"
+        else:
+            ttl, reason = self.waiting_ttl, "waiting"
+        return reason if ttl and age > ttl else None
+
+    def _evict(self, room_code: str, reason_for: Callable[[DominoGame], Optional[str]]) -> Optional[str]:
+        """Remove a sala se reason_for(jogo) ainda der um motivo, relendo-a com o lock dela
+
+        A sala pode ter recebido uma jogada entre a leitura da varredura e o lock;
+        nesse caso reason_for decide de novo com o estado atual. Retorna o motivo.
+        """
+        with self.store.lock(room_code):
+            game = self.store.get(room_code)
+            reason = reason_for(game) if game is not None else None
+            if reason is None:
+                return None
+            self.store.delete(room_code)
+            self.evicted[reason] += 1
+            if self.on_evict:
+                self.on_evict(room_code, reason)
+        return reason
+
+    def _evict_oldest(self, rooms: List[Tuple[float, str]], count: int) -> List[str]:
+        """Remove até count salas por capacidade, das menos recentes, pulando as que tiveram atividade"""
+        rooms.sort()
+        evicted = []
+        for seen_at, room_code in rooms:
+            if len(evicted) == count:
+                break
+            if self._evict(room_code, lambda game: "capacity" if game.updated_at <= seen_at else None):
+                evicted.append(room_code)
+        return evicted
+
+    def sweep(self, now: Optional[float] = None) -> List[Tuple[str, str]]:
+        """Faz uma passada por todas as salas e retorna as removidas (código, motivo)"""
+        now = time.time() if now is None else now
+        evicted = []
+        alive = []
+        for room_code in self.store.room_codes():
+            game = self.store.get(room_code)
+            if game is None:
+                continue
+            reason = None
+            if self._expired_reason(game, now):
+                reason = self._evict(room_code, lambda game: self._expired_reason(game, now))
+            if reason:
+                evicted.append((room_code, reason))
+            else:
+                alive.append((game.updated_at, room_code))
+
+        # Acima do limite, remove as salas com atividade mais antiga
+        if self.max_rooms and len(alive) > self.max_rooms:
+            for room_code in self._evict_oldest(alive, len(alive) - self.max_rooms):
+                evicted.append((room_code, "capacity"))
+        return evicted
+
+    def make_room_for(self, incoming: int = 1):
+        """Garante espaço para novas salas, removendo as menos recentes se preciso"""
+        if not self.max_rooms or len(self.store) + incoming <= self.max_rooms:
+            return
+        rooms = []
+        for room_code in self.store.room_codes():
+            game = self.store.get(room_code)
+            if game is not None:
+                rooms.append((game.updated_at, room_code))
+        self._evict_oldest(rooms, len(rooms) + incoming - self.max_rooms)
+
+    def start(self, socketio, interval: float = 30):
+        """Inicia a varredura periódica em segundo plano (uma vez por processo)"""
+        if self._started:
+            return
+        self._started = True
+
+        def loop():
+            while True:
+                socketio.sleep(interval)
+                try:
+                    self.sweep()
+                except Exception as exc:
+                    print(f'Erro na limpeza de salas: {exc}')
+
+        socketio.start_background_task(loop)
@@ -0,0 +1,209 @@
+"""Gerador de carga: pares de clientes simulados jogando partidas com jogadas legais aleatórias.
+
+Uso: python loadtest.py --url http://localhost:5000 --clients 1000 --games 3
+
+Cada par cria uma sala, entra nela e joga --games partidas seguidas. A latência
+de uma jogada é o tempo entre o emit e a chegada do delta (ou erro) correspondente.
+Para muitos sockets, aumente o limite de descritores (ulimit -n).
+"""
+import argparse
+import asyncio
+import random
+import time
+from typing import List, Optional
+
+import socketio
+
+class SimulatedPlayer:
+    """Cliente que acompanha o próprio estado pelos snapshots e deltas e joga quando é a sua vez"""
+    def __init__(self, url: str, name: str, stats: "Stats", rng: random.Random):
+        self.url = url
+        self.name = name
+        self.stats = stats
+        self.rng = rng
+        self.sio = socketio.AsyncClient(reconnection=False)
+        self.room_code: Optional[str] = None
+        self.room_ready = asyncio.Event()
+        self.finished = asyncio.Event()
+        self.sent_at: Optional[float] = None
+        self._reset()
+
+        self.sio.on('room_created', self._on_room)
+        self.sio.on('game_started', self._on_snapshot)
+        self.sio.on('game_state', self._on_snapshot)
+        self.sio.on('game_delta', self._on_delta)
+        self.sio.on('error', self._on_error)
+
+    def _reset(self):
+        self.hand = set()
+        self.left_end = self.right_end = None
+        self.current = None
+        self.pool_count = 0
+        self.required_double = None
+        self.version = 0
+
+    async def connect(self):
+        await self.sio.connect(self.url, transports=['websocket'])
+        self.stats.connected += 1
+
+    async def _on_room(self, data):
+        self.room_code = data['room_code']
+        self.room_ready.set()
+
+    async def _on_snapshot(self, data):
+        self._reset()
+        self.version = data['version']
+        self.hand = {(p['left'], p['right']) for p in data['my_hand']}
+        if data['board']:
+            self.left_end = data['board'][0]['left']
+            self.right_end = data['board'][-1]['right']
+        self.current = data['current_player']
+        self.pool_count = data['pool_count']
+        self.required_double = data['required_double']
+        if data['game_finished']:
+            self.finished.set()
+        else:
+            await self._maybe_act()
+
+    async def _on_delta(self, data):
+        for event in data['events']:
+            if event['seq'] <= self.version:
+                continue
+            if event['seq'] != self.version + 1:
+                await self.sio.emit('get_game_state', {'room_code': data['room_code']})
+                return
+            self.version = event['seq']
+            mine = event['player'] == self.sio.get_sid()
+            if mine and self.sent_at is not None:
+                self.stats.record(time.perf_counter() - self.sent_at)
+                self.sent_at = None
+            if event['type'] == 'play':
+                piece = event['piece']
+                if mine:
+                    self.hand.discard((piece['left'], piece['right']))
+                    self.hand.discard((piece['right'], piece['left']))
+                if self.left_end is None:
+                    self.left_end, self.right_end = piece['left'], piece['right']
+                elif event['side'] == 'left':
+                    self.left_end = piece['left']
+                else:
+                    self.right_end = piece['right']
+                self.required_double = None
+            elif event['type'] == 'draw' and mine:
+                piece = event['piece']
+                self.hand.add((piece['left'], piece['right']))
+            self.current = event['current_player']
+            self.pool_count = event['pool_count']
+            if event['game_finished']:
+                self.finished.set()
+                return
+        await self._maybe_act()
+
+    async def _on_error(self, data):
+        self.stats.errors += 1
+        if self.sent_at is not None:
+            self.sent_at = None
+            await self.sio.emit('get_game_state', {'room_code': self.room_code})
+
+    def _choose_move(self):
+        if self.left_end is None:
+            if self.required_double is not None:
+                return (self.required_double, self.required_double), 'right'
+            return self.rng.choice(sorted(self.hand)), 'right'
+        moves = []
+        for piece in self.hand:
+            if self.left_end in piece:
+                moves.append((piece, 'left'))
+            if self.right_end in piece:
+                moves.append((piece, 'right'))
+        return self.rng.choice(moves) if moves else (None, None)
+
+    async def _maybe_act(self):
+        if self.current != self.sio.get_sid() or self.finished.is_set() or self.sent_at is not None:
+            return
+        piece, side = self._choose_move()
+        self.sent_at = time.perf_counter()
+        self.stats.moves += 1
+        if piece is not None:
+            await self.sio.emit('play_piece', {
+                'room_code': self.room_code, 'left': piece[0], 'right': piece[1], 'side': side
+            })
+        elif self.pool_count > 0:
+            await self.sio.emit('buy_piece', {'room_code': self.room_code})
+        else:
+            await self.sio.emit('pass_turn', {'room_code': self.room_code})
+
+class Stats:
+    def __init__(self):
+        self.connected = 0
+        self.failed = 0
+        self.moves = 0
+        self.errors = 0
+        self.games = 0
+        self.latencies: List[float] = []
+
+    def record(self, latency: float):
+        self.latencies.append(latency)
+
+    def percentile(self, q: float) -> float:
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+async def run_pair(url: str, index: int, games: int, stats: Stats, seed: int, timeout: float):
+    rng = random.Random(seed * 1_000_003 + index)
+    host = SimulatedPlayer(url, f'host{index}', stats, rng)
+    guest = SimulatedPlayer(url, f'guest{index}', stats, rng)
+    try:
+        await host.connect()
+        await guest.connect()
+        for _ in range(games):
+            for player in (host, guest):
+                player.finished.clear()
+                player._reset()
+            host.room_ready.clear()
+            await host.sio.emit('create_room', {'name': host.name})
+            await asyncio.wait_for(host.room_ready.wait(), timeout)
+            guest.room_code = host.room_code
+            await guest.sio.emit('join_room', {'room_code': host.room_code, 'name': guest.name})
+            await asyncio.wait_for(asyncio.gather(host.finished.wait(), guest.finished.wait()), timeout)
+            stats.games += 1
+    except (asyncio.TimeoutError, socketio.exceptions.ConnectionError):
+        stats.failed += 1
+    finally:
+        await host.sio.disconnect()
+        await guest.sio.disconnect()
+
+async def main_async(args):
+    stats = Stats()
+    pairs = args.clients // 2
+    started = time.perf_counter()
+    tasks = []
+    for index in range(pairs):
+        tasks.append(asyncio.create_task(run_pair(args.url, index, args.games, stats, args.seed, args.timeout)))
+        # Abre as conexões aos poucos para não afogar o accept do servidor
+        if args.ramp and index % args.ramp == args.ramp - 1:
+            await asyncio.sleep(1)
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - started
+
+    print(f'conexões:      {stats.connected} ok, {stats.failed} falhas')
+    print(f'partidas:      {stats.games}')
+    print(f'jogadas:       {stats.moves} ({stats.moves / elapsed:.0f}/s em {elapsed:.1f}s)')
+    print(f'erros:         {stats.errors}')
+    print(f'latência p50:  {stats.percentile(0.50) * 1000:.2f} ms')
+    print(f'latência p99:  {stats.percentile(0.99) * 1000:.2f} ms')
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', default='http://localhost:5000')
+    parser.add_argument('--clients', type=int, default=100, help='total de sockets (em pares)')
+    parser.add_argument('--games', type=int, default=1, help='partidas por par')
+    parser.add_argument('--ramp', type=int, default=500, help='pares conectados por segundo (0 = todos de uma vez)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--timeout', type=float, default=60.0, help='tempo máximo por partida, em segundos')
+    asyncio.run(main_async(parser.parse_args()))
+
+if __name__ == '__main__':
+    main()
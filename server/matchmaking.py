@@ -0,0 +1,145 @@
+"""Partida rápida: fila de jogadores pareados em lotes e códigos de sala sem colisão."""
+import hashlib
+import string
+import threading
+import time
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+ALPHABET = string.ascii_uppercase + string.digits
+CODE_LENGTH = 6
+CODE_SPACE = len(ALPHABET) ** CODE_LENGTH
+
+class RoomCodeAllocator:
+    """Códigos de sala sem colisão e sem ordem aparente
+
+    O n-ésimo código é uma permutação com chave de n sobre os 36^6 códigos (rede
+    de Feistel de 32 bits com cycle walking): números diferentes nunca geram o
+    mesmo código até 36^6 salas, e quem vê alguns códigos não adivinha os próximos.
+    Os números vêm de reserve(count), que devolve o primeiro de um bloco reservado
+    (store.reserve_codes, compartilhado entre workers no Redis). A chave sai do
+    segredo do servidor, então todos os workers usam a mesma permutação.
+    """
+    ROUNDS = 4
+
+    def __init__(self, reserve: Callable[[int], int], secret: str = "", block: int = 256):
+        self._reserve = reserve
+        self._block = block
+        self._keys = [
+            hashlib.blake2b(f"{secret}:{round_}".encode(), digest_size=16).digest()
+            for round_ in range(self.ROUNDS)
+        ]
+        self._next = self._end = 0
+        self._lock = threading.Lock()
+
+    def _round(self, key: bytes, half: int) -> int:
+        return int.from_bytes(hashlib.blake2b(half.to_bytes(2, "little"), key=key, digest_size=2).digest(), "little")
+
+    def _permute(self, number: int) -> int:
+        value = number
+        while True:
+            left, right = value >> 16, value & 0xFFFF
+            for key in self._keys:
+                left, right = right, left ^ self._round(key, right)
+            value = left << 16 | right
+            # Fora do intervalo: aplica de novo até cair nele (continua sendo permutação)
+            if value < CODE_SPACE:
+                return value
+
+    def code(self, number: int) -> str:
+        """Código da sala de número number"""
+        value = self._permute(number % CODE_SPACE)
+        chars = []
+        for _ in range(CODE_LENGTH):
+            value, digit = divmod(value, len(ALPHABET))
+            chars.append(ALPHABET[digit])
+        return "".join(chars)
+
+    def allocate(self, count: int = 1) -> List[str]:
+        """Reserva count códigos novos"""
+        with self._lock:
+            if self._end - self._next < count:
+                size = max(self._block, count)
+                self._next = self._reserve(size)
+                self._end = self._next + size
+            first = self._next
+            self._next += count
+        return [self.code(number) for number in range(first, first + count)]
+
+class Ticket(NamedTuple):
+    sid: str
+    name: str
+    rating: Optional[int]
+    enqueued_at: float
+
+class MatchQueue:
+    """Jogadores esperando partida; pair() forma os pares em lote a cada tick
+
+    Com rating_bucket > 0, só se pareiam jogadores da mesma faixa de rating
+    (rating // rating_bucket), ordenados por rating dentro dela; quem espera mais
+    que max_wait segundos (ou não informou rating) pareia com qualquer um.
+    """
+    def __init__(self, rating_bucket: int = 0, max_wait: float = 10.0):
+        self.rating_bucket = rating_bucket
+        self.max_wait = max_wait
+        # Ordem de chegada (os dicionários mantêm a ordem de inserção)
+        self._waiting: Dict[str, Ticket] = {}
+        self._lock = threading.Lock()
+
+    def enqueue(self, sid: str, name: str, rating: Optional[int] = None) -> bool:
+        """Coloca a sessão na fila; False se ela já estava esperando"""
+        with self._lock:
+            if sid in self._waiting:
+                return False
+            self._waiting[sid] = Ticket(sid, name, rating, time.monotonic())
+            return True
+
+    def cancel(self, sid: str) -> bool:
+        """Tira a sessão da fila; False se ela não estava esperando"""
+        with self._lock:
+            return self._waiting.pop(sid, None) is not None
+
+    def requeue(self, tickets: List[Ticket]):
+        """Devolve à fila, com a espera original, jogadores de um par que não virou sala"""
+        with self._lock:
+            for ticket in tickets:
+                self._waiting.setdefault(ticket.sid, ticket)
+
+    def _bucket(self, ticket: Ticket, now: float):
+        if not self.rating_bucket or ticket.rating is None or now - ticket.enqueued_at >= self.max_wait:
+            return None
+        return ticket.rating // self.rating_bucket
+
+    def pair(self, now: Optional[float] = None) -> List[Tuple[Ticket, Ticket]]:
+        """Forma todos os pares possíveis agora e os tira da fila"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            if len(self._waiting) < 2:
+                return []
+            groups: Dict[Optional[int], List[Ticket]] = {}
+            for ticket in self._waiting.values():
+                groups.setdefault(self._bucket(ticket, now), []).append(ticket)
+
+            pairs = []
+            leftovers = []
+            for bucket, tickets in groups.items():
+                if bucket is not None:
+                    tickets.sort(key=lambda ticket: ticket.rating)
+                pairs.extend(zip(tickets[0:len(tickets) - 1:2], tickets[1::2]))
+                if len(tickets) % 2 and bucket is not None:
+                    leftovers.append(tickets[-1])
+            # Quem pareia com qualquer um e sobrou fica com o que espera há mais tempo
+            # entre os que sobraram nas faixas; os outros continuam para a próxima passada
+            anyone = groups.get(None, [])
+            if len(anyone) % 2 and leftovers:
+                partner = min(leftovers, key=lambda ticket: ticket.enqueued_at)
+                pairs.append((anyone[-1], partner))
+            for first, second in pairs:
+                del self._waiting[first.sid]
+                del self._waiting[second.sid]
+            return pairs
+
+    def __contains__(self, sid: str) -> bool:
+        return sid in self._waiting
+
+    def __len__(self) -> int:
+        return len(self._waiting)
@@ -0,0 +1,100 @@
+"""Envio das jogadas agrupado por sala em janelas curtas.
+
+A primeira jogada de uma sala abre uma janela de window segundos; as que chegam
+dentro dela (ex.: compras seguidas, ou a resposta do bot) entram no mesmo lote.
+No fim da janela cada jogador recebe um único game_delta com todos os eventos,
+as jogadas possíveis mais recentes e o aviso de fim de jogo, se houver. Com
+window=0 cada jogada sai na hora, já com o aviso de fim no mesmo frame.
+"""
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+from game import DominoGame, DominoPiece, event_view, moves_to_dicts
+
+class DeltaBatch:
+    """Eventos de uma sala ainda não enviados e o que cada jogador precisa junto deles"""
+    __slots__ = ("room_code", "version", "events", "seats", "winner", "moves", "finish")
+
+    def __init__(self, room_code: str):
+        self.room_code = room_code
+        self.version = 0
+        self.events: List[Dict] = []
+        # Jogadores na ordem da mesa (os lugares da codificação compacta)
+        self.seats: List[str] = []
+        self.winner: Optional[str] = None
+        # Jogadas possíveis de cada destinatário no fim do lote
+        self.moves: Dict[str, List[Tuple[DominoPiece, str]]] = {}
+        self.finish: Optional[Dict] = None
+
+    def add(self, game: DominoGame, recipients: List[str], finish: Optional[Dict] = None):
+        """Junta a última jogada do jogo ao lote"""
+        self.version = game.version
+        self.events.append(game.last_event)
+        self.seats = list(game.players)
+        self.winner = game.winner
+        self.moves = {player_id: game.legal_moves(player_id) for player_id in recipients}
+        if finish is not None:
+            self.finish = finish
+
+    def view(self, player_id: str) -> Dict:
+        """O lote visto pelo jogador: sala, versão, eventos, jogadas possíveis e "finished" no fim do jogo"""
+        payload = {
+            "room_code": self.room_code,
+            "version": self.version,
+            "events": [event_view(event, player_id) for event in self.events],
+            "legal_moves": moves_to_dicts(self.moves.get(player_id, [])),
+        }
+        if self.finish is not None:
+            payload["finished"] = self.finish
+        return payload
+
+class RoomOutbox:
+    """Lotes pendentes por sala; send(batch) envia o lote a cada destinatário
+
+    spawn(func, *args) roda func em segundo plano e sleep(seconds) espera no modo
+    assíncrono do servidor. lock(room_code) é o lock da sala: o envio no fim da
+    janela fica em série com as jogadas da sala. recipients(game) diz quem recebe.
+    """
+    def __init__(self, send: Callable[[DeltaBatch], None], window: float,
+                 spawn: Callable, sleep: Callable[[float], None], lock: Callable,
+                 recipients: Callable[[DominoGame], List[str]] = lambda game: list(game.players)):
+        self.window = window
+        self._send = send
+        self._spawn = spawn
+        self._sleep = sleep
+        self._room_lock = lock
+        self._recipients = recipients
+        self._pending: Dict[str, DeltaBatch] = {}
+        self._lock = threading.Lock()
+
+    def push(self, game: DominoGame, finish: Optional[Dict] = None):
+        """Agenda o envio da última jogada do jogo (chame com o lock da sala)"""
+        recipients = self._recipients(game)
+        if not self.window:
+            batch = DeltaBatch(game.room_code)
+            batch.add(game, recipients, finish)
+            self._send(batch)
+            return
+        with self._lock:
+            batch = self._pending.get(game.room_code)
+            opened = batch is None
+            if opened:
+                batch = self._pending[game.room_code] = DeltaBatch(game.room_code)
+            batch.add(game, recipients, finish)
+        if opened:
+            self._spawn(self._flush_later, game.room_code)
+
+    def flush(self, room_code: str):
+        """Envia agora o lote pendente da sala, se houver (ex.: antes de outra mensagem para a sala)"""
+        with self._lock:
+            batch = self._pending.pop(room_code, None)
+        if batch is not None:
+            self._send(batch)
+
+    def _flush_later(self, room_code: str):
+        self._sleep(self.window)
+        with self._room_lock(room_code):
+            self.flush(room_code)
+
+    def __len__(self) -> int:
+        return len(self._pending)
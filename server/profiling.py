@@ -0,0 +1,197 @@
+"""Perfis de execução opcionais e log de handlers lentos.
+
+PROFILE_MODE escolhe o perfil (vazio desativa):
+  cprofile  cProfile em volta dos handlers; grava profile-<pid>-<hora>.pstats
+            (abre com pstats, snakeviz etc.). Um handler é perfilado por vez;
+            os que chegam enquanto outro está sendo medido rodam sem perfil.
+  sample    amostra as pilhas das threads que estão dentro de um handler a cada
+            PROFILE_SAMPLE_MS e grava stacks-<pid>-<hora>.folded, no formato
+            "f1;f2;f3 contagem" do flamegraph.pl/speedscope.
+Os arquivos vão para PROFILE_DIR a cada PROFILE_DUMP_INTERVAL segundos. Com um
+modo ativo, os métodos principais do DominoGame também ganham um histograma de
+tempo por método nas métricas.
+
+SLOW_HANDLER_MS (independente do modo) registra todo handler mais lento que o
+limite, com a sala e a jogada.
+"""
+import cProfile
+import functools
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Callable, Dict, Iterable, Optional
+
+from realthreads import real_thread_tools
+
+class SlowLog:
+    """Registra os handlers mais lentos que threshold segundos (0 desativa)"""
+    def __init__(self, threshold: float, path: Optional[str] = None):
+        self.threshold = threshold
+        self.path = path
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def record(self, event: str, sid: Optional[str], data, elapsed: float):
+        if not self.threshold or elapsed < self.threshold:
+            return
+        data = data if isinstance(data, dict) else {}
+        entry = {
+            "time": round(time.time(), 3),
+            "event": event,
+            "ms": round(elapsed * 1000, 2),
+            "sid": sid,
+            "room_code": data.get("room_code"),
+        }
+        if "left" in data:
+            entry["move"] = {"left": data.get("left"), "right": data.get("right"), "side": data.get("side")}
+        with self._lock:
+            self.count += 1
+            if self.path:
+                with open(self.path, "a") as f:
+                    f.write(json.dumps(entry) + "\n")
+            else:
+                print(f'Handler lento: {json.dumps(entry)}')
+
+class Profiler:
+    """Perfil de handlers (cProfile ou amostragem de pilhas) com gravação periódica"""
+    MODES = ("cprofile", "sample")
+
+    def __init__(self, mode: str, directory: str = "profiles", dump_interval: float = 60.0,
+                 sample_interval: float = 0.005):
+        if mode not in self.MODES:
+            raise ValueError(f"PROFILE_MODE desconhecido: {mode}")
+        self.mode = mode
+        self.directory = directory
+        self.dump_interval = dump_interval
+        self.sample_interval = sample_interval
+        self._start_thread, self._sleep, allocate_lock, self._get_ident = real_thread_tools()
+        # Lock do sistema: as pilhas são escritas pela thread de amostragem
+        self._lock = allocate_lock()
+        self._profile = cProfile.Profile()
+        self._profile_busy = threading.Lock()
+        self._stacks: Counter = Counter()
+        # Threads dentro de um handler (id -> quantos handlers aninhados)
+        self._active: Dict[int, int] = {}
+        self._started = False
+
+    def wrap(self, handler: Callable) -> Callable:
+        """Envolve o handler com o perfil do modo escolhido"""
+        if self.mode == "cprofile":
+            @functools.wraps(handler)
+            def profiled(*args, **kwargs):
+                if not self._profile_busy.acquire(blocking=False):
+                    return handler(*args, **kwargs)
+                try:
+                    return self._profile.runcall(handler, *args, **kwargs)
+                finally:
+                    self._profile_busy.release()
+            return profiled
+
+        @functools.wraps(handler)
+        def tracked(*args, **kwargs):
+            ident = self._get_ident()
+            self._active[ident] = self._active.get(ident, 0) + 1
+            try:
+                return handler(*args, **kwargs)
+            finally:
+                remaining = self._active[ident] - 1
+                if remaining:
+                    self._active[ident] = remaining
+                else:
+                    del self._active[ident]
+        return tracked
+
+    def start(self):
+        """Inicia a amostragem (modo sample) e a gravação periódica, uma vez por processo"""
+        if self._started:
+            return
+        self._started = True
+        os.makedirs(self.directory, exist_ok=True)
+        if self.mode == "sample":
+            self._start_thread(self._sample_loop, ())
+        threading.Thread(target=self._dump_loop, name="profile-dump", daemon=True).start()
+
+    def _sample_loop(self):
+        own = self._get_ident()
+        while True:
+            self._sleep(self.sample_interval)
+            active = set(self._active)
+            if not active:
+                continue
+            for ident, frame in sys._current_frames().items():
+                if ident == own or ident not in active:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                with self._lock:
+                    self._stacks[";".join(reversed(stack))] += 1
+
+    def _dump_loop(self):
+        while True:
+            time.sleep(self.dump_interval)
+            try:
+                self.dump()
+            except OSError as exc:
+                print(f'Falha ao gravar o perfil: {exc}')
+
+    def dump(self) -> Optional[str]:
+        """Grava o que foi coletado desde a última gravação e recomeça; retorna o arquivo"""
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        if self.mode == "cprofile":
+            with self._profile_busy:
+                profile, self._profile = self._profile, cProfile.Profile()
+            try:
+                stats = pstats.Stats(profile)
+            except TypeError:
+                # Nenhum handler foi perfilado no intervalo
+                return None
+            path = os.path.join(self.directory, f"profile-{os.getpid()}-{stamp}.pstats")
+            stats.dump_stats(path)
+            return path
+
+        with self._lock:
+            stacks, self._stacks = self._stacks, Counter()
+        if not stacks:
+            return None
+        path = os.path.join(self.directory, f"stacks-{os.getpid()}-{stamp}.folded")
+        with open(path, "w") as f:
+            for stack, count in stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        return path
+
+def instrument_methods(cls, names: Iterable[str], histogram):
+    """Troca os métodos da classe por versões que medem o tempo de cada chamada"""
+    for name in names:
+        method = getattr(cls, name)
+        is_classmethod = isinstance(cls.__dict__.get(name), classmethod)
+        function = method.__func__ if is_classmethod else method
+        series = histogram.labels(name)
+
+        def timed(*args, _function=function, _series=series, **kwargs):
+            started = time.perf_counter()
+            try:
+                return _function(*args, **kwargs)
+            finally:
+                _series.observe(time.perf_counter() - started)
+
+        functools.update_wrapper(timed, function)
+        setattr(cls, name, classmethod(timed) if is_classmethod else timed)
+
+def from_env() -> Optional[Profiler]:
+    """Cria o perfil configurado por PROFILE_MODE (None se desativado)"""
+    mode = os.getenv("PROFILE_MODE")
+    if not mode:
+        return None
+    return Profiler(
+        mode,
+        directory=os.getenv("PROFILE_DIR", "profiles"),
+        dump_interval=float(os.getenv("PROFILE_DUMP_INTERVAL", 60)),
+        sample_interval=float(os.getenv("PROFILE_SAMPLE_MS", 5)) / 1000
+    )
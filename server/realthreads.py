@@ -0,0 +1,20 @@
+"""Primitivas de thread do sistema, mesmo com o monkey patch do gevent aplicado.
+
+Com o gevent, threading vira greenlets que rodam no mesmo loop dos handlers: uma
+chamada que bloqueia (fsync, SQLite) para o servidor inteiro. Quem precisa de
+trabalho em paralelo de verdade (o journal, o histórico e o amostrador do perfil)
+pega aqui as versões originais.
+"""
+import time
+
+def real_thread_tools():
+    """start_new_thread, sleep, allocate_lock e get_ident do sistema, mesmo com o gevent aplicado"""
+    names = ("start_new_thread", "sleep", "allocate_lock", "get_ident")
+    try:
+        from gevent import monkey
+        if monkey.is_module_patched("threading"):
+            return tuple(monkey.get_original("time" if name == "sleep" else "_thread", name) for name in names)
+    except ImportError:
+        pass
+    import _thread
+    return _thread.start_new_thread, time.sleep, _thread.allocate_lock, _thread.get_ident
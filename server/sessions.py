@@ -0,0 +1,101 @@
+import threading
+from typing import Dict, Optional, Set
+
+class SessionRegistry:
+    """Mapeia cada sessão (sid) para a sua sala, e cada sala para as suas sessões"""
+    def __init__(self):
+        self._room_by_sid: Dict[str, str] = {}
+        self._sids_by_room: Dict[str, Set[str]] = {}
+        # Codificação das mensagens de cada sessão conectada (ver wire.py)
+        self._encoding_by_sid: Dict[str, str] = {}
+        # Espectadores: sala assistida por cada sessão, e espectadores de cada sala
+        self._watched_by_sid: Dict[str, str] = {}
+        self._watchers_by_room: Dict[str, Set[str]] = {}
+        self._lock = threading.Lock()
+
+    def set_encoding(self, sid: str, encoding: str):
+        """Guarda a codificação negociada pela sessão no connect"""
+        self._encoding_by_sid[sid] = encoding
+
+    def encoding_of(self, sid: str, default: str = "json") -> str:
+        """Codificação da sessão; sessões de outros workers ficam com o padrão"""
+        return self._encoding_by_sid.get(sid, default)
+
+    def forget(self, sid: str):
+        """Esquece a sessão desconectada"""
+        self._encoding_by_sid.pop(sid, None)
+
+    def is_connected(self, sid: str) -> bool:
+        """Se a sessão está conectada a este processo (negociou a codificação e não saiu)"""
+        return sid in self._encoding_by_sid
+
+    def bind(self, sid: str, room_code: str):
+        """Associa a sessão à sala (uma sessão fica em uma sala por vez)"""
+        with self._lock:
+            self._unbind(sid)
+            self._room_by_sid[sid] = room_code
+            self._sids_by_room.setdefault(room_code, set()).add(sid)
+
+    def unbind(self, sid: str) -> Optional[str]:
+        """Remove a associação da sessão e retorna a sala em que ela estava"""
+        with self._lock:
+            return self._unbind(sid)
+
+    def _unbind(self, sid: str) -> Optional[str]:
+        room_code = self._room_by_sid.pop(sid, None)
+        if room_code is not None:
+            sids = self._sids_by_room.get(room_code)
+            if sids is not None:
+                sids.discard(sid)
+                if not sids:
+                    del self._sids_by_room[room_code]
+        return room_code
+
+    def room_of(self, sid: str) -> Optional[str]:
+        """Retorna a sala da sessão, se houver"""
+        return self._room_by_sid.get(sid)
+
+    def watch(self, sid: str, room_code: str):
+        """Registra a sessão como espectadora da sala"""
+        with self._lock:
+            self._unwatch(sid)
+            self._watched_by_sid[sid] = room_code
+            self._watchers_by_room.setdefault(room_code, set()).add(sid)
+
+    def unwatch(self, sid: str) -> Optional[str]:
+        """Para de assistir e retorna a sala que a sessão assistia"""
+        with self._lock:
+            return self._unwatch(sid)
+
+    def _unwatch(self, sid: str) -> Optional[str]:
+        room_code = self._watched_by_sid.pop(sid, None)
+        if room_code is not None:
+            sids = self._watchers_by_room.get(room_code)
+            if sids is not None:
+                sids.discard(sid)
+                if not sids:
+                    del self._watchers_by_room[room_code]
+        return room_code
+
+    def watched_by(self, sid: str) -> Optional[str]:
+        """Retorna a sala que a sessão assiste, se houver"""
+        return self._watched_by_sid.get(sid)
+
+    def watchers(self, room_code: str) -> int:
+        """Quantos espectadores da sala estão conectados a este processo"""
+        return len(self._watchers_by_room.get(room_code, ()))
+
+    def watcher_count(self) -> int:
+        """Total de espectadores conectados a este processo"""
+        return len(self._watched_by_sid)
+
+    def drop_room(self, room_code: str):
+        """Remove a sala e todas as sessões associadas a ela (jogadores e espectadores)"""
+        with self._lock:
+            for sid in self._sids_by_room.pop(room_code, ()):
+                del self._room_by_sid[sid]
+            for sid in self._watchers_by_room.pop(room_code, ()):
+                del self._watched_by_sid[sid]
+
+    def __len__(self):
+        return len(self._room_by_sid)
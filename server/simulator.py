@@ -0,0 +1,265 @@
+"""Simulador em lote: muitas partidas em paralelo com arrays NumPy, seguindo as regras de DominoGame.
+
+Cada passo executa uma ação (jogar, comprar ou passar) do jogador da vez em
+todas as partidas ainda em andamento. O embaralhamento de cada partida usa a
+semente dela do mesmo jeito que DominoGame(rng=random.Random(seed)).start_game,
+então com políticas determinísticas os resultados são iguais aos de
+play_reference(seed, ...).
+
+Uso: python simulator.py --games 100000 --check 200
+"""
+import argparse
+import random
+import time
+from typing import Callable, Dict, Iterable, NamedTuple, Sequence, Tuple
+
+import numpy as np
+
+from game import PIP_MASKS, TILE_INDEX, TILE_POINTS, TILES, DominoGame
+
+LEFT, RIGHT = 0, 1
+
+_TILE_A = np.array([a for a, _ in TILES], dtype=np.int64)
+_TILE_B = np.array([b for _, b in TILES], dtype=np.int64)
+_POINTS = np.array(TILE_POINTS, dtype=np.int64)
+_BITS = np.int64(1) << np.arange(len(TILES), dtype=np.int64)
+# Máscara das peças que encaixam em cada número; índice 7 (mesa vazia) = todas
+_PIP = np.array(PIP_MASKS + [(1 << len(TILES)) - 1], dtype=np.int64)
+# Índices das duplas, da menor para a maior
+_DOUBLES = [TILE_INDEX[(n, n)] for n in range(7)]
+
+# Política: recebe as máscaras de peças legais e as pontas da mesa (-1 = vazia)
+# de um grupo de partidas e devolve, para cada uma, a peça e o lado (LEFT/RIGHT)
+Policy = Callable[[np.ndarray, np.ndarray, np.ndarray, np.random.Generator], Tuple[np.ndarray, np.ndarray]]
+
+def _bit_matrix(masks: np.ndarray) -> np.ndarray:
+    """(n,) máscaras -> (n, 28) booleanos"""
+    return (masks[:, None] & _BITS[None, :]) != 0
+
+def _fitting_side(tiles: np.ndarray, left: np.ndarray, right: np.ndarray) -> np.ndarray:
+    """Lado em que a peça encaixa, preferindo a direita (como DominoGame.can_play_piece)"""
+    fits_right = (right < 0) | (_TILE_A[tiles] == right) | (_TILE_B[tiles] == right)
+    return np.where(fits_right, RIGHT, LEFT)
+
+def first_legal(legal, left, right, rng):
+    """Joga a peça legal de menor índice, na direita se couber"""
+    tiles = np.argmax(_bit_matrix(legal), axis=1)
+    return tiles, _fitting_side(tiles, left, right)
+
+def heaviest(legal, left, right, rng):
+    """Livra-se primeiro da peça com mais pontos (empate: menor índice)"""
+    score = np.where(_bit_matrix(legal), _POINTS * 32 + (31 - np.arange(len(TILES))), -1)
+    tiles = np.argmax(score, axis=1)
+    return tiles, _fitting_side(tiles, left, right)
+
+def random_legal(legal, left, right, rng):
+    """Peça legal e lado aleatórios (não reproduzível peça a peça contra play_reference)"""
+    score = np.where(_bit_matrix(legal), rng.random((len(legal), len(TILES))), -1.0)
+    tiles = np.argmax(score, axis=1)
+    fits_left = (left >= 0) & ((_TILE_A[tiles] == left) | (_TILE_B[tiles] == left))
+    fits_right = (left < 0) | (_TILE_A[tiles] == right) | (_TILE_B[tiles] == right)
+    coin = rng.random(len(legal)) < 0.5
+    sides = np.where(fits_left & fits_right, np.where(coin, LEFT, RIGHT), np.where(fits_right, RIGHT, LEFT))
+    return tiles, sides
+
+POLICIES: Dict[str, Policy] = {
+    "first": first_legal,
+    "heaviest": heaviest,
+    "random": random_legal,
+}
+
+class BatchResult(NamedTuple):
+    winner: np.ndarray   # (n,) índice do vencedor na ordem de entrada (0 ou 1)
+    points: np.ndarray   # (n, 2) pontos na mão de cada jogador ao final
+    moves: np.ndarray    # (n,) ações executadas (jogadas, compras e passes)
+    blocked: np.ndarray  # (n,) partida terminou bloqueada
+
+def deal(seed: int) -> list:
+    """Ordem das peças embaralhadas por DominoGame.start_game com rng=random.Random(seed)"""
+    order = list(range(len(TILES)))
+    random.Random(seed).shuffle(order)
+    return order
+
+def _hand_points(masks: np.ndarray) -> np.ndarray:
+    return (_bit_matrix(masks) * _POINTS).sum(axis=1)
+
+def _highest_double_tile(masks: np.ndarray) -> np.ndarray:
+    """Índice da maior dupla de cada máscara (-1 se não houver)"""
+    result = np.full(len(masks), -1, dtype=np.int64)
+    for tile in _DOUBLES:
+        result = np.where(masks & (1 << tile), tile, result)
+    return result
+
+def simulate(seeds: Sequence[int], policies: Tuple[Policy, Policy] = (first_legal, first_legal),
+             rng: np.random.Generator = None) -> BatchResult:
+    """Joga uma partida por semente, todas em lockstep"""
+    n = len(seeds)
+    rng = rng if rng is not None else np.random.default_rng(0)
+    deals = np.array([deal(seed) for seed in seeds], dtype=np.int64).reshape(n, len(TILES))
+
+    hands = np.zeros((n, 2), dtype=np.int64)
+    for player in range(2):
+        hands[:, player] = _BITS[deals[:, player * 7:(player + 1) * 7]].sum(axis=1)
+    pool = deals[:, 14:]
+    pool_len = np.full(n, pool.shape[1], dtype=np.int64)
+
+    left = np.full(n, -1, dtype=np.int64)
+    right = np.full(n, -1, dtype=np.int64)
+    passes = np.zeros(n, dtype=np.int64)
+    moves = np.zeros(n, dtype=np.int64)
+    finished = np.zeros(n, dtype=bool)
+    blocked = np.zeros(n, dtype=bool)
+    winner = np.full(n, -1, dtype=np.int64)
+    idx = np.arange(n)
+
+    # Começa quem tem a maior dupla; sem duplas, o primeiro jogador
+    doubles = np.stack([_highest_double_tile(hands[:, 0]), _highest_double_tile(hands[:, 1])], axis=1)
+    current = np.where(doubles[:, 1] > doubles[:, 0], 1, 0)
+
+    def playable(g):
+        return _PIP[np.where(left[g] < 0, 7, left[g])] | _PIP[np.where(right[g] < 0, 7, right[g])]
+
+    def finish_if_blocked(g):
+        stuck = ((hands[g, 0] | hands[g, 1]) & playable(g)) == 0
+        g = g[stuck]
+        points = np.stack([_hand_points(hands[g, 0]), _hand_points(hands[g, 1])], axis=1)
+        finished[g] = True
+        blocked[g] = True
+        winner[g] = np.where(points[:, 1] < points[:, 0], 1, 0)
+
+    while True:
+        active = idx[~finished]
+        if not len(active):
+            break
+        cur = current[active]
+        hand = hands[active, cur]
+        empty = left[active] < 0
+
+        # Primeira jogada: a maior dupla da mão, se houver
+        required = _highest_double_tile(hand)
+        first = np.where(required >= 0, np.int64(1) << np.maximum(required, 0), hand)
+        legal = np.where(empty, first, hand & playable(active))
+        can_buy = (legal == 0) & (pool_len[active] > 0)
+        must_pass = (legal == 0) & ~can_buy
+        moves[active] += 1
+
+        # Jogadas, separadas pela política de cada jogador
+        for player in (0, 1):
+            sel = (legal != 0) & (cur == player)
+            g = active[sel]
+            if not len(g):
+                continue
+            tiles, sides = policies[player](legal[sel], left[g], right[g], rng)
+            hands[g, player] &= ~_BITS[tiles]
+            a, b = _TILE_A[tiles], _TILE_B[tiles]
+            was_empty = left[g] < 0
+            new_left = np.where(sides == LEFT, a + b - left[g], left[g])
+            new_right = np.where(sides == RIGHT, a + b - right[g], right[g])
+            left[g] = np.where(was_empty, a, new_left)
+            right[g] = np.where(was_empty, b, new_right)
+            passes[g] = 0
+            out = hands[g, player] == 0
+            finished[g[out]] = True
+            winner[g[out]] = player
+            current[g[~out]] ^= 1
+
+        # Compras: a última peça do pool vai para a mão
+        g = active[can_buy]
+        if len(g):
+            pool_len[g] -= 1
+            player = cur[can_buy]
+            hands[g, player] |= _BITS[pool[g, pool_len[g]]]
+            stuck = ((hands[g, player] & playable(g)) == 0) & (pool_len[g] == 0)
+            finish_if_blocked(g[stuck])
+
+        # Passes: sem peça legal e pool vazio
+        g = active[must_pass]
+        if len(g):
+            passes[g] += 1
+            current[g] ^= 1
+            finish_if_blocked(g[passes[g] >= 2])
+
+    points = np.stack([_hand_points(hands[:, 0]), _hand_points(hands[:, 1])], axis=1)
+    return BatchResult(winner, points, moves, blocked)
+
+def _numpy_policy_move(policy: Policy, legal: int, left: int, right: int,
+                       rng: np.random.Generator) -> Tuple[int, str]:
+    tiles, sides = policy(np.array([legal], dtype=np.int64), np.array([left], dtype=np.int64),
+                          np.array([right], dtype=np.int64), rng)
+    return int(tiles[0]), 'left' if sides[0] == LEFT else 'right'
+
+def play_reference(seed: int, policies: Tuple[Policy, Policy] = (first_legal, first_legal),
+                   rng: np.random.Generator = None) -> Tuple[int, Tuple[int, int], int, bool]:
+    """Joga uma partida com DominoGame e as mesmas políticas; retorna (vencedor, pontos, ações, bloqueado)"""
+    rng = rng if rng is not None else np.random.default_rng(0)
+    game = DominoGame(f"SIM{seed}", rng=random.Random(seed))
+    game.add_player("p0", "Jogador 0")
+    game.add_player("p1", "Jogador 1")
+    game.start_game()
+    order = list(game.players)
+
+    actions = 0
+    blocked = False
+    while not game.game_finished:
+        pid = game.get_current_player_id()
+        hand = game.players[pid]["hand"]
+        if len(game.board) == 0:
+            required = game.get_required_starting_double(pid)
+            legal = 1 << TILE_INDEX[(required, required)] if required is not None else hand
+        else:
+            legal = hand & game.playable_mask()
+        left = game.board.left_end if len(game.board) else -1
+        right = game.board.right_end if len(game.board) else -1
+
+        actions += 1
+        if legal:
+            tile, side = _numpy_policy_move(policies[order.index(pid)], legal, left, right, rng)
+            result = game.play_piece(pid, *TILES[tile], side)
+        elif game.dominoes_pool:
+            result = game.buy_piece(pid)
+        else:
+            result = game.pass_turn(pid)
+        if not result["success"]:
+            raise RuntimeError(f"Jogada rejeitada na semente {seed}: {result['message']}")
+        blocked = result.get("game_blocked", False)
+
+    points = tuple(game.calculate_hand_points(pid) for pid in order)
+    return order.index(game.winner), points, actions, blocked
+
+def check_against_reference(seeds: Iterable[int], policies: Tuple[Policy, Policy] = (first_legal, first_legal)):
+    """Confere que simulate e play_reference chegam aos mesmos resultados"""
+    seeds = list(seeds)
+    batch = simulate(seeds, policies)
+    for i, seed in enumerate(seeds):
+        expected = play_reference(seed, policies)
+        got = (int(batch.winner[i]), tuple(int(p) for p in batch.points[i]),
+               int(batch.moves[i]), bool(batch.blocked[i]))
+        if got != expected:
+            raise AssertionError(f"Semente {seed}: simulador {got} != DominoGame {expected}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulação de partidas em lote")
+    parser.add_argument('--games', type=int, default=100000)
+    parser.add_argument('--seed', type=int, default=0, help='primeira semente')
+    parser.add_argument('--policy', nargs=2, default=['first', 'first'], choices=sorted(POLICIES))
+    parser.add_argument('--check', type=int, default=0, help='confere N sementes contra DominoGame')
+    args = parser.parse_args()
+    if args.check and 'random' in args.policy:
+        # O sorteio do lote não segue o de play_reference peça a peça
+        parser.error('--check só funciona com as políticas determinísticas (first, heaviest)')
+
+    policies = tuple(POLICIES[name] for name in args.policy)
+    if args.check:
+        check_against_reference(range(args.seed, args.seed + args.check), policies)
+        print(f'{args.check} partidas iguais às de DominoGame')
+
+    seeds = range(args.seed, args.seed + args.games)
+    started = time.perf_counter()
+    result = simulate(seeds, policies)
+    elapsed = time.perf_counter() - started
+    print(f'{args.games} partidas em {elapsed:.2f}s ({args.games / elapsed:.0f}/s)')
+    print(f'vitórias: jogador 0 {np.mean(result.winner == 0):.1%}, jogador 1 {np.mean(result.winner == 1):.1%}')
+    print(f'bloqueadas: {np.mean(result.blocked):.1%}, ações por partida: {np.mean(result.moves):.1f}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,260 @@
+import random
+import threading
+from typing import Callable, Dict, Iterator, List, Optional, Tuple, TypeVar
+
+from game import DominoGame
+
+T = TypeVar("T")
+
+class ConcurrentUpdateError(Exception):
+    """A sala foi alterada por outro processo em todas as tentativas de atualização"""
+
+class LockStripes:
+    """Conjunto fixo de locks; cada sala usa sempre o mesmo (lock striping)
+
+    Salas em locks diferentes andam em paralelo; as jogadas de uma mesma sala
+    ficam em série. São RLocks, então quem já tem o lock da sala pode chamar
+    o armazenamento de novo.
+    """
+    def __init__(self, count: int = 256):
+        self._locks = [threading.RLock() for _ in range(count)]
+
+    def index(self, room_code: str) -> int:
+        return hash(room_code) % len(self._locks)
+
+    def __call__(self, room_code: str) -> threading.RLock:
+        return self._locks[self.index(room_code)]
+
+class GameStore:
+    """Armazenamento das salas ativas
+
+    Com um journal (journal.MoveJournal), os registros de cada mudança persistida
+    são gravados nele; os de tentativas descartadas por conflito, não. Os jogos
+    precisam vir de new_game(), que liga a montagem dos registros só nesse caso.
+    """
+    journal = None
+    locks: LockStripes
+
+    def lock(self, room_code: str) -> threading.RLock:
+        """Lock da sala neste processo: segure-o para alterar a sala e emitir o resultado em ordem"""
+        return self.locks(room_code)
+
+    def new_game(self, room_code: str, rng: Optional[random.Random] = None) -> DominoGame:
+        """Jogo novo para guardar aqui: só monta os registros do journal se houver um"""
+        return DominoGame(room_code, rng=rng, journaled=self.journal is not None)
+
+    def _write_journal(self, game: DominoGame):
+        if game.pending_records:
+            if self.journal is not None:
+                self.journal.append(game.pending_records)
+            game.pending_records = []
+
+    def get(self, room_code: str) -> Optional[DominoGame]:
+        """Retorna o jogo da sala, se existir"""
+        raise NotImplementedError
+
+    def add(self, game: DominoGame) -> bool:
+        """Guarda uma sala nova; retorna False se o código já estiver em uso"""
+        raise NotImplementedError
+
+    def add_many(self, games: List[DominoGame]) -> List[bool]:
+        """Guarda várias salas novas de uma vez; o resultado de cada uma como em add()"""
+        return [self.add(game) for game in games]
+
+    def reserve_codes(self, count: int) -> int:
+        """Reserva count números de sala consecutivos e retorna o primeiro (ver RoomCodeAllocator)"""
+        raise NotImplementedError
+
+    def update(self, room_code: str, mutate: Callable[[DominoGame], T]) -> Tuple[Optional[DominoGame], Optional[T]]:
+        """Aplica mutate ao jogo da sala e persiste o resultado
+
+        Retorna (jogo, retorno de mutate), ou (None, None) se a sala não existir.
+        mutate pode ser chamada mais de uma vez em caso de conflito, então
+        não deve ter efeitos fora do jogo.
+        """
+        raise NotImplementedError
+
+    def delete(self, room_code: str):
+        """Remove a sala"""
+        raise NotImplementedError
+
+    def room_codes(self) -> Iterator[str]:
+        """Percorre os códigos das salas ativas"""
+        raise NotImplementedError
+
+    def __contains__(self, room_code: str) -> bool:
+        raise NotImplementedError
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+class InMemoryGameStore(GameStore):
+    """Salas em memória, no próprio processo (um único worker)
+
+    As salas ficam divididas em partes, uma por lock de LockStripes; cada parte
+    só é acessada com o seu lock.
+    """
+    def __init__(self, journal=None, stripes: int = 256):
+        self.locks = LockStripes(stripes)
+        self._shards: List[Dict[str, DominoGame]] = [{} for _ in range(stripes)]
+        self.journal = journal
+        # Começa num ponto sorteado: depois de reiniciar, o processo não repete os códigos
+        # que os clientes ainda guardam da execução anterior
+        self._next_code = random.SystemRandom().getrandbits(32)
+        self._codes_lock = threading.Lock()
+
+    def _shard(self, room_code: str) -> Dict[str, DominoGame]:
+        return self._shards[self.locks.index(room_code)]
+
+    def get(self, room_code: str) -> Optional[DominoGame]:
+        with self.lock(room_code):
+            return self._shard(room_code).get(room_code)
+
+    def add(self, game: DominoGame) -> bool:
+        with self.lock(game.room_code):
+            shard = self._shard(game.room_code)
+            if game.room_code in shard:
+                return False
+            shard[game.room_code] = game
+            self._write_journal(game)
+            return True
+
+    def update(self, room_code: str, mutate: Callable[[DominoGame], T]) -> Tuple[Optional[DominoGame], Optional[T]]:
+        with self.lock(room_code):
+            game = self._shard(room_code).get(room_code)
+            if game is None:
+                return None, None
+            result = mutate(game)
+            self._write_journal(game)
+            return game, result
+
+    def delete(self, room_code: str):
+        with self.lock(room_code):
+            self._shard(room_code).pop(room_code, None)
+
+    def reserve_codes(self, count: int) -> int:
+        with self._codes_lock:
+            first = self._next_code
+            self._next_code += count
+            return first
+
+    def room_codes(self) -> Iterator[str]:
+        codes = []
+        for shard in self._shards:
+            codes.extend(list(shard))
+        return iter(codes)
+
+    def __contains__(self, room_code: str) -> bool:
+        return room_code in self._shard(room_code)
+
+    def __len__(self) -> int:
+        return sum(len(shard) for shard in self._shards)
+
+class RedisGameStore(GameStore):
+    """Salas compartilhadas em um servidor Redis, para vários workers
+
+    Cada sala fica em uma chave própria, no formato de DominoGame.to_bytes();
+    as atualizações usam WATCH/MULTI na chave da sala (lock otimista) e são
+    repetidas em caso de conflito.
+    """
+    def __init__(self, url: str, prefix: str = "domino:", max_retries: int = 5, client=None, journal=None):
+        if client is None:
+            try:
+                import redis
+            except ImportError as exc:
+                raise RuntimeError("RedisGameStore requer o pacote 'redis'") from exc
+            client = redis.Redis.from_url(url)
+        self._redis = client
+        self._prefix = prefix
+        self._rooms_key = f"{prefix}rooms"
+        self._codes_key = f"{prefix}room_seq"
+        self._max_retries = max_retries
+        self.journal = journal
+        self.locks = LockStripes()
+
+    def _key(self, room_code: str) -> str:
+        return f"{self._prefix}room:{room_code}"
+
+    @staticmethod
+    def _dumps(game: DominoGame) -> bytes:
+        return game.to_bytes()
+
+    def _loads(self, raw: bytes) -> DominoGame:
+        game = DominoGame.from_bytes(raw)
+        game.journaled = self.journal is not None
+        return game
+
+    def get(self, room_code: str) -> Optional[DominoGame]:
+        raw = self._redis.get(self._key(room_code))
+        return self._loads(raw) if raw is not None else None
+
+    def add(self, game: DominoGame) -> bool:
+        if not self._redis.set(self._key(game.room_code), self._dumps(game), nx=True):
+            return False
+        self._redis.sadd(self._rooms_key, game.room_code)
+        self._write_journal(game)
+        return True
+
+    def add_many(self, games: List[DominoGame]) -> List[bool]:
+        # Duas idas ao Redis para o lote inteiro, em vez de duas por sala
+        with self._redis.pipeline(transaction=False) as pipe:
+            for game in games:
+                pipe.set(self._key(game.room_code), self._dumps(game), nx=True)
+            added = [bool(ok) for ok in pipe.execute()]
+        codes = [game.room_code for game, ok in zip(games, added) if ok]
+        if codes:
+            self._redis.sadd(self._rooms_key, *codes)
+        for game, ok in zip(games, added):
+            if ok:
+                self._write_journal(game)
+        return added
+
+    def reserve_codes(self, count: int) -> int:
+        # Contador compartilhado: cada worker recebe um bloco só seu
+        return self._redis.incrby(self._codes_key, count) - count
+
+    def update(self, room_code: str, mutate: Callable[[DominoGame], T]) -> Tuple[Optional[DominoGame], Optional[T]]:
+        from redis.exceptions import WatchError
+
+        key = self._key(room_code)
+        for _ in range(self._max_retries):
+            with self._redis.pipeline() as pipe:
+                try:
+                    pipe.watch(key)
+                    raw = pipe.get(key)
+                    if raw is None:
+                        return None, None
+                    game = self._loads(raw)
+                    version = game.version
+                    result = mutate(game)
+                    if game.version != version:
+                        pipe.multi()
+                        pipe.set(key, self._dumps(game))
+                        pipe.execute()
+                        self._write_journal(game)
+                    return game, result
+                except WatchError:
+                    continue
+        raise ConcurrentUpdateError(room_code)
+
+    def delete(self, room_code: str):
+        with self._redis.pipeline() as pipe:
+            pipe.delete(self._key(room_code))
+            pipe.srem(self._rooms_key, room_code)
+            pipe.execute()
+
+    def room_codes(self) -> Iterator[str]:
+        for code in self._redis.smembers(self._rooms_key):
+            yield code.decode() if isinstance(code, bytes) else code
+
+    def __contains__(self, room_code: str) -> bool:
+        return bool(self._redis.exists(self._key(room_code)))
+
+    def __len__(self) -> int:
+        return self._redis.scard(self._rooms_key)
+
+def create_store(url: Optional[str], journal=None) -> GameStore:
+    """Cria o armazenamento a partir da URL configurada (vazia = memória)"""
+    if url and url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisGameStore(url, journal=journal)
+    return InMemoryGameStore(journal=journal)
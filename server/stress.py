@@ -0,0 +1,176 @@
+"""Teste de estresse do armazenamento: muitas threads jogando em muitas salas ao mesmo tempo.
+
+Uso: python stress.py --rooms 200 --threads 32 --ops 50000
+
+Cada thread escolhe salas ao acaso e tenta jogar, comprar ou passar em nome de
+qualquer um dos jogadores (inclusive fora da vez), no mesmo padrão dos handlers:
+lock da sala, store.update e o lote de envio do outbox. No fim confere os invariantes de
+cada sala e reconstrói todas pelo journal. Retorna 1 se algum invariante falhar.
+--unlocked troca os locks por locks vazios, para ver os invariantes quebrando.
+
+tests/test_stress.py roda o mesmo estresse (run()) com poucas jogadas; este
+script fica para as execuções longas.
+"""
+import argparse
+import contextlib
+import random
+import sys
+import tempfile
+import threading
+import time
+from typing import Dict, List, Tuple
+
+from game import ALL_TILES_MASK, DominoGame
+from journal import MoveJournal, read_records
+from outbox import DeltaBatch
+from store import create_store
+
+class _NoLocks:
+    """Substituto de LockStripes sem exclusão nenhuma (só para --unlocked)"""
+    def index(self, room_code: str) -> int:
+        return hash(room_code) % 256
+
+    def __call__(self, room_code: str):
+        return contextlib.nullcontext()
+
+def _act(game: DominoGame, player_id: str, rng: random.Random) -> Dict:
+    moves = game.legal_moves(player_id)
+    if moves and rng.random() < 0.9:
+        piece, side = rng.choice(moves)
+        return game.play_piece(player_id, piece.left, piece.right, side)
+    if game.dominoes_pool and rng.random() < 0.8:
+        return game.buy_piece(player_id)
+    return game.pass_turn(player_id)
+
+def worker(store, room_codes: List[str], ops: int, seed: int, successes: Dict[str, int], errors: List[str]):
+    rng = random.Random(seed)
+    for _ in range(ops):
+        room_code = rng.choice(room_codes)
+        player_id = rng.choice(("a", "b"))
+        with store.lock(room_code):
+            game, result = store.update(room_code, lambda game: _act(game, player_id, rng))
+            if result is None or not result["success"]:
+                continue
+            successes[room_code] = successes.get(room_code, 0) + 1
+            # O que os handlers emitem tem que ser o evento desta jogada
+            batch = DeltaBatch(room_code)
+            batch.add(game, list(game.players))
+            for pid in game.players:
+                delta = batch.view(pid)
+                if delta["events"][0]["seq"] != delta["version"] or delta["events"][0]["player"] != player_id:
+                    errors.append(f"{room_code}: delta de outra jogada (versão {delta['version']})")
+
+def check_game(game: DominoGame, expected_version: int) -> List[str]:
+    """Invariantes de uma sala depois do estresse"""
+    problems = []
+    code = game.room_code
+    if game.version != expected_version:
+        problems.append(f"{code}: versão {game.version}, esperada {expected_version} (atualização perdida)")
+
+    seen = 0
+    pieces = [p.piece.index for p in game.board] + [p.index for p in game.dominoes_pool]
+    masks = [1 << idx for idx in pieces] + [pdata["hand"] for pdata in game.players.values()]
+    for mask in masks:
+        if seen & mask:
+            problems.append(f"{code}: peça duplicada")
+        seen |= mask
+    if seen != ALL_TILES_MASK:
+        problems.append(f"{code}: faltam peças")
+
+    placements = list(game.board)
+    for left, right in zip(placements, placements[1:]):
+        if left.right != right.left:
+            problems.append(f"{code}: mesa quebrada entre {left} e {right}")
+    if placements and (placements[0].left != game.board.left_end or placements[-1].right != game.board.right_end):
+        problems.append(f"{code}: pontas em cache diferentes da mesa")
+
+    if game.game_finished:
+        winner_hand = game.players[game.winner]["hand"]
+        if winner_hand and not game.check_game_blocked()["blocked"]:
+            problems.append(f"{code}: vencedor com peças na mão sem jogo bloqueado")
+    return problems
+
+def _comparable(game: DominoGame) -> Dict:
+    snapshot = game.to_snapshot()
+    # O journal não guarda horários: o início e a última mudança ficam de fora
+    del snapshot["updated_at"], snapshot["started_at"], snapshot["last_event"]
+    return snapshot
+
+def run(store, journal: MoveJournal, rooms: int, threads: int, ops: int, seed: int = 0) -> Tuple[List[str], int, float]:
+    """Estressa store com rooms salas e threads threads; retorna (problemas, jogadas aplicadas, segundos)
+
+    Fecha o journal (que precisa ser o do store) antes de conferir a reconstrução.
+    """
+    rng = random.Random(seed)
+    room_codes = [f"S{i:05d}" for i in range(rooms)]
+    for room_code in room_codes:
+        # Sobras de uma execução anterior no Redis
+        store.delete(room_code)
+        game = store.new_game(room_code, rng=random.Random(rng.getrandbits(64)))
+        game.add_player("a", "A")
+        game.add_player("b", "B")
+        game.start_game()
+        store.add(game)
+
+    successes: List[Dict[str, int]] = [{} for _ in range(threads)]
+    errors: List[str] = []
+    workers = [
+        threading.Thread(target=worker, args=(
+            store, room_codes, ops // threads, seed * 1000 + i, successes[i], errors
+        ))
+        for i in range(threads)
+    ]
+    started = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    journal.close()
+
+    problems = list(errors)
+    moves = 0
+    for room_code in room_codes:
+        applied = sum(counts.get(room_code, 0) for counts in successes)
+        moves += applied
+        game = store.get(room_code)
+        # Criação da sala: duas entradas e o início do jogo
+        problems.extend(check_game(game, 3 + applied))
+        try:
+            replayed = DominoGame.replay(read_records(journal.directory, room_code), player_ids=["a", "b"])
+        except ValueError as exc:
+            problems.append(f"{room_code}: journal inválido ({exc})")
+            continue
+        if _comparable(replayed) != _comparable(game):
+            problems.append(f"{room_code}: journal não reproduz o estado final")
+    return problems, moves, elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rooms', type=int, default=200)
+    parser.add_argument('--threads', type=int, default=32)
+    parser.add_argument('--ops', type=int, default=50000, help='tentativas de jogada no total')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--store-url', default='', help='vazio = memória; redis://... = RedisGameStore')
+    parser.add_argument('--unlocked', action='store_true', help='desliga os locks das salas')
+    args = parser.parse_args()
+
+    # Trocas de thread bem mais frequentes que o normal, para provocar as corridas
+    sys.setswitchinterval(1e-6)
+
+    journal_dir = tempfile.mkdtemp(prefix='domino-stress-')
+    journal = MoveJournal(journal_dir)
+    store = create_store(args.store_url, journal=journal)
+    if args.unlocked:
+        store.locks = _NoLocks()
+
+    problems, moves, elapsed = run(store, journal, args.rooms, args.threads, args.ops, args.seed)
+    print(f'jogadas aplicadas: {moves} em {elapsed:.2f}s ({moves / elapsed:.0f}/s), {args.threads} threads')
+    print(f'salas:             {args.rooms}, journal em {journal_dir}')
+    for problem in problems[:20]:
+        print(f'  {problem}')
+    print(f'problemas:         {len(problems)}')
+    sys.exit(1 if problems else 0)
+
+if __name__ == '__main__':
+    main()
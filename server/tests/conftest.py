@@ -0,0 +1,13 @@
+import os
+import sys
+
+# Os módulos do servidor são importados como no app (from game import ...)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# O app é importado sem monkey patch, sem processos do bot e sem janela no outbox
+os.environ.setdefault('SOCKETIO_ASYNC_MODE', 'threading')
+os.environ.setdefault('BOT_WORKERS', '0')
+os.environ.setdefault('BROADCAST_COALESCE_MS', '0')
+os.environ.setdefault('MOVE_JOURNAL_DIR', '')
+os.environ.setdefault('HISTORY_DB', '')
+os.environ.setdefault('FLASK_ENV', 'development')
@@ -0,0 +1,103 @@
+import random
+import time
+
+import gevent
+import pytest
+
+import bot
+from bot import BotPool, BotView, _EndgameSolver, choose_move, view
+from game import TILE_INDEX, TILES, DominoGame
+
+def mask(*tiles) -> int:
+    return sum(1 << TILE_INDEX[tile] for tile in tiles)
+
+# Mesa com pontas 0 e 0 e o pool vazio. O bot tem [0|1] e [0|2]; o oponente, só [1|3].
+# Jogar [0|1] deixa o 1 aberto e o oponente bate; jogar [0|2] o faz passar, e o bot bate com [0|1].
+BOT_HAND = mask((0, 1), (0, 2))
+OPPONENT_HAND = mask((1, 3))
+
+class NoCache(dict):
+    """Tabela de transposição que nunca guarda nada (busca sem cache)"""
+    def __setitem__(self, key, value):
+        pass
+
+@pytest.fixture(autouse=True)
+def empty_transpositions(monkeypatch):
+    monkeypatch.setattr(bot, "_TRANSPOSITIONS", {})
+
+def solve(hand, other, left, right, seat=0, passes=0) -> int:
+    return _EndgameSolver(time.monotonic() + 10).solve(hand, other, left, right, seat, passes)
+
+def contested_position(seed: int = 0):
+    """Jogo no meio, na vez de um jogador com mais de uma jogada (a busca usa o orçamento inteiro)"""
+    rng = random.Random(seed)
+    game = DominoGame("BOT001", rng=rng)
+    game.add_player("a", "Ana")
+    game.add_player("b", "Bruno")
+    game.start_game()
+    while True:
+        player_id = game.get_current_player_id()
+        moves = game.legal_moves(player_id)
+        if len(moves) > 1 and game.board:
+            return game, player_id
+        if moves:
+            piece, side = rng.choice(moves)
+            game.play_piece(player_id, piece.left, piece.right, side)
+        elif game.dominoes_pool:
+            game.buy_piece(player_id)
+        else:
+            game.pass_turn(player_id)
+
+def test_bot_turn_does_not_block_other_greenlets():
+    game, player_id = contested_position()
+    pool = BotPool(workers=1, budget=0.2, sleep=gevent.sleep)
+    ticks = []
+
+    def ticker():
+        while True:
+            ticks.append(1)
+            gevent.sleep(0.01)
+
+    try:
+        pool.choose(view(game, player_id))  # sobe o processo antes de medir
+        other = gevent.spawn(ticker)
+        gevent.sleep(0)
+        before = len(ticks)
+        move = pool.choose(view(game, player_id))
+        other.kill()
+    finally:
+        pool.shutdown()
+    assert move in [(piece.index, side) for piece, side in game.legal_moves(player_id)]
+    # Durante os 0,2 s da busca o outro greenlet continuou rodando
+    assert len(ticks) - before >= 5
+
+def test_solver_finds_the_forced_win():
+    assert solve(BOT_HAND, OPPONENT_HAND, 0, 0) == 1
+    # Depois de [0|1] na direita, o oponente (a jogar) vence
+    assert solve(OPPONENT_HAND, mask((0, 2)), 0, 1, seat=1) == 1
+    # Depois de [0|2], o oponente passa e perde
+    assert solve(OPPONENT_HAND, mask((0, 1)), 0, 2, seat=1) == -1
+
+def test_solver_blocked_game_goes_to_fewer_points():
+    # Ninguém encaixa nas pontas 4 e 4 e o oponente acabou de passar: vence quem tem menos pontos
+    assert solve(mask((0, 1)), mask((5, 6)), 4, 4, passes=1) == 1
+    assert solve(mask((5, 6)), mask((0, 1)), 4, 4, passes=1) == -1
+
+def test_choose_move_picks_the_only_winning_move():
+    moves = tuple((TILE_INDEX[tile], side) for tile in ((0, 1), (0, 2)) for side in ("left", "right"))
+    position = BotView(seat=0, hand=BOT_HAND, unseen=OPPONENT_HAND, opponent_count=1, pool_count=0,
+                       left_end=0, right_end=0, passes=0, moves=moves)
+    tile, _ = choose_move(position, time.monotonic() + 10, seed=0)
+    assert tile == TILE_INDEX[(0, 2)]
+
+@pytest.mark.parametrize("seed", range(40))
+def test_transposition_table_matches_search_without_cache(seed, monkeypatch):
+    rng = random.Random(seed)
+    tiles = rng.sample(TILES, 10)
+    hand, other = mask(*tiles[:5]), mask(*tiles[5:])
+    left, right = rng.randrange(7), rng.randrange(7)
+
+    cached = solve(hand, other, left, right)
+    again = solve(hand, other, left, right)
+    monkeypatch.setattr(bot, "_TRANSPOSITIONS", NoCache())
+    assert cached == again == solve(hand, other, left, right)
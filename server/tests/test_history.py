@@ -0,0 +1,111 @@
+import sqlite3
+import threading
+from typing import Optional
+
+import pytest
+
+from bot import bot_id, is_bot
+from game import TILE_INDEX, DominoGame
+from history import HistoryStore
+
+def finished_game(room_code: str, winner: str, loser: str, at: float, loser_tiles=((6, 6),),
+                  loser_id: Optional[str] = None) -> DominoGame:
+    """Partida encerrada em at, com o perdedor segurando loser_tiles"""
+    game = DominoGame(room_code)
+    game.add_player(winner, winner)
+    game.add_player(loser_id or loser, loser)
+    game.players[loser_id or loser]["hand"] = sum(1 << TILE_INDEX[tile] for tile in loser_tiles)
+    game.game_started = game.game_finished = True
+    game.winner = winner
+    game.started_at, game.updated_at, game.move_count = at - 60, at, 12
+    return game
+
+@pytest.fixture
+def history(tmp_path):
+    # Intervalo longo: as gravações só acontecem nas chamadas explícitas a flush()
+    store = HistoryStore(str(tmp_path / "history.db"), flush_interval=60, is_bot=is_bot)
+    yield store
+    store.close()
+
+def test_records_wait_for_the_batch_flush(history):
+    for n in range(3):
+        history.record(finished_game(f"H{n:05d}", "Ana", "Bruno", at=1000.0 + n))
+    assert history.pending() == 3
+    assert history.leaderboard() == []
+
+    assert history.flush() == 3
+    assert history.pending() == 0
+    assert history.written == 3
+    assert history.flush() == 0
+    assert history.leaderboard()[0] == {"name": "Ana", "games": 3, "wins": 3, "points": 0}
+
+def test_background_thread_flushes(tmp_path):
+    store = HistoryStore(str(tmp_path / "history.db"), flush_interval=0.01)
+    try:
+        store.record(finished_game("H00001", "Ana", "Bruno", at=1000.0))
+        for _ in range(200):
+            if store.written:
+                break
+            threading.Event().wait(0.01)
+        assert store.written == 1
+    finally:
+        store.close()
+
+def test_database_uses_wal(history):
+    with sqlite3.connect(history.path) as db:
+        assert db.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+def test_leaderboard_aggregates_wins_games_and_points(history):
+    history.record(finished_game("H00001", "Ana", "Bruno", at=1000.0, loser_tiles=((6, 6), (0, 1))))
+    history.record(finished_game("H00002", "Bruno", "Ana", at=1001.0, loser_tiles=((2, 3),)))
+    history.record(finished_game("H00003", "Ana", "Carla", at=1002.0, loser_tiles=((1, 1),)))
+    history.flush()
+
+    assert history.leaderboard() == [
+        {"name": "Ana", "games": 3, "wins": 2, "points": 5},
+        {"name": "Bruno", "games": 2, "wins": 1, "points": 13},
+        {"name": "Carla", "games": 1, "wins": 0, "points": 2},
+    ]
+    assert [row["name"] for row in history.leaderboard(limit=1)] == ["Ana"]
+
+def test_leaderboard_leaves_out_bots_unless_asked(history):
+    history.record(finished_game("BOT001", "Ana", "Computador", at=1000.0, loser_id=bot_id("BOT001")))
+    history.flush()
+
+    assert [row["name"] for row in history.leaderboard()] == ["Ana"]
+    assert history.leaderboard(include_bots=True)[1] == {"name": "Computador", "games": 1, "wins": 0, "points": 12}
+
+def test_since_and_until_filter_by_finish_time(history):
+    for n, at in enumerate((1000.0, 2000.0, 3000.0)):
+        history.record(finished_game(f"H{n:05d}", "Ana", "Bruno", at=at))
+    history.flush()
+
+    assert history.leaderboard(since=2000.0)[0]["games"] == 2
+    assert history.leaderboard(until=2000.0)[0]["games"] == 1
+    assert history.leaderboard(since=1500.0, until=2500.0)[0]["games"] == 1
+    games = history.player_games("Bruno", since=1500.0)
+    assert [game["finished_at"] for game in games] == [3000.0, 2000.0]
+
+def test_player_games_lists_the_table(history):
+    history.record(finished_game("H00001", "Ana", "Bruno", at=1000.0))
+    history.record(finished_game("H00002", "Bruno", "Carla", at=1001.0))
+    history.flush()
+
+    (game,) = history.player_games("Ana")
+    assert game == {
+        "room_code": "H00001", "started_at": 940.0, "finished_at": 1000.0, "duration": 60.0,
+        "moves": 12, "blocked": False, "winner": "Ana",
+        "players": [
+            {"name": "Ana", "points": 0, "won": True, "bot": False},
+            {"name": "Bruno", "points": 12, "won": False, "bot": False},
+        ],
+    }
+    assert [game["room_code"] for game in history.player_games("Bruno")] == ["H00002", "H00001"]
+
+def test_queries_run_off_the_calling_thread(tmp_path):
+    store = HistoryStore(str(tmp_path / "history.db"), flush_interval=60, wait=lambda seconds: None)
+    try:
+        assert store._off_loop(threading.get_ident) != threading.get_ident()
+        store.leaderboard()
+    finally:
+        store.close()
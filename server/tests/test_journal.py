@@ -0,0 +1,58 @@
+import random
+
+import pytest
+
+from game import DominoGame
+from journal import MoveJournal, recover
+from store import InMemoryGameStore
+
+def play_random(store: InMemoryGameStore, room_code: str, seed: int) -> DominoGame:
+    """Joga uma partida inteira com jogadas aleatórias pelo armazenamento (que grava o journal)"""
+    rng = random.Random(seed)
+    game = store.new_game(room_code, rng=random.Random(seed))
+    game.add_player("a", "Ana")
+    store.add(game)
+    store.update(room_code, lambda game: (game.add_player("b", "Bruno"), game.start_game()))
+
+    def move(game):
+        player_id = game.get_current_player_id()
+        moves = game.legal_moves(player_id)
+        if moves:
+            piece, side = rng.choice(moves)
+            return game.play_piece(player_id, piece.left, piece.right, side)
+        if game.dominoes_pool:
+            return game.buy_piece(player_id)
+        return game.pass_turn(player_id)
+
+    while not store.get(room_code).game_finished:
+        store.update(room_code, move)
+    return store.get(room_code)
+
+def test_recover_rebuilds_every_room(tmp_path):
+    journal = MoveJournal(str(tmp_path), segment_size=4096)
+    store = InMemoryGameStore(journal=journal)
+    finals = {f"J{seed:05d}": play_random(store, f"J{seed:05d}", seed) for seed in range(20)}
+    journal.close()
+
+    recovered = recover(str(tmp_path))
+    assert set(recovered) == set(finals)
+    for room_code, game in finals.items():
+        assert list(recovered[room_code].board) == list(game.board)
+        assert recovered[room_code].version == game.version
+        assert recovered[room_code].winner == {"a": "p0", "b": "p1"}[game.winner]
+
+def test_directory_has_a_single_writer(tmp_path):
+    journal = MoveJournal(str(tmp_path))
+    try:
+        with pytest.raises(RuntimeError):
+            MoveJournal(str(tmp_path))
+    finally:
+        journal.close()
+    # Liberado no close: o próximo processo pode continuar o journal
+    MoveJournal(str(tmp_path)).close()
+
+def test_games_without_a_journal_build_no_records():
+    store = InMemoryGameStore()
+    game = play_random(store, "NOJRNL", seed=1)
+    assert not game.journaled
+    assert game.pending_records == []
@@ -0,0 +1,51 @@
+import time
+
+import fakeredis
+
+from game import DominoGame
+from lifecycle import RoomReaper
+from store import RedisGameStore
+
+class MoveAfterScan(RedisGameStore):
+    """Uma jogada chega às salas em moved logo depois da primeira leitura delas (a da varredura)
+
+    Como no Redis, cada leitura devolve uma cópia: quem leu antes da jogada fica com o estado velho.
+    """
+    def __init__(self, moved):
+        super().__init__("redis://fake", client=fakeredis.FakeRedis())
+        self.moved = set(moved)
+
+    def get(self, room_code: str):
+        game = super().get(room_code)
+        if room_code in self.moved:
+            self.moved.discard(room_code)
+            self.update(room_code, lambda game: game._bump_version())
+        return game
+
+def add_room(store, room_code: str, age: float):
+    game = DominoGame(room_code)
+    game.add_player("a", "Ana")
+    game.updated_at = time.time() - age
+    store.add(game)
+
+def test_sweep_keeps_room_touched_after_the_scan():
+    store = MoveAfterScan(moved={"MOVED1"})
+    add_room(store, "MOVED1", age=100)
+    add_room(store, "STALE1", age=100)
+    evicted = []
+    reaper = RoomReaper(store, waiting_ttl=10, on_evict=lambda room_code, reason: evicted.append(room_code))
+
+    assert reaper.sweep() == [("STALE1", "waiting")]
+    assert evicted == ["STALE1"]
+    assert store.get("MOVED1") is not None
+
+def test_make_room_for_skips_room_touched_after_the_scan():
+    store = MoveAfterScan(moved={"OLDEST"})
+    add_room(store, "OLDEST", age=30)
+    add_room(store, "OLDER1", age=20)
+    add_room(store, "RECENT", age=10)
+    reaper = RoomReaper(store, max_rooms=3)
+
+    reaper.make_room_for(1)
+    assert sorted(store.room_codes()) == ["OLDEST", "RECENT"]
+    assert reaper.evicted["capacity"] == 1
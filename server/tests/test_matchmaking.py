@@ -0,0 +1,30 @@
+from matchmaking import MatchQueue, Ticket
+
+def queue_with(*tickets: Ticket) -> MatchQueue:
+    queue = MatchQueue(rating_bucket=100, max_wait=10)
+    queue.requeue(list(tickets))
+    return queue
+
+def test_different_buckets_wait():
+    queue = queue_with(Ticket("a", "Ana", 1500, 95.0), Ticket("b", "Bruno", 1800, 95.0))
+    assert queue.pair(now=100.0) == []
+    assert len(queue) == 2
+
+def test_expired_ticket_pairs_with_any_bucket():
+    expired = Ticket("a", "Ana", 1500, 0.0)
+    waiting = Ticket("b", "Bruno", 1800, 95.0)
+    queue = queue_with(expired, waiting)
+    assert queue.pair(now=100.0) == [(expired, waiting)]
+    assert len(queue) == 0
+
+def test_expired_ticket_takes_the_longest_waiting_leftover():
+    expired = Ticket("a", "Ana", None, 99.0)
+    newer = Ticket("b", "Bruno", 1800, 97.0)
+    older = Ticket("c", "Carla", 1200, 92.0)
+    pair_left, pair_right = Ticket("d", "Davi", 1310, 96.0), Ticket("e", "Eva", 1350, 96.0)
+    queue = queue_with(expired, newer, older, pair_left, pair_right)
+
+    pairs = queue.pair(now=100.0)
+    assert (expired, older) in pairs
+    assert len(pairs) == 2
+    assert "b" in queue and len(queue) == 1
@@ -0,0 +1,54 @@
+import random
+import threading
+
+from game import DominoGame
+from outbox import RoomOutbox
+
+def started_game() -> DominoGame:
+    game = DominoGame("OUT001", rng=random.Random(0))
+    game.add_player("a", "Ana")
+    game.add_player("b", "Bruno")
+    game.start_game()
+    return game
+
+def play_first_move(game: DominoGame):
+    """Joga a primeira jogada possível (ou compra, se não houver)"""
+    player_id = game.get_current_player_id()
+    moves = game.legal_moves(player_id)
+    if not moves:
+        game.buy_piece(player_id)
+        return
+    piece, side = moves[0]
+    game.play_piece(player_id, piece.left, piece.right, side)
+
+def new_outbox(sent, spawned, window: float) -> RoomOutbox:
+    return RoomOutbox(sent.append, window=window, spawn=lambda func, *args: spawned.append((func, args)),
+                      sleep=lambda seconds: None, lock=lambda room_code: threading.RLock())
+
+def test_window_zero_sends_each_move_right_away():
+    sent, spawned = [], []
+    outbox = new_outbox(sent, spawned, window=0)
+    game = started_game()
+    play_first_move(game)
+    outbox.push(game)
+    assert [len(batch.events) for batch in sent] == [1]
+    assert spawned == []
+    assert len(outbox) == 0
+
+def test_window_coalesces_moves_until_the_flush():
+    sent, spawned = [], []
+    outbox = new_outbox(sent, spawned, window=0.015)
+    game = started_game()
+    play_first_move(game)
+    outbox.push(game)
+    play_first_move(game)
+    finish = {"code": "won", "winner": "Ana"}
+    outbox.push(game, finish)
+    assert sent == [] and len(spawned) == 1
+
+    func, args = spawned[0]
+    func(*args)
+    (batch,) = sent
+    assert [event["seq"] for event in batch.events] == [game.version - 1, game.version]
+    assert batch.finish == finish
+    assert len(outbox) == 0
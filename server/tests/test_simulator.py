@@ -0,0 +1,11 @@
+import pytest
+
+from simulator import POLICIES, check_against_reference
+
+# random sorteia pelo gerador do lote e não segue play_reference peça a peça
+DETERMINISTIC = sorted(name for name in POLICIES if name != "random")
+
+@pytest.mark.parametrize("first", DETERMINISTIC)
+@pytest.mark.parametrize("second", DETERMINISTIC)
+def test_batch_engine_matches_domino_game(first, second):
+    check_against_reference(range(40), (POLICIES[first], POLICIES[second]))
@@ -0,0 +1,79 @@
+import random
+
+import pytest
+
+from app import app, socketio, store
+
+def session_id(client) -> str:
+    return socketio.server.manager.sid_from_eio_sid(client.eio_sid, "/")
+
+def received(client, name: str):
+    return [message["args"][0] for message in client.get_received() if message["name"] == name]
+
+@pytest.fixture
+def room():
+    """Sala com o jogo começado entre dois clientes: (código, {sid: cliente})"""
+    first, second = socketio.test_client(app), socketio.test_client(app)
+    first.emit("create_room", {"name": "Ana"})
+    room_code = received(first, "room_created")[0]["room_code"]
+    second.emit("join_room", {"room_code": room_code, "name": "Bruno"})
+    first.get_received()
+    second.get_received()
+    clients = {session_id(first): first, session_id(second): second}
+    yield room_code, clients
+    for client in clients.values():
+        if client.is_connected():
+            client.disconnect()
+
+def play(room_code: str, clients, until, seed: int = 0):
+    """Joga pelos clientes (jogadas aleatórias) até until(game) ser verdadeiro"""
+    rng = random.Random(seed)
+    game = store.get(room_code)
+    while not until(game):
+        player_id = game.get_current_player_id()
+        client = clients[player_id]
+        moves = game.legal_moves(player_id)
+        if moves:
+            piece, side = rng.choice(moves)
+            client.emit("play_piece", {"room_code": room_code, "left": piece.left, "right": piece.right, "side": side})
+        elif game.dominoes_pool:
+            client.emit("buy_piece", {"room_code": room_code})
+        else:
+            client.emit("pass_turn", {"room_code": room_code})
+        game = store.get(room_code)
+    return game
+
+def watch(room_code: str):
+    watcher = socketio.test_client(app)
+    watcher.emit("watch_room", {"room_code": room_code})
+    states = received(watcher, "game_state")
+    watcher.disconnect()
+    assert len(states) == 1
+    return states[0]
+
+def test_watch_after_first_seat_leaves_on_second_seat_turn(room):
+    room_code, clients = room
+    first, second = list(clients)
+    play(room_code, clients, lambda game: game.get_current_player_id() == second)
+    clients[first].disconnect()
+
+    state = watch(room_code)
+    assert list(state["players"]) == [second]
+    assert state["current_player"] is None
+
+    clients[second].emit("get_game_state", {"room_code": room_code})
+    assert received(clients[second], "game_state")[0]["my_hand"]
+
+def test_watch_after_winner_leaves(room):
+    room_code, clients = room
+    game = play(room_code, clients, lambda game: game.game_finished)
+    loser = next(player_id for player_id in clients if player_id != game.winner)
+    clients[game.winner].disconnect()
+
+    state = watch(room_code)
+    assert state["game_finished"]
+    assert list(state["players"]) == [loser]
+    assert state["winner"] is None
+
+    clients[loser].emit("get_game_state", {"room_code": room_code})
+    assert received(clients[loser], "game_state")[0]["game_finished"]
@@ -0,0 +1,70 @@
+import fakeredis
+import pytest
+
+from game import DominoGame
+from store import ConcurrentUpdateError, InMemoryGameStore, RedisGameStore
+
+@pytest.fixture
+def server():
+    return fakeredis.FakeServer()
+
+def redis_store(server, **kwargs) -> RedisGameStore:
+    """Cada chamada é um worker: cliente próprio, mesmo servidor"""
+    return RedisGameStore("redis://fake", client=fakeredis.FakeRedis(server=server), **kwargs)
+
+def new_room(room_code: str) -> DominoGame:
+    game = DominoGame(room_code)
+    game.add_player("a", "Ana")
+    return game
+
+def test_update_retries_after_a_concurrent_write(server):
+    store, other = redis_store(server), redis_store(server)
+    store.add(new_room("RED001"))
+    calls = []
+
+    def join(game):
+        calls.append(game.version)
+        if len(calls) == 1:
+            # Outro worker grava a sala entre o WATCH e o EXEC
+            other.update("RED001", lambda game: game.add_player("c", "Carla"))
+        return game.add_player("b", "Bruno")
+
+    game, joined = store.update("RED001", join)
+    assert calls == [1, 2]
+    assert joined is False  # a sala já estava cheia quando a segunda tentativa leu
+    assert list(store.get("RED001").players) == ["a", "c"]
+    assert game.version == 2
+
+def test_update_gives_up_after_max_retries(server):
+    store, other = redis_store(server, max_retries=3), redis_store(server)
+    store.add(new_room("RED002"))
+    calls = []
+
+    def rename(game):
+        calls.append(game.version)
+        other.update("RED002", lambda game: game.add_player("a", f"Ana {len(calls)}"))
+        game.add_player("a", "Ana")
+
+    with pytest.raises(ConcurrentUpdateError):
+        store.update("RED002", rename)
+    assert len(calls) == 3
+    assert store.get("RED002").players["a"]["name"] == "Ana 3"
+
+def test_add_many_skips_codes_in_use(server):
+    store = redis_store(server)
+    assert store.add(new_room("RED003"))
+    added = store.add_many([new_room("RED003"), new_room("RED004"), new_room("RED005")])
+    assert added == [False, True, True]
+    assert sorted(store.room_codes()) == ["RED003", "RED004", "RED005"]
+    assert len(store) == 3
+    assert store.get("RED004").players["a"]["name"] == "Ana"
+
+def test_reserve_codes_gives_each_worker_its_own_block(server):
+    first, second = redis_store(server), redis_store(server)
+    blocks = [first.reserve_codes(10), second.reserve_codes(5), first.reserve_codes(10)]
+    assert blocks == [0, 10, 15]
+
+def test_in_memory_codes_start_at_a_random_point():
+    # Um processo reiniciado não recomeça a sequência de códigos do zero
+    first, second = InMemoryGameStore(), InMemoryGameStore()
+    assert first.reserve_codes(1) != second.reserve_codes(1)
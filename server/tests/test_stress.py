@@ -0,0 +1,29 @@
+import sys
+
+import fakeredis
+import pytest
+
+from journal import MoveJournal
+from store import InMemoryGameStore, RedisGameStore
+from stress import run
+
+@pytest.fixture(autouse=True)
+def frequent_switches():
+    # Trocas de thread bem mais frequentes que o normal, para provocar as corridas
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    yield
+    sys.setswitchinterval(interval)
+
+def test_in_memory_store_keeps_invariants(tmp_path):
+    journal = MoveJournal(str(tmp_path))
+    problems, moves, _ = run(InMemoryGameStore(journal=journal), journal, rooms=20, threads=8, ops=2000)
+    assert problems == []
+    assert moves > 0
+
+def test_redis_store_keeps_invariants(tmp_path):
+    journal = MoveJournal(str(tmp_path))
+    store = RedisGameStore("redis://fake", client=fakeredis.FakeRedis(), journal=journal)
+    problems, moves, _ = run(store, journal, rooms=10, threads=4, ops=500)
+    assert problems == []
+    assert moves > 0
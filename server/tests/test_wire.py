@@ -0,0 +1,78 @@
+import random
+
+import pytest
+
+from game import DominoGame
+from outbox import DeltaBatch
+from wire import compact_message, decode_delta, decode_state, encode_batch, encode_state
+
+def move(game: DominoGame, rng: random.Random):
+    player_id = game.get_current_player_id()
+    moves = game.legal_moves(player_id)
+    if moves:
+        piece, side = rng.choice(moves)
+        return game.play_piece(player_id, piece.left, piece.right, side)
+    if game.dominoes_pool:
+        return game.buy_piece(player_id)
+    return game.pass_turn(player_id)
+
+def new_game(seed: int) -> DominoGame:
+    game = DominoGame("WIRE01", rng=random.Random(seed))
+    game.add_player("sid-a", "Ana")
+    game.add_player("sid-b", "Bruno Çação")
+    game.start_game()
+    return game
+
+@pytest.mark.parametrize("seed", range(50))
+def test_state_round_trip(seed):
+    rng = random.Random(seed)
+    game = new_game(seed)
+    for _ in range(rng.randrange(60)):
+        if game.game_finished:
+            break
+        move(game, rng)
+    for player_id in game.players:
+        assert decode_state(encode_state(game, player_id)) == game.get_game_state(player_id)
+
+@pytest.mark.parametrize("seed", range(20))
+def test_batch_round_trip(seed):
+    """Cada lote de até 4 jogadas, decodificado com os lugares do estado, é igual ao DeltaBatch.view"""
+    rng = random.Random(seed)
+    game = new_game(seed)
+    state = decode_state(encode_state(game, "sid-a"))
+    seats = list(state["players"])
+    names = {pid: player["name"] for pid, player in state["players"].items()}
+    while not game.game_finished:
+        batch = DeltaBatch(game.room_code)
+        for _ in range(rng.randint(1, 4)):
+            result = move(game, rng)
+            finish = None
+            if result.get("game_finished") or result.get("game_blocked"):
+                code = "won" if result.get("game_finished") else "won_blocked"
+                finish = {"code": code, "winner": result["winner"], "message": "fim"}
+            batch.add(game, seats, finish)
+            if game.game_finished:
+                break
+        for player_id in seats:
+            expected = batch.view(player_id)
+            # O cliente compacto monta o texto do aviso pelo code
+            if "finished" in expected:
+                expected["finished"] = compact_message(expected["finished"])
+            assert decode_delta(encode_batch(batch, player_id), seats, names) == expected
+
+def test_events_of_a_player_who_left_decode_without_a_seat():
+    rng = random.Random(0)
+    game = new_game(0)
+    batch = DeltaBatch(game.room_code)
+    mover = game.get_current_player_id()
+    move(game, rng)
+    batch.add(game, list(game.players))
+    # O jogador sai antes do envio: os lugares do lote já não têm o autor do evento
+    game.remove_player(mover)
+    batch.seats = list(game.players)
+    names = {pid: player["name"] for pid, player in game.players.items()}
+
+    (other,) = batch.seats
+    delta = decode_delta(encode_batch(batch, other), batch.seats, names)
+    assert delta["events"][0]["player"] is None
+    assert delta["events"][0]["current_player"] == other
@@ -0,0 +1,124 @@
+"""Torneio/self-play em vários processos, com sementes determinísticas.
+
+Uso: python tournament.py --games 200000 --workers 8 --seed 42 --policy heaviest first
+
+A semente de cada partida depende só da semente mestre e do índice da partida,
+e as partidas são agrupadas em blocos de tamanho fixo. Os agregados são somas,
+então o resultado é o mesmo para a mesma semente mestre e o mesmo --chunk,
+qualquer que seja o número de workers.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, Iterator, List, Sequence
+
+import numpy as np
+
+from simulator import POLICIES, play_reference, simulate
+
+_MASK64 = (1 << 64) - 1
+
+def game_seed(master_seed: int, index: int) -> int:
+    """Semente da partida index (splitmix64), independente da divisão em blocos"""
+    z = (master_seed + (index + 1) * 0x9E3779B97F4A7C15) & _MASK64
+    z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & _MASK64
+    z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & _MASK64
+    return (z ^ (z >> 31)) >> 1
+
+def run_chunk(master_seed: int, start: int, count: int, policy_names: Sequence[str], engine: str) -> List[Dict]:
+    """Joga as partidas [start, start + count) e retorna um resultado por partida"""
+    policies = tuple(POLICIES[name] for name in policy_names)
+    seeds = [game_seed(master_seed, index) for index in range(start, start + count)]
+    results = []
+    if engine == "batch":
+        batch = simulate(seeds, policies, rng=np.random.default_rng(game_seed(master_seed, -1 - start)))
+        for i, seed in enumerate(seeds):
+            results.append({
+                "index": start + i, "seed": seed, "winner": int(batch.winner[i]),
+                "points": [int(p) for p in batch.points[i]],
+                "moves": int(batch.moves[i]), "blocked": bool(batch.blocked[i])
+            })
+    else:
+        for i, seed in enumerate(seeds):
+            winner, points, moves, blocked = play_reference(seed, policies, rng=np.random.default_rng(seed))
+            results.append({
+                "index": start + i, "seed": seed, "winner": winner, "points": list(points),
+                "moves": moves, "blocked": blocked
+            })
+    return results
+
+class Aggregate:
+    """Estatísticas somadas (independem da ordem de chegada dos resultados)"""
+    def __init__(self):
+        self.games = 0
+        self.wins = [0, 0]
+        self.blocked = 0
+        self.moves = 0
+        self.points = [0, 0]
+
+    def add(self, result: Dict):
+        self.games += 1
+        self.wins[result["winner"]] += 1
+        self.blocked += result["blocked"]
+        self.moves += result["moves"]
+        self.points[0] += result["points"][0]
+        self.points[1] += result["points"][1]
+
+    def to_dict(self) -> Dict:
+        return {
+            "games": self.games,
+            "wins": self.wins,
+            "blocked": self.blocked,
+            "moves": self.moves,
+            "points": self.points,
+        }
+
+def run_tournament(games: int, master_seed: int, policy_names: Sequence[str], workers: int,
+                   chunk: int = 1000, engine: str = "batch") -> Iterator[List[Dict]]:
+    """Distribui os blocos entre os processos e entrega cada bloco assim que termina"""
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(run_chunk, master_seed, start, min(chunk, games - start), tuple(policy_names), engine)
+            for start in range(0, games, chunk)
+        ]
+        for future in as_completed(futures):
+            yield future.result()
+
+def main():
+    parser = argparse.ArgumentParser(description="Torneio de self-play em vários processos")
+    parser.add_argument('--games', type=int, default=100000)
+    parser.add_argument('--seed', type=int, default=0, help='semente mestre')
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--chunk', type=int, default=1000, help='partidas por tarefa')
+    parser.add_argument('--policy', nargs=2, default=['first', 'first'], choices=sorted(POLICIES))
+    parser.add_argument('--engine', choices=['batch', 'reference'], default='batch',
+                        help='batch = simulador NumPy, reference = DominoGame')
+    parser.add_argument('--jsonl', help='grava cada resultado neste arquivo conforme chega')
+    args = parser.parse_args()
+
+    total = Aggregate()
+    out = open(args.jsonl, 'w') if args.jsonl else None
+    started = time.perf_counter()
+    try:
+        for results in run_tournament(args.games, args.seed, args.policy, args.workers, args.chunk, args.engine):
+            for result in results:
+                total.add(result)
+                if out:
+                    out.write(json.dumps(result) + '\n')
+            print(f'\r{total.games}/{args.games} partidas', end='', file=sys.stderr, flush=True)
+    finally:
+        if out:
+            out.close()
+    elapsed = time.perf_counter() - started
+    print(file=sys.stderr)
+
+    summary = total.to_dict()
+    summary["seconds"] = round(elapsed, 3)
+    summary["games_per_second"] = round(total.games / elapsed)
+    print(json.dumps(summary))
+
+if __name__ == '__main__':
+    main()
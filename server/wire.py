@@ -0,0 +1,228 @@
+"""Codificação compacta das mensagens, escolhida por cliente no connect.
+
+O cliente pede auth={"encoding": "compact"}; sem isso (ou com "json") recebe os
+dicionários de sempre. No modo compacto:
+  - game_delta, game_started e game_state vão como bytes (payload binário do
+    Socket.IO), com cada peça em um byte e os jogadores pelo lugar na mesa;
+  - as outras mensagens são os mesmos dicionários sem o texto em "message": o
+    cliente monta o texto a partir de "code" e dos outros campos.
+
+Peças: índice em game.TILES (0-27). Na mesa e nos eventos de jogada o byte é
+índice << 1 | invertida; nas jogadas possíveis, índice << 1 | (lado == direita).
+Inteiros em little-endian; 255 = nenhum. O decodificador do cliente fica em
+client/src/wire.js e precisa acompanhar qualquer mudança daqui.
+
+  delta:  B tipo=1, 6s sala, I versão, B eventos,
+          por evento: I seq, B tipo (0 jogada, 1 compra, 2 passe), B lugar, B peça,
+          B lado, B lugar da vez, B monte, B peças na mão, B encerrado, B lugar do vencedor;
+          B n, n jogadas possíveis; B fim de jogo (0 não, 1 won, 2 won_blocked)
+  estado: B tipo=2, 6s sala, I versão, B flags (1 iniciado, 2 encerrado, 4 com
+          starting_info), B lugar da vez, B lugar do vencedor, B monte,
+          B dupla obrigatória, B dupla inicial;
+          B jogadores, por jogador: B peças na mão, B n + nome (utf-8), B n + sid;
+          B n + mesa, B n + mão, B n + jogadas possíveis
+"""
+import struct
+from typing import Dict, List, Optional
+
+from game import PIECES, TILE_INDEX, TILES, DominoGame, highest_double, iter_tiles
+
+JSON = "json"
+COMPACT = "compact"
+ENCODINGS = (JSON, COMPACT)
+
+NONE = 255
+KIND_DELTA = 1
+KIND_STATE = 2
+EVENT_TYPES = {"play": 0, "draw": 1, "pass": 2}
+EVENT_NAMES = {code: name for name, code in EVENT_TYPES.items()}
+# Aviso de fim de jogo no fim do delta (0 = o jogo continua)
+FINISH_CODES = {"won": 1, "won_blocked": 2}
+FINISH_NAMES = {code: name for name, code in FINISH_CODES.items()}
+
+STARTED, FINISHED, HAS_STARTING_INFO = 1, 2, 4
+
+_DELTA_HEADER = struct.Struct("<B6sIB")
+_EVENT = struct.Struct("<IBBBBBBBBB")
+_STATE_HEADER = struct.Struct("<B6sIBBBBBB")
+
+def negotiate(auth) -> str:
+    """Codificação pedida pelo cliente no connect (JSON se ausente ou desconhecida)"""
+    encoding = auth.get("encoding") if isinstance(auth, dict) else None
+    return encoding if encoding in ENCODINGS else JSON
+
+def compact_message(payload: Dict) -> Dict:
+    """Mensagem sem o texto: o cliente compacto monta a frase pelo code"""
+    return {key: value for key, value in payload.items() if key != "message"}
+
+def _seat(seats: Dict[str, int], player_id: Optional[str]) -> int:
+    """Lugar do jogador na mesa; NONE se não houver ou se ele já saiu da sala"""
+    return seats.get(player_id, NONE) if player_id is not None else NONE
+
+def _legal_bytes(moves: List) -> bytes:
+    return bytes([len(moves)]) + bytes(piece.index << 1 | (side == "right") for piece, side in moves)
+
+def _placed(piece: Dict) -> int:
+    """Byte de uma peça orientada (dicionário left/right dos eventos)"""
+    tile = TILE_INDEX[(piece["left"], piece["right"])]
+    return tile << 1 | (TILES[tile][0] != piece["left"])
+
+def _short(text: str) -> bytes:
+    raw = text.encode()[:255]
+    return bytes([len(raw)]) + raw
+
+def _encode_events(room_code: str, version: int, events: List[Dict], seats: List[str],
+                   winner: Optional[str], player_id: str, moves: List, finish: Optional[Dict]) -> bytes:
+    seat_of = {pid: seat for seat, pid in enumerate(seats)}
+    parts = [_DELTA_HEADER.pack(KIND_DELTA, room_code.encode(), version, len(events))]
+    for event in events:
+        piece = event.get("piece")
+        # Só quem comprou vê a peça comprada
+        if piece is None or (event["type"] == "draw" and event["player"] != player_id):
+            tile = NONE
+        else:
+            tile = _placed(piece)
+        parts.append(_EVENT.pack(
+            event["seq"], EVENT_TYPES[event["type"]], _seat(seat_of, event["player"]), tile,
+            event.get("side") == "right", _seat(seat_of, event["current_player"]), event["pool_count"],
+            event["hand_count"], event["game_finished"],
+            _seat(seat_of, winner) if event["game_finished"] else NONE
+        ))
+    parts.append(_legal_bytes(moves))
+    parts.append(bytes([FINISH_CODES[finish["code"]] if finish else 0]))
+    return b"".join(parts)
+
+def encode_batch(batch, player_id: str) -> bytes:
+    """Lote de eventos do outbox visto pelo jogador (o mesmo conteúdo de DeltaBatch.view)"""
+    return _encode_events(batch.room_code, batch.version, batch.events, batch.seats, batch.winner,
+                          player_id, batch.moves.get(player_id, []), batch.finish)
+
+def encode_state(game: DominoGame, player_id: str) -> bytes:
+    """Estado do jogo visto pelo jogador (o mesmo conteúdo de get_game_state)"""
+    seats = {pid: seat for seat, pid in enumerate(game.players)}
+    current = game.get_current_player_id()
+    hand = game.players[player_id]["hand"]
+
+    flags = STARTED * game.game_started | FINISHED * game.game_finished
+    required_double = starting_double = NONE
+    if game.game_started and len(game.board) == 0:
+        info = game.get_starting_player_info()
+        if info is not None:
+            flags |= HAS_STARTING_INFO
+            starting_double = info.get("highest_double", NONE)
+        if player_id == current:
+            double = highest_double(hand)
+            required_double = NONE if double is None else double
+
+    parts: List[bytes] = [_STATE_HEADER.pack(
+        KIND_STATE, game.room_code.encode(), game.version, flags, _seat(seats, current),
+        _seat(seats, game.winner), len(game.dominoes_pool), required_double, starting_double
+    ), bytes([len(game.players)])]
+    for pid, pdata in game.players.items():
+        parts += (bytes([pdata["hand"].bit_count()]), _short(pdata["name"]), _short(pid))
+    board = bytes(p.piece.index << 1 | p.flipped for p in game.board)
+    tiles = bytes(iter_tiles(hand))
+    parts += (bytes([len(board)]), board, bytes([len(tiles)]), tiles, _legal_bytes(game.legal_moves(player_id)))
+    return b"".join(parts)
+
+class _Reader:
+    def __init__(self, data: bytes):
+        self.data = data
+        self.offset = 0
+
+    def unpack(self, layout: struct.Struct):
+        values = layout.unpack_from(self.data, self.offset)
+        self.offset += layout.size
+        return values
+
+    def byte(self) -> int:
+        self.offset += 1
+        return self.data[self.offset - 1]
+
+    def block(self) -> bytes:
+        size = self.byte()
+        self.offset += size
+        return self.data[self.offset - size:self.offset]
+
+def _oriented(byte: int) -> Dict:
+    left, right = TILES[byte >> 1]
+    return {"left": right, "right": left} if byte & 1 else {"left": left, "right": right}
+
+def _legal_moves(raw: bytes) -> List[Dict]:
+    return [
+        {"left": TILES[byte >> 1][0], "right": TILES[byte >> 1][1], "side": "right" if byte & 1 else "left"}
+        for byte in raw
+    ]
+
+def decode_state(data: bytes) -> Dict:
+    """Inverso de encode_state, no formato de get_game_state (para clientes Python e testes)"""
+    reader = _Reader(data)
+    (_, room_code, version, flags, current, winner, pool_count,
+     required_double, starting_double) = reader.unpack(_STATE_HEADER)
+    players, seats = {}, []
+    for _ in range(reader.byte()):
+        hand_count = reader.byte()
+        # O nome pode ter sido cortado no meio de um caractere
+        name = reader.block().decode(errors="replace")
+        pid = reader.block().decode()
+        seats.append(pid)
+        players[pid] = {"name": name, "hand_count": hand_count}
+    board = [_oriented(byte) for byte in reader.block()]
+    hand = [PIECES[tile].to_dict() for tile in reader.block()]
+    legal_moves = _legal_moves(reader.block())
+
+    starting_info = None
+    if flags & HAS_STARTING_INFO:
+        name = players[seats[current]]["name"]
+        if starting_double != NONE:
+            starting_info = {"player_name": name, "highest_double": starting_double,
+                             "message": f"{name} inicia com a dupla [{starting_double}|{starting_double}]"}
+        else:
+            starting_info = {"player_name": name, "message": f"{name} inicia o jogo"}
+    return {
+        "room_code": room_code.decode(),
+        "players": players,
+        "board": board,
+        "current_player": seats[current] if current != NONE else None,
+        "game_started": bool(flags & STARTED),
+        "game_finished": bool(flags & FINISHED),
+        "winner": players[seats[winner]]["name"] if winner != NONE else None,
+        "pool_count": pool_count,
+        "starting_info": starting_info,
+        "version": version,
+        "my_hand": hand,
+        "required_double": None if required_double == NONE else required_double,
+        "legal_moves": legal_moves,
+    }
+
+def decode_delta(data: bytes, seats: List[str], names: Dict[str, str]) -> Dict:
+    """Inverso de encode_batch; seats e names vêm do último estado recebido"""
+    reader = _Reader(data)
+    _, room_code, version, count = reader.unpack(_DELTA_HEADER)
+    events = []
+    for _ in range(count):
+        seq, kind, seat, tile, side, current, pool_count, hand_count, finished, winner = reader.unpack(_EVENT)
+        event = {"type": EVENT_NAMES[kind], "player": seats[seat] if seat != NONE else None}
+        if tile != NONE:
+            event["piece"] = _oriented(tile)
+        if kind == EVENT_TYPES["play"]:
+            event["side"] = "right" if side else "left"
+        event.update({
+            "seq": seq,
+            "current_player": seats[current] if current != NONE else None,
+            "pool_count": pool_count,
+            "hand_count": hand_count,
+            "game_finished": bool(finished),
+            "winner": names[seats[winner]] if winner != NONE else None,
+        })
+        events.append(event)
+    delta = {
+        "room_code": room_code.decode(),
+        "version": version,
+        "events": events,
+        "legal_moves": _legal_moves(reader.block()),
+    }
+    finish = reader.byte()
+    if finish:
+        delta["finished"] = {"code": FINISH_NAMES[finish], "winner": events[-1]["winner"]}
+    return delta